@@ -0,0 +1,56 @@
+# admin_summary.py
+# Users with task counts and today's/this week's usage for the admin
+# dashboard, one page per call. The admin_user_summary() function (see
+# schema.sql) reads the trigger-maintained user_task_counts table and the
+# usage_totals rollups, so no per-user task or screen_time scans are needed.
+#
+#   GET /admin/users?sort=name|tasks|active|today|week&order=asc|desc
+#                   &search=<name>&role=user&limit=50&after=<next>
+import base64
+import json
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from auth import require_admin
+from db import supabase
+
+router = APIRouter()
+
+SORTS = ("name", "tasks", "active", "today", "week")
+MAX_LIMIT = 200
+
+
+def encode_cursor(row):
+    raw = json.dumps([row["sort_num"], row["sort_text"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_num, sort_text, user_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_num, sort_text, user_id
+
+
+@router.get("/admin/users", dependencies=[Depends(require_admin)])
+def admin_users(sort: str = "name", order: str = "asc", search: str = None, role: str = "user",
+                limit: int = 50, after: str = None):
+    if sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORTS)}")
+    limit = min(max(limit, 1), MAX_LIMIT)
+    params = {
+        "p_sort": sort,
+        "p_desc": order == "desc",
+        "p_search": search or None,
+        "p_role": role or None,
+        "p_today": date.today().isoformat(),
+        "p_limit": limit
+    }
+    if after:
+        params["p_after_num"], params["p_after_text"], params["p_after_id"] = decode_cursor(after)
+    rows = supabase.rpc("admin_user_summary", params).execute().data or []
+    users = [{k: v for k, v in row.items() if k not in ("sort_num", "sort_text")} for row in rows]
+    return {"users": users, "next": encode_cursor(rows[-1]) if len(rows) == limit else None}
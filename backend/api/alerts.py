@@ -0,0 +1,71 @@
+# alerts.py
+# Daily goal alerts per task, evaluated as usage is ingested; nothing scans
+# for them. After a sample is credited, apply_alert_increment() (see
+# schema.sql) compares the day's usage_totals row with the task's
+# hours_perday and appends new events to alert_outbox:
+#
+#   goal_progress, goal_reached, over_budget
+#       the day crossed one of ALERT_THRESHOLDS percent of the target
+#       (default "50,100,150": below, at and above 100)
+#   goal_missed
+#       the previous day ended under target; sent with the task's first
+#       sample of the next day
+#
+# Its only state is one alert_state row per task (the day and a bitmask of
+# thresholds already crossed). Each API process's usage publisher reads new
+# outbox rows and pushes them to their owner's /usage/stream and /ws/usage
+# connections, whichever worker took the sample.
+#
+#   GET /alerts?after=<id>&limit=50    the caller's alerts, oldest first
+import logging
+import os
+
+from fastapi import APIRouter, Request
+
+import auth
+import metrics
+from db import supabase
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+THRESHOLDS = [int(p) for p in os.getenv("ALERT_THRESHOLDS", "50,100,150").split(",") if p.strip()]
+MAX_LIMIT = 500
+
+ALERTS = metrics.Counter("api_alerts_total", "Goal alerts emitted on ingest", ("kind",))
+
+
+def evaluate(task_id, days):
+    # days: the dates a sample just credited. Failures are logged, not raised:
+    # the usage itself has already been stored.
+    events = []
+    for day in sorted(days):
+        try:
+            events += supabase.rpc("apply_alert_increment", {
+                "p_task_id": task_id, "p_day": day, "p_thresholds": THRESHOLDS
+            }).execute().data or []
+        except Exception as e:
+            logger.warning("Alert evaluation failed for task %s on %s: %s", task_id, day, e)
+    for event in events:
+        ALERTS.inc(event["kind"])
+    return events
+
+
+def latest_id():
+    rows = supabase.table("alert_outbox").select("id").order("id", desc=True).limit(1).execute().data or []
+    return rows[0]["id"] if rows else 0
+
+
+def since(after_id, user_id=None, limit=MAX_LIMIT):
+    query = supabase.table("alert_outbox").select("*").gt("id", after_id)
+    if user_id:
+        query = query.eq("user_id", user_id)
+    return query.order("id").limit(limit).execute().data or []
+
+
+@router.get("/alerts")
+def list_alerts(request: Request, after: int = 0, limit: int = 50):
+    user = auth.current_user(request)
+    user_id = None if user is None or auth.is_admin(user) else user["sub"]
+    rows = since(after, user_id, min(max(limit, 1), MAX_LIMIT))
+    return {"alerts": rows, "next": rows[-1]["id"] if rows else after}
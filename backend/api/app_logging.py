@@ -0,0 +1,116 @@
+# app_logging.py
+# Logging for the API. Records are put on an in-memory queue by the calling
+# thread and formatted/written by a background QueueListener, so request
+# handlers never wait on stdout or disk. Output is one JSON object per line.
+#
+#   LOG_LEVEL      root level (default INFO)
+#   LOG_LEVELS     per-module overrides, e.g. "usage_totals=DEBUG,tracing=WARNING"
+#   LOG_FILE       also write to this file, rotated at LOG_MAX_BYTES (default 10MB)
+#                  keeping LOG_BACKUPS (default 5) old files
+#   LOG_REPEAT_SECONDS  identical warnings from one place are logged at most
+#                  once per this many seconds (default 60)
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    # Suppresses repeats of the same WARNING+ call site within `period` seconds;
+    # the next one let through carries the number suppressed.
+    def __init__(self, period):
+        super().__init__()
+        self.period = period
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or self.period <= 0:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            last, suppressed = self.seen.get(key, (0.0, 0))
+            if now - last < self.period:
+                self.seen[key] = (last, suppressed + 1)
+                return False
+            self.seen[key] = (now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # Keep the record's extra fields and exc_info for the JSON formatter on the
+    # listener side; only the message arguments are merged here.
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def parse_levels(spec):
+    levels = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(log_file=None, level=None, levels=None):
+    global _listener
+    if _listener is not None:
+        return
+    formatter = JsonFormatter()
+    handlers = []
+    if sys.stderr is not None:
+        console = logging.StreamHandler(sys.stderr)
+        console.setFormatter(formatter)
+        handlers.append(console)
+    log_file = log_file or os.getenv("LOG_FILE")
+    if log_file:
+        rotating = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv("LOG_BACKUPS", "5")),
+            encoding="utf-8")
+        rotating.setFormatter(formatter)
+        handlers.append(rotating)
+
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(RateLimitFilter(float(os.getenv("LOG_REPEAT_SECONDS", "60"))))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, module_level in (levels or parse_levels(os.getenv("LOG_LEVELS"))).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
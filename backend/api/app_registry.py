@@ -0,0 +1,138 @@
+# app_registry.py
+# The app_registry table, served from memory. The registry is reloaded at
+# most every REGISTRY_TTL_SECONDS (default 300) and is versioned by an ETag,
+# so dashboards and tracker agents revalidate with If-None-Match and usually
+# get a 304.
+#
+#   GET /app-registry                      {version, sprite, categories, matchers}
+#   GET /app-registry/sprite.<hash>.svg    icon atlas, cached forever
+#
+# The atlas packs the PNGs under frontend/app_icons into one SVG with a
+# <view> per icon, so an icon is <img src="{sprite}#{icon}">. `matchers` are
+# the registry's appnames, longest first: the agent maps a foreground exe to
+# the first one it contains.
+import base64
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from db import supabase
+
+router = APIRouter()
+
+ICON_DIR = Path(os.getenv("APP_ICON_DIR") or Path(__file__).resolve().parents[2] / "frontend" / "app_icons")
+REGISTRY_TTL_SECONDS = int(os.getenv("REGISTRY_TTL_SECONDS", "300"))
+CELL = 48
+SPRITE_PREFIX = "/app-registry/sprite."
+
+_lock = threading.Lock()
+_cache = None
+_sprite = None
+
+
+def icon_key(path):
+    # "icons8-visual-studio-50.png" -> "visual-studio"
+    stem = re.sub(r"^icons8-", "", path.stem)
+    return re.sub(r"-\d+$", "", stem)
+
+
+def build_sprite(icon_dir=ICON_DIR):
+    paths = sorted(p for p in Path(icon_dir).glob("*/*.png")) if Path(icon_dir).is_dir() else []
+    columns = max(1, math.ceil(math.sqrt(len(paths))))
+    rows = math.ceil(len(paths) / columns) if paths else 1
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+        f'width="{columns * CELL}" height="{rows * CELL}">'
+    ]
+    icons = {}
+    for i, path in enumerate(paths):
+        key = icon_key(path)
+        x, y = (i % columns) * CELL, (i // columns) * CELL
+        data = base64.b64encode(path.read_bytes()).decode()
+        parts.append(f'<view id="{key}" viewBox="{x} {y} {CELL} {CELL}"/>')
+        parts.append(f'<image x="{x}" y="{y}" width="{CELL}" height="{CELL}" '
+                     f'xlink:href="data:image/png;base64,{data}"/>')
+        icons[key] = path.parent.name
+    parts.append("</svg>")
+    body = "".join(parts).encode()
+    return {"body": body, "hash": hashlib.sha256(body).hexdigest()[:12], "icons": icons}
+
+
+def get_sprite():
+    global _sprite
+    if _sprite is None:
+        _sprite = build_sprite()
+    return _sprite
+
+
+def _icon_for(app, icons):
+    words = {(app.get("appname") or "").lower(), (app.get("name") or "").lower().replace(" ", "-")}
+    for key in icons:
+        if any(key and word and (key in word or word in key) for word in words):
+            return key
+    return None
+
+
+def matchers(rows):
+    # The registry appnames, longest first, so the first one an exe contains
+    # is its most specific match.
+    return sorted({(r.get("appname") or "").lower() for r in rows} - {""}, key=lambda a: (-len(a), a))
+
+
+def _load():
+    rows = supabase.table("app_registry").select("name, appname, icon_url, category").execute().data or []
+    sprite = get_sprite()
+    categories = {}
+    for row in sorted(rows, key=lambda r: ((r.get("category") or "").lower(), (r.get("name") or "").lower())):
+        app = dict(row, icon=_icon_for(row, sprite["icons"]))
+        categories.setdefault(row.get("category") or "other", []).append(app)
+    registry = {
+        "sprite": f"{SPRITE_PREFIX}{sprite['hash']}.svg",
+        "categories": [{"name": name, "apps": apps} for name, apps in categories.items()],
+        "matchers": matchers(rows)
+    }
+    body = json.dumps(registry, separators=(",", ":"), sort_keys=True).encode()
+    version = hashlib.sha256(body).hexdigest()[:16]
+    body = json.dumps(dict(registry, version=version), separators=(",", ":")).encode()
+    return {"loaded": time.monotonic(), "etag": f'"{version}"', "body": body}
+
+
+def get_registry():
+    global _cache
+    cache = _cache
+    if cache is None or time.monotonic() - cache["loaded"] > REGISTRY_TTL_SECONDS:
+        with _lock:
+            if _cache is cache:
+                _cache = _load()
+            cache = _cache
+    return cache
+
+
+def invalidate():
+    global _cache
+    _cache = None
+
+
+@router.get("/app-registry")
+def app_registry(request: Request):
+    registry = get_registry()
+    headers = {"ETag": registry["etag"], "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == registry["etag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(registry["body"], media_type="application/json", headers=headers)
+
+
+@router.get("/app-registry/sprite.{digest}.svg")
+def app_sprite(digest: str):
+    sprite = get_sprite()
+    if digest != sprite["hash"]:
+        raise HTTPException(status_code=404, detail="Unknown sprite version")
+    return Response(sprite["body"], media_type="image/svg+xml",
+                    headers={"Cache-Control": "public, max-age=31536000, immutable"})
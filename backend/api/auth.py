@@ -0,0 +1,247 @@
+# auth.py
+# Request authentication. AuthMiddleware verifies the Supabase access token
+# (Authorization: Bearer, or ?token= for websockets and EventSource) locally
+# with PyJWT and stores the claims in request.state.user:
+#
+#   SUPABASE_JWT_SECRET  verify HS256 tokens with the project's JWT secret
+#   otherwise            verify RS256/ES256 tokens against the project's JWKS,
+#                        refreshed in the background every JWKS_REFRESH_SECONDS
+#
+# Tokens are only checked against the locally held key set. An unknown `kid`
+# (key rotation) fetches the set again in a worker thread, at most once per
+# JWKS_MIN_REFRESH_SECONDS; kids still missing after a fetch are rejected
+# without fetching until the next scheduled refresh.
+#
+# Verified claims are cached per token until they expire, profile roles for
+# ROLE_CACHE_SECONDS and task owners for the process lifetime (usage_store),
+# so a request with a known token costs a dict lookup. ADMIN_API_KEY in
+# X-Admin-Key still grants admin access for scripts.
+import hmac
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+import anyio
+import jwt
+from fastapi import Header, HTTPException, Request
+
+from db import supabase
+from usage_store import task_owner
+
+logger = logging.getLogger(__name__)
+
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (SUPABASE_URL and f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json")
+JWKS_REFRESH_SECONDS = int(os.getenv("JWKS_REFRESH_SECONDS", "600"))
+JWKS_MIN_REFRESH_SECONDS = int(os.getenv("JWKS_MIN_REFRESH_SECONDS", "60"))
+MISSING_KIDS_SIZE = 10000
+ROLE_CACHE_SECONDS = int(os.getenv("ROLE_CACHE_SECONDS", "300"))
+CLAIMS_CACHE_SIZE = 10000
+ENABLED = bool(JWT_SECRET or JWKS_URL)
+
+PUBLIC_PATHS = {"/metrics", "/docs", "/redoc", "/openapi.json"}
+# Loaded by <img>, which cannot send a token; the content is not per user.
+PUBLIC_PREFIXES = ("/app-registry/sprite.",)
+ADMIN_KEY_USER = {"sub": None, "role": "admin"}
+
+_claims = OrderedDict()
+_roles = {}
+_jwks = None
+_keys = {}
+_missing_kids = OrderedDict()
+_keys_lock = threading.Lock()
+_last_fetch = None
+if JWKS_URL:
+    # Only used to fetch the set; lookups go through _keys.
+    _jwks = jwt.PyJWKClient(
+        JWKS_URL, cache_jwk_set=False,
+        headers={"apikey": os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY", "")})
+
+
+class UnknownKeyError(jwt.InvalidTokenError):
+    def __init__(self, kid):
+        super().__init__(f"Unknown signing key {kid!r}")
+        self.kid = kid
+
+
+def is_admin_key(key):
+    return bool(ADMIN_API_KEY) and key is not None and hmac.compare_digest(key, ADMIN_API_KEY)
+
+
+def _fetch_keys():
+    # Call with _keys_lock held.
+    global _keys, _last_fetch
+    _last_fetch = time.monotonic()
+    jwk_set = _jwks.get_jwk_set(refresh=True)
+    _keys = {key.key_id: key for key in jwk_set.keys if key.public_key_use in (None, "sig")}
+
+
+def _refresh_keys():
+    while True:
+        with _keys_lock:
+            try:
+                _fetch_keys()
+                _missing_kids.clear()
+            except Exception as e:
+                logger.warning("Could not refresh JWKS: %s", e)
+        time.sleep(JWKS_REFRESH_SECONDS)
+
+
+def refresh_for_kid(kid):
+    # Blocking; run in a worker thread. True if kid is known afterwards.
+    with _keys_lock:
+        if kid in _keys:
+            return True
+        if kid in _missing_kids or (
+                _last_fetch is not None and time.monotonic() - _last_fetch < JWKS_MIN_REFRESH_SECONDS):
+            return False
+        try:
+            _fetch_keys()
+        except Exception as e:
+            logger.warning("Could not refresh JWKS: %s", e)
+        if kid in _keys:
+            return True
+        _missing_kids[kid] = True
+        if len(_missing_kids) > MISSING_KIDS_SIZE:
+            _missing_kids.popitem(last=False)
+        return False
+
+
+def start_key_refresh():
+    if _jwks is not None:
+        threading.Thread(target=_refresh_keys, name="jwks-refresh", daemon=True).start()
+
+
+def _decode(token):
+    options = {"require": ["exp", "sub"]}
+    header = jwt.get_unverified_header(token)
+    if header.get("alg") == "HS256":
+        if not JWT_SECRET:
+            raise jwt.InvalidTokenError("HS256 tokens are not accepted")
+        return jwt.decode(token, JWT_SECRET, algorithms=["HS256"], audience=JWT_AUDIENCE, options=options)
+    if _jwks is None:
+        raise jwt.InvalidTokenError("No signing keys configured")
+    key = _keys.get(header.get("kid"))
+    if key is None:
+        raise UnknownKeyError(header.get("kid"))
+    return jwt.decode(token, key.key, algorithms=["RS256", "ES256"], audience=JWT_AUDIENCE, options=options)
+
+
+def verify(token):
+    # Returns the token's claims or raises jwt.InvalidTokenError.
+    cached = _claims.get(token)
+    if cached is not None and cached["exp"] > time.time():
+        _claims.move_to_end(token)
+        return cached
+    claims = _decode(token)
+    _claims[token] = claims
+    if len(_claims) > CLAIMS_CACHE_SIZE:
+        _claims.popitem(last=False)
+    return claims
+
+
+async def _verify_async(token):
+    # verify(), fetching the key set off the event loop when the kid is new.
+    try:
+        return verify(token)
+    except UnknownKeyError as e:
+        if not await anyio.to_thread.run_sync(refresh_for_kid, e.kid):
+            raise
+    return verify(token)
+
+
+def user_role(user_id):
+    cached = _roles.get(user_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    res = supabase.table("profiles").select("role").eq("id", user_id).maybe_single().execute()
+    role = res.data.get("role") if res and res.data else None
+    _roles[user_id] = (role, time.monotonic() + ROLE_CACHE_SECONDS)
+    return role
+
+
+def is_admin(user):
+    if user is None:
+        return False
+    return user is ADMIN_KEY_USER or user_role(user["sub"]) == "admin"
+
+
+def _token(scope, headers):
+    authorization = headers.get(b"authorization", b"").decode()
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    values = parse_qs(scope.get("query_string", b"").decode()).get("token")
+    return values[0] if values else None
+
+
+class AuthMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or not ENABLED:
+            return await self.app(scope, receive, send)
+        if scope.get("method") == "OPTIONS" or scope["path"] in PUBLIC_PATHS \
+                or scope["path"].startswith(PUBLIC_PREFIXES):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        user = None
+        if is_admin_key(headers.get(b"x-admin-key", b"").decode() or None):
+            user = ADMIN_KEY_USER
+        else:
+            token = _token(scope, headers)
+            try:
+                user = await _verify_async(token) if token else None
+            except jwt.PyJWTError as e:
+                logger.info("Rejected token: %s", e)
+        if user is None:
+            return await self._reject(scope, send)
+        scope.setdefault("state", {})["user"] = user
+        await self.app(scope, receive, send)
+
+    async def _reject(self, scope, send):
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        await send({
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [(b"content-type", b"application/json"), (b"www-authenticate", b"Bearer")]
+        })
+        await send({"type": "http.response.body", "body": b'{"detail":"Not authenticated"}'})
+
+
+def current_user(request):
+    return getattr(request.state, "user", None)
+
+
+# With auth disabled (no secret or JWKS configured) there is no user and
+# these checks pass, as before.
+def authorize_user(request, user_id):
+    # Callers may read their own data; admins may read anyone's.
+    user = current_user(request)
+    if user is not None and user["sub"] != user_id and not is_admin(user):
+        raise HTTPException(status_code=403, detail="Not allowed for this user")
+
+
+def authorize_task(request, task_id):
+    user = current_user(request)
+    if user is None or user is ADMIN_KEY_USER:
+        return
+    if task_owner(task_id) != user["sub"] and not is_admin(user):
+        raise HTTPException(status_code=403, detail="Not allowed for this task")
+
+
+def require_admin(request: Request, x_admin_key: str = Header(None)):
+    if is_admin_key(x_admin_key):
+        return
+    user = current_user(request)
+    if user is None or not is_admin(user):
+        raise HTTPException(status_code=403, detail="Admin access required")
@@ -0,0 +1,274 @@
+# bench.py
+# Offline load test for the API. Runs main.app under uvicorn in a background
+# thread against fake_supabase, seeded with a simulated user base, then drives
+# each endpoint with a fixed number of requests at the given concurrency.
+# Results (p50/p99 latency, throughput, errors per scenario) are written as
+# JSON; pass --baseline with an earlier result file to print the change.
+#
+#   python bench.py --users 500 --agents 200 --history-days 365 --out bench.json
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import tempfile
+import threading
+import time
+import types
+import uuid
+from datetime import date, timedelta
+
+import fake_supabase
+
+JWT_SECRET = "bench-secret-for-local-load-testing"
+
+
+def user_id_for(u):
+    return str(uuid.UUID(int=u + 1))
+
+
+def token_for(user_id):
+    import jwt
+
+    claims = {"sub": user_id, "aud": "authenticated", "role": "authenticated", "exp": int(time.time()) + 24 * 3600}
+    return jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+
+
+def seed(client, users, tasks_per_user, history_days):
+    today = date.today()
+    task_id = 0
+    for u in range(users):
+        user_id = user_id_for(u)
+        client.table("profiles").insert({"id": user_id, "role": "user", "full_name": f"User {u}"}).execute()
+        for _ in range(tasks_per_user):
+            task_id += 1
+            client.table("tasks").insert({
+                "id": task_id,
+                "user_id": user_id,
+                "title": f"Task {task_id}",
+                "appname": random.choice(["code", "chrome", "excel", "teams"]),
+                "hours_perday": "02:00",
+                "is_active": True,
+                "status": False
+            }).execute()
+            history = [{
+                "date": (today - timedelta(days=d)).isoformat(),
+                "time": "18:00:00",
+                "seconds": random.randint(0, 4 * 3600)
+            } for d in range(history_days, 0, -1)]
+            client.table("screen_time").insert({
+                "task_id": task_id,
+                "app_name": "code",
+                "date": history[0]["date"] if history else today.isoformat(),
+                "duration_minutes": history,
+                "updated_at": f"{today} 18:00:00"
+            }).execute()
+    return task_id
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(make_request, total, concurrency):
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = await make_request(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "throughput_rps": round(total / elapsed, 1)
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-server", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run_benchmarks(args, task_count):
+    import httpx
+    import websockets
+
+    base = f"http://127.0.0.1:{args.port}"
+    today = date.today().isoformat()
+    # Task ids are assigned per user in seed(), tasks_per_user at a time.
+    tokens = {u: token_for(user_id_for(u)) for u in range(args.users)}
+
+    def auth_for(task_id):
+        return {"Authorization": f"Bearer {tokens[(task_id - 1) // args.tasks_per_user]}"}
+
+    agents = [{"agent_id": str(uuid.uuid4()), "seq": 0, "task_id": i % task_count + 1} for i in range(args.agents)]
+    # Each agent's samples are consecutive minutes ending about now: ingest
+    # rejects intervals in the future or older than its window (7 days), so
+    # past six days' worth they wrap around and land on minutes already sent.
+    slots = min(args.requests // len(agents) + 2, 6 * 24 * 60)
+    origin = int(time.time()) - slots * 60
+    results = {}
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as http:
+        async def update_usage(i):
+            agent = agents[i % len(agents)]
+            if random.random() >= args.retry_rate:
+                agent["seq"] += 1
+            start = origin + agent["seq"] % slots * 60
+            response = await http.post("/update-usage", json={
+                "task_id": agent["task_id"],
+                "app_name": "code",
+                "seconds": 60,
+                "start": start,
+                "end": start + 60,
+                "agent_id": agent["agent_id"],
+                "seq": agent["seq"]
+            }, headers=auth_for(agent["task_id"]))
+            return response.status_code == 200
+
+        async def screen_time(i):
+            task_id = random.randint(1, task_count)
+            response = await http.get("/screen-time", params={"task_id": task_id, "date": today}, headers=auth_for(task_id))
+            return response.status_code == 200
+
+        async def start_tracker(i):
+            task_id = i % task_count + 1
+            response = await http.post("/start-tracker", json={"task_id": task_id, "appname": "code"}, headers=auth_for(task_id))
+            return response.status_code == 200
+
+        async def stop_tracker(i):
+            task_id = i % task_count + 1
+            response = await http.post("/stop-tracker", json={"task_id": task_id}, headers=auth_for(task_id))
+            return response.status_code == 200
+
+        for name, make_request in [
+            ("update_usage", update_usage),
+            ("screen_time", screen_time),
+            ("start_tracker", start_tracker),
+            ("stop_tracker", stop_tracker),
+        ]:
+            results[name] = await run_scenario(make_request, args.requests, args.concurrency)
+            print(f"[BENCH] {name}: {results[name]}")
+
+    async def ws_client(i):
+        token = tokens[i % args.users]
+        async with websockets.connect(f"ws://127.0.0.1:{args.port}/ws/usage?token={token}", max_size=None) as ws:
+            await ws.recv()
+            return True
+
+    results["ws_usage_fanout"] = await run_scenario(ws_client, args.ws_clients, args.ws_clients)
+    print(f"[BENCH] ws_usage_fanout: {results['ws_usage_fanout']}")
+
+    limits = httpx.Limits(max_connections=args.ws_clients)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as sse:
+        async def sse_client(i):
+            token = tokens[i % args.users]
+            async with sse.stream("GET", "/usage/stream", params={"token": token}) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("event: snapshot"):
+                        return True
+            return False
+
+        results["sse_usage_fanout"] = await run_scenario(sse_client, args.ws_clients, args.ws_clients)
+        print(f"[BENCH] sse_usage_fanout: {results['sse_usage_fanout']}")
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ("p50_ms", "p99_ms", "throughput_rps"):
+            if before[key]:
+                changes.append(f"{key} {(current[key] - before[key]) / before[key] * 100:+.1f}%")
+        print(f"[COMPARE] {name}: {', '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API against an in-memory Supabase")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks-per-user", type=int, default=3)
+    parser.add_argument("--history-days", type=int, default=90)
+    parser.add_argument("--agents", type=int, default=100, help="simulated tracker agents")
+    parser.add_argument("--retry-rate", type=float, default=0.05, help="share of samples resent with the same seq")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--ws-clients", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    out = os.path.abspath(args.out)
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    client = fake_supabase.install()
+    task_count = seed(client, args.users, args.tasks_per_user, args.history_days)
+
+    # Requests carry HS256 tokens so the auth middleware runs as in production.
+    os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET
+    import main as api
+
+    # /start-tracker spawns tracker.py and /stop-tracker writes flag files; keep both inert.
+    api.subprocess = types.SimpleNamespace(Popen=lambda *a, **k: None)
+    os.chdir(tempfile.mkdtemp(prefix="todo-bench-"))
+
+    args.port = free_port()
+    server, thread = start_server(api.app, args.port)
+    try:
+        results = asyncio.run(run_benchmarks(args, task_count))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "port")},
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Wrote {out}")
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
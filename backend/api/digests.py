@@ -0,0 +1,186 @@
+# digests.py
+# Daily and weekly usage digests for every user with tracked time, built in
+# batch (table usage_digests).
+#
+#   python digests.py --period day [--date YYYY-MM-DD] [--restart]
+#   python digests.py --period week [--date <any day of the week>]
+#
+# digest_usage() (see schema.sql) returns the period's usage_totals rows for
+# the next DIGEST_CHUNK_USERS users (default 2000) as columns; summarize()
+# turns a chunk into digests with NumPy group-bys, and the chunk is upserted
+# in one statement. Each digest has total_seconds, tasks_tracked, top_apps
+# (the TOP_APPS apps with the most time), goals_set/goals_met (tasks with an
+# hours_perday target, and how many reached it; a week's target is seven
+# days') and streak (consecutive periods with every goal met).
+#
+# After each chunk the last user is checkpointed in digest_runs, which also
+# holds a lease: an interrupted run resumes where it stopped, and two workers
+# never build the same period. With DIGEST_INTERVAL (seconds) set, the API
+# checks that often and builds yesterday's digests and last week's, once
+# DIGEST_AFTER_HOUR (default 2) has passed.
+#
+#   GET /digests?period=day|week&limit=7    the caller's latest digests
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request
+
+import app_logging
+import auth
+from db import supabase
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+PERIODS = ("day", "week")
+TOP_APPS = 3
+CHUNK_USERS = int(os.getenv("DIGEST_CHUNK_USERS", "2000"))
+AFTER_HOUR = int(os.getenv("DIGEST_AFTER_HOUR", "2"))
+LEASE_SECONDS = 600
+
+
+def period_start(period, day):
+    return day if period == "day" else day - timedelta(days=day.weekday())
+
+
+def summarize(chunk, period, start):
+    # chunk: the columns returned by digest_usage(). Rows arrive grouped by
+    # user, so each row's user index is a repeat of the per-user counts.
+    users = chunk["users"]
+    if not users:
+        return []
+    n = len(users)
+    counts = np.asarray(chunk["counts"], dtype=np.int64)
+    user_idx = np.repeat(np.arange(n), counts)
+    seconds = np.asarray(chunk["seconds"], dtype=np.int64)
+    target = np.asarray(chunk["target"], dtype=np.int64) * (7 if period == "week" else 1)
+
+    totals = np.bincount(user_idx, weights=seconds, minlength=n).astype(np.int64)
+    has_goal = target > 0
+    goals_set = np.bincount(user_idx, weights=has_goal, minlength=n).astype(np.int64)
+    goals_met = np.bincount(user_idx, weights=has_goal & (seconds >= target), minlength=n).astype(np.int64)
+    prev_streak = np.asarray(chunk["prev_streak"], dtype=np.int64)
+    streak = np.where((goals_set > 0) & (goals_met == goals_set), prev_streak + 1, 0)
+
+    # Seconds per (user, app), sorted by user then seconds descending; the
+    # first TOP_APPS pairs of each user are its top apps.
+    apps, app_idx = np.unique(np.asarray([a or "" for a in chunk["app"]], dtype=str), return_inverse=True)
+    pairs, pair_idx = np.unique(user_idx * len(apps) + app_idx, return_inverse=True)
+    pair_seconds = np.bincount(pair_idx, weights=seconds).astype(np.int64)
+    pair_user, pair_app = pairs // len(apps), pairs % len(apps)
+    order = np.lexsort((-pair_seconds, pair_user))
+    pair_user, pair_app, pair_seconds = pair_user[order], pair_app[order], pair_seconds[order]
+    rank = np.arange(len(pair_user)) - np.searchsorted(pair_user, pair_user)
+    top = [[] for _ in range(n)]
+    for u, a, s in zip(*(arr[rank < TOP_APPS].tolist() for arr in (pair_user, pair_app, pair_seconds))):
+        top[u].append({"app": str(apps[a]), "seconds": s})
+
+    start = start.isoformat()
+    return [
+        {
+            "user_id": user_id, "period": period, "period_start": start,
+            "total_seconds": total, "tasks_tracked": tracked, "top_apps": top_apps,
+            "goals_set": gs, "goals_met": gm, "streak": st
+        }
+        for user_id, total, tracked, top_apps, gs, gm, st in zip(
+            users, totals.tolist(), counts.tolist(), top, goals_set.tolist(), goals_met.tolist(), streak.tolist())
+    ]
+
+
+def _checkpoint(period, start, last_user_id, users, finished=False):
+    supabase.rpc("checkpoint_digest_run", {
+        "p_period": period, "p_period_start": start.isoformat(), "p_last_user_id": last_user_id,
+        "p_users": users, "p_lease_seconds": LEASE_SECONDS, "p_finished": finished
+    }).execute()
+
+
+def build(period, day, restart=False, chunk_users=CHUNK_USERS):
+    # Returns the number of users digested, or None if the run is finished or
+    # another worker holds it.
+    start = period_start(period, day)
+    claimed = supabase.rpc("claim_digest_run", {
+        "p_period": period, "p_period_start": start.isoformat(),
+        "p_lease_seconds": LEASE_SECONDS, "p_restart": restart
+    }).execute().data
+    if not claimed:
+        return None
+    after, done = claimed[0]["last_user_id"], claimed[0]["users"]
+    began = time.monotonic()
+    while True:
+        chunk = supabase.rpc("digest_usage", {
+            "p_period": period, "p_period_start": start.isoformat(), "p_after": after, "p_users": chunk_users
+        }).execute().data or {"users": []}
+        rows = summarize(chunk, period, start)
+        if not rows:
+            break
+        supabase.table("usage_digests").upsert(rows, on_conflict="user_id,period,period_start").execute()
+        after, done = rows[-1]["user_id"], done + len(rows)
+        _checkpoint(period, start, after, done)
+        logger.info("%s digests for %s: %d users (%.1fs)", period, start, done, time.monotonic() - began)
+        if len(rows) < chunk_users:
+            break
+    _checkpoint(period, start, after, done, finished=True)
+    return done
+
+
+def due(now):
+    # The periods that have closed (plus AFTER_HOUR of grace for late uploads).
+    today = now.date()
+    if now.hour < AFTER_HOUR:
+        today -= timedelta(days=1)
+    yesterday = today - timedelta(days=1)
+    return [("day", yesterday), ("week", period_start("week", today) - timedelta(days=7))]
+
+
+async def build_periodically(interval_seconds):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        for period, day in due(datetime.now()):
+            try:
+                users = await asyncio.to_thread(build, period, day)
+                if users is not None:
+                    logger.info("Built %s digests for %s: %d users", period, day, users)
+            except Exception:
+                logger.exception("Building %s digests for %s failed", period, day)
+
+
+@router.get("/digests")
+def list_digests(request: Request, period: str = "day", user_id: str = None, limit: int = 7):
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail="period must be day or week")
+    user = auth.current_user(request)
+    user_id = user_id or (user and user["sub"])
+    if not user_id:
+        raise HTTPException(status_code=400, detail="user_id is required")
+    auth.authorize_user(request, user_id)
+    rows = supabase.table("usage_digests") \
+        .select("period_start, total_seconds, tasks_tracked, top_apps, goals_set, goals_met, streak") \
+        .eq("user_id", user_id) \
+        .eq("period", period) \
+        .order("period_start", desc=True) \
+        .limit(min(max(limit, 1), 100)) \
+        .execute()
+    return {"user_id": user_id, "period": period, "digests": rows.data or []}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build usage digests for every user")
+    parser.add_argument("--period", choices=PERIODS, default="day")
+    parser.add_argument("--date", default=None, help="YYYY-MM-DD (default: yesterday / last week)")
+    parser.add_argument("--restart", action="store_true", help="rebuild even if finished or leased")
+    parser.add_argument("--chunk-users", type=int, default=CHUNK_USERS)
+    args = parser.parse_args()
+
+    app_logging.setup_logging()
+    day = date.fromisoformat(args.date) if args.date else dict(due(datetime.now()))[args.period]
+    users = build(args.period, day, args.restart, args.chunk_users)
+    if users is None:
+        print(f"[DIGEST] {args.period} {period_start(args.period, day)} is finished or running elsewhere; "
+              f"use --restart to rebuild")
+    else:
+        print(f"[DIGEST] {args.period} {period_start(args.period, day)}: {users} users")
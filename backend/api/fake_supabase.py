@@ -0,0 +1,497 @@
+# fake_supabase.py
+# In-memory stand-in for the subset of the Supabase client the API uses, so
+# benchmarks can run offline. install() replaces the `db` module and has to
+# run before main (or any module importing db) is imported:
+#
+#     import fake_supabase
+#     client = fake_supabase.install()
+#     import main
+import copy
+import itertools
+import re
+import sys
+import types
+from datetime import date, datetime, timedelta, timezone
+
+
+class Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _split_columns(columns):
+    parts, depth, current = [], 0, ""
+    for char in columns:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _parse_select(columns):
+    # "id, tasks!inner(user_id)" -> (["id"], {"tasks": (True, "user_id")})
+    fields, embeds = [], {}
+    for part in _split_columns(columns):
+        if "(" in part:
+            name, inner = part.split("(", 1)
+            name, _, hint = name.partition("!")
+            embeds[name.strip()] = (hint == "inner", inner[:-1])
+        else:
+            fields.append(part)
+    return fields, embeds
+
+
+def _get(row, column):
+    for key in column.split("."):
+        if not isinstance(row, dict):
+            return None
+        row = row.get(key)
+    return row
+
+
+def _cast(value, like):
+    if isinstance(like, bool):
+        return value in (True, "true", "True")
+    if isinstance(like, int) and isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _target_seconds(hours_perday):
+    # task_target_seconds() in schema.sql.
+    hours = str(hours_perday or "0").strip()
+    if re.fullmatch(r"[0-9]+(\.[0-9]+)?", hours):
+        return round(float(hours) * 3600)
+    h, m, sec = (hours.split(":") + ["0", "0"])[:3]
+    return int(h) * 3600 + int(m) * 60 + round(float(sec))
+
+
+OPERATORS = {
+    "eq": lambda a, b: a == _cast(b, a),
+    "neq": lambda a, b: a != _cast(b, a),
+    "gt": lambda a, b: a is not None and a > _cast(b, a),
+    "gte": lambda a, b: a is not None and a >= _cast(b, a),
+    "lt": lambda a, b: a is not None and a < _cast(b, a),
+    "lte": lambda a, b: a is not None and a <= _cast(b, a),
+    "in": lambda a, b: a in [_cast(v, a) for v in b],
+    "is": lambda a, b: a is None if b in (None, "null") else a == b,
+    "ilike": lambda a, b: a is not None and b.strip("%").lower() in str(a).lower(),
+}
+
+
+class Query:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.filters = []
+        self.orders = []
+        self.row_limit = None
+        self.row_offset = 0
+        self.single_mode = None
+        self.payload = None
+        self.on_conflict = "id"
+        self.count = None
+
+    def select(self, columns="*", count=None):
+        if self.op == "select":
+            self.columns = columns
+        self.count = count
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def upsert(self, rows, on_conflict="id", ignore_duplicates=False, **kwargs):
+        self.op, self.payload, self.on_conflict = "upsert", rows, on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def _filter(self, op, column, value):
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def neq(self, column, value):
+        return self._filter("neq", column, value)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def in_(self, column, values):
+        return self._filter("in", column, list(values))
+
+    def is_(self, column, value):
+        return self._filter("is", column, value)
+
+    def ilike(self, column, pattern):
+        return self._filter("ilike", column, pattern)
+
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def range(self, start, end):
+        self.row_offset, self.row_limit = start, end - start + 1
+        return self
+
+    def maybe_single(self):
+        self.single_mode = "maybe"
+        return self
+
+    def single(self):
+        self.single_mode = "one"
+        return self
+
+    def _matches(self, row):
+        return all(OPERATORS[op](_get(row, column), value) for column, op, value in self.filters)
+
+    def _embed(self, row, embeds):
+        for name, (inner, _) in embeds.items():
+            key = row.get(name[:-1] + "_id")
+            row[name] = self.db.tables.get(name, {}).get(key)
+            if inner and row[name] is None:
+                return None
+        return row
+
+    def _project(self, row, fields, embeds):
+        if fields == ["*"] or not fields and not embeds:
+            projected = dict(row)
+        else:
+            projected = {f: row.get(f) for f in fields if f != "*"}
+        for name, (_, inner) in embeds.items():
+            nested = row[name]
+            if nested is not None and inner.strip() != "*":
+                nested = {c.strip(): nested.get(c.strip()) for c in inner.split(",")}
+            projected[name] = nested
+        return copy.deepcopy(projected)
+
+    def _select(self):
+        fields, embeds = _parse_select(self.columns)
+        rows = []
+        for row in self.db.tables.get(self.table, {}).values():
+            row = self._embed(dict(row), embeds)
+            if row is not None and self._matches(row):
+                rows.append(row)
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda r: (_get(r, column) is None, _get(r, column)), reverse=desc)
+        total = len(rows)
+        end = None if self.row_limit is None else self.row_offset + self.row_limit
+        rows = [self._project(r, fields, embeds) for r in rows[self.row_offset:end]]
+        return rows, total
+
+    def execute(self):
+        table = self.db.tables.setdefault(self.table, {})
+        if self.op == "select":
+            rows, total = self._select()
+            if self.single_mode:
+                if not rows:
+                    return None if self.single_mode == "maybe" else Result(None)
+                return Result(rows[0])
+            return Result(rows, total if self.count else None)
+        if self.op == "insert":
+            rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            inserted = []
+            for row in rows:
+                row = copy.deepcopy(row)
+                row.setdefault("id", next(self.db.ids[self.table]))
+                table[row["id"]] = row
+                inserted.append(copy.deepcopy(row))
+            return Result(inserted)
+        if self.op == "upsert":
+            rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            keys = [k.strip() for k in self.on_conflict.split(",")]
+            index = {tuple(r.get(k) for k in keys): pk for pk, r in table.items()}
+            written = []
+            for row in rows:
+                key = tuple(row.get(k) for k in keys)
+                pk = index.get(key)
+                if pk is None:
+                    pk = row.get("id") or next(self.db.ids[self.table])
+                    table[pk] = dict(copy.deepcopy(row), id=pk)
+                    index[key] = pk
+                elif self.ignore_duplicates:
+                    continue
+                else:
+                    table[pk].update(copy.deepcopy(row))
+                written.append(row)
+            return Result(copy.deepcopy(written))
+        matched = [pk for pk, row in table.items() if self._matches(row)]
+        if self.op == "update":
+            for pk in matched:
+                table[pk].update(copy.deepcopy(self.payload))
+            return Result([copy.deepcopy(table[pk]) for pk in matched])
+        if self.op == "delete":
+            return Result([table.pop(pk) for pk in matched])
+        raise ValueError(f"Unsupported operation {self.op}")
+
+
+class RPC:
+    def __init__(self, db, name, params):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self):
+        return Result(getattr(self.db, "rpc_" + self.name)(**self.params))
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.ids = {}
+        self.postgrest = types.SimpleNamespace(session=types.SimpleNamespace(
+            event_hooks={"request": [], "response": []}))
+
+    def table(self, name):
+        self.ids.setdefault(name, itertools.count(1))
+        return Query(self, name)
+
+    def rpc(self, name, params):
+        return RPC(self, name, params)
+
+    def rpc_increment_usage_totals(self, p_rows):
+        totals = self.tables.setdefault("usage_totals", {})
+        for row in p_rows:
+            day = date.fromisoformat(row["day"])
+            starts = {"day": row["day"], "week": (day - timedelta(days=day.weekday())).isoformat()}
+            for task_id in (row["task_id"], 0):
+                for period, start in starts.items():
+                    key = (row["user_id"], task_id, period, start)
+                    entry = totals.setdefault(key, {
+                        "user_id": row["user_id"], "task_id": task_id,
+                        "period": period, "period_start": start, "seconds": 0})
+                    entry["seconds"] += row["seconds"]
+
+    def rpc_increment_usage_hours(self, p_rows):
+        tiles = self.tables.setdefault("usage_hours", {})
+        for row in p_rows:
+            for task_id in (row["task_id"], 0):
+                key = (row["user_id"], task_id, row["week"])
+                tile = tiles.setdefault(key, {
+                    "user_id": row["user_id"], "task_id": task_id, "week_start": row["week"], "seconds": [0] * 168})
+                tile["seconds"][row["cell"]] += row["seconds"]
+
+    def rpc_usage_heatmap(self, p_user_id, p_task_id, p_from, p_to):
+        weeks = {}
+        for tile in self.tables.get("usage_hours", {}).values():
+            if p_user_id is None:
+                wanted = tile["task_id"] == 0
+            else:
+                wanted = (tile["user_id"], tile["task_id"]) == (p_user_id, p_task_id)
+            if not wanted or not p_from <= tile["week_start"] <= p_to:
+                continue
+            total = weeks.setdefault(tile["week_start"], [0] * 168)
+            for cell, seconds in enumerate(tile["seconds"]):
+                total[cell] += seconds
+        return [{"week_start": week, "seconds": weeks[week]} for week in sorted(weeks)]
+
+    def rpc_extend_focus_sessions(self, p_task_id, p_user_id, p_day, p_pieces, p_gap, p_clip=False):
+        row = self.tables.setdefault("focus_sessions", {}).setdefault((p_task_id, p_day), {
+            "task_id": p_task_id, "day": p_day, "user_id": p_user_id, "starts": [], "ends": [], "active": []})
+        for ps, pe in p_pieces:
+            s, e, a, kept = ps, pe, pe - ps, []
+            for session in zip(row["starts"], row["ends"], row["active"]):
+                if session[1] + p_gap < s or session[0] - p_gap > e:
+                    kept.append(session)
+                else:
+                    overlap = max(0, min(pe, session[1]) - max(ps, session[0])) if p_clip else 0
+                    s, e, a = min(s, session[0]), max(e, session[1]), a + session[2] - overlap
+            kept = sorted(kept + [(s, e, a)])
+            row["starts"], row["ends"], row["active"] = ([k[i] for k in kept] for i in range(3))
+
+    def rpc_claim_agent_seq(self, p_agent_id, p_seq):
+        cursors = self.tables.setdefault("agent_cursors", {})
+        cursor = cursors.setdefault(p_agent_id, {"agent_id": p_agent_id, "high_water": -1, "seen_mask": 0})
+        hw, mask = cursor["high_water"], cursor["seen_mask"]
+        if p_seq > hw:
+            mask = ((mask << (p_seq - hw)) & ((1 << 64) - 1) if p_seq - hw < 64 else 0) | 1
+            hw = p_seq
+        elif hw - p_seq >= 64 or (mask >> (hw - p_seq)) & 1:
+            return False
+        else:
+            mask |= 1 << (hw - p_seq)
+        cursor.update(high_water=hw, seen_mask=mask)
+        return True
+
+    def rpc_release_agent_seq(self, p_agent_id, p_seq):
+        cursor = self.tables.get("agent_cursors", {}).get(p_agent_id)
+        if cursor and 0 <= cursor["high_water"] - p_seq < 64:
+            cursor["seen_mask"] &= ~(1 << (cursor["high_water"] - p_seq))
+
+
+    def rpc_admin_user_summary(self, p_sort="name", p_desc=False, p_search=None, p_role="user",
+                               p_today=None, p_after_num=None, p_after_text=None, p_after_id=None,
+                               p_limit=50):
+        # Counts come straight from tasks here; Postgres reads user_task_counts.
+        today = date.fromisoformat(p_today) if p_today else date.today()
+        week = (today - timedelta(days=today.weekday())).isoformat()
+        totals = self.tables.get("usage_totals", {})
+        counts = {}
+        for task in self.tables.get("tasks", {}).values():
+            c = counts.setdefault(task.get("user_id"), [0, 0, 0])
+            c[0] += 1
+            c[1] += bool(task.get("is_active"))
+            c[2] += bool(task.get("status"))
+        rows = []
+        for profile in self.tables.get("profiles", {}).values():
+            if p_role is not None and profile.get("role") != p_role:
+                continue
+            name = profile.get("full_name") or ""
+            if p_search and p_search.lower() not in name.lower():
+                continue
+            tasks, active, done = counts.get(profile["id"], (0, 0, 0))
+            row = {
+                "id": profile["id"], "full_name": profile.get("full_name"), "role": profile.get("role"),
+                "tracker_installed": profile.get("tracker_installed"),
+                "tasks": tasks, "active_tasks": active, "done_tasks": done,
+                "today_seconds": totals.get((profile["id"], 0, "day", today.isoformat()), {}).get("seconds", 0),
+                "week_seconds": totals.get((profile["id"], 0, "week", week), {}).get("seconds", 0),
+            }
+            row["sort_num"] = {"tasks": tasks, "active": active, "today": row["today_seconds"],
+                               "week": row["week_seconds"]}.get(p_sort, 0)
+            row["sort_text"] = name.lower() if p_sort == "name" else ""
+            rows.append(row)
+        key = lambda r: (r["sort_num"], r["sort_text"], r["id"])
+        if p_after_id is not None:
+            after = (p_after_num, p_after_text, p_after_id)
+            rows = [r for r in rows if (key(r) < after if p_desc else key(r) > after)]
+        rows.sort(key=key, reverse=p_desc)
+        return rows[:p_limit]
+
+    def rpc_search_tasks(self, p_terms, p_user_id=None, p_status=None, p_is_active=None,
+                         p_after_score=None, p_after_id=None, p_limit=20):
+        # Scores each term by the best field it prefixes, using Postgres's
+        # default weights (A = title 1.0, B = appname 0.4); not ts_rank itself.
+        rows = []
+        for task in self.tables.get("tasks", {}).values():
+            if p_user_id is not None and task.get("user_id") != p_user_id:
+                continue
+            if p_status is not None and bool(task.get("status")) != p_status:
+                continue
+            if p_is_active is not None and bool(task.get("is_active")) != p_is_active:
+                continue
+            fields = [(1.0, re.findall(r"\w+", (task.get("title") or "").lower())),
+                      (0.4, re.findall(r"\w+", (task.get("appname") or "").lower()))]
+            weights = [max((w for w, words in fields if any(word.startswith(t) for word in words)), default=0)
+                       for t in p_terms]
+            if not all(weights):
+                continue
+            rows.append({"task": copy.deepcopy(task), "score": int(sum(weights) / len(weights) * 100000)})
+        key = lambda r: (r["score"], r["task"]["id"])
+        if p_after_id is not None:
+            rows = [r for r in rows if key(r) < (p_after_score, p_after_id)]
+        rows.sort(key=key, reverse=True)
+        return rows[:p_limit]
+
+
+    def rpc_apply_alert_increment(self, p_task_id, p_day, p_thresholds):
+        task = self.tables.get("tasks", {}).get(p_task_id)
+        target = _target_seconds((task or {}).get("hours_perday"))
+        if not task or target <= 0:
+            return []
+        state = self.tables.setdefault("alert_state", {}).setdefault(
+            p_task_id, {"task_id": p_task_id, "day": p_day, "fired": 0})
+        if p_day < state["day"]:
+            return []
+        totals = self.tables.get("usage_totals", {})
+        day_total = lambda day: totals.get((task["user_id"], p_task_id, "day", day), {}).get("seconds", 0)
+        events = []
+        if p_day > state["day"]:
+            if day_total(state["day"]) < target:
+                events.append(("goal_missed", state["day"], 100, day_total(state["day"])))
+            state.update(day=p_day, fired=0)
+        total = day_total(p_day)
+        for i, threshold in enumerate(p_thresholds):
+            if not state["fired"] & (1 << i) and total * 100 >= target * threshold:
+                state["fired"] |= 1 << i
+                kind = "goal_progress" if threshold < 100 else "goal_reached" if threshold == 100 else "over_budget"
+                events.append((kind, p_day, threshold, total))
+        outbox = self.tables.setdefault("alert_outbox", {})
+        ids = self.ids.setdefault("alert_outbox", itertools.count(1))
+        rows = []
+        for kind, day, threshold, seconds in events:
+            row = {"id": next(ids), "user_id": task["user_id"], "task_id": p_task_id, "kind": kind, "day": day,
+                   "threshold": threshold, "seconds": seconds, "target_seconds": target}
+            outbox[row["id"]] = row
+            rows.append(copy.deepcopy(row))
+        return rows
+
+    def rpc_claim_digest_run(self, p_period, p_period_start, p_lease_seconds, p_restart=False):
+        now = datetime.now(timezone.utc)
+        runs = self.tables.setdefault("digest_runs", {})
+        run = runs.setdefault((p_period, p_period_start), {
+            "period": p_period, "period_start": p_period_start, "last_user_id": None, "users": 0,
+            "lease_until": datetime.fromtimestamp(0, timezone.utc), "finished_at": None})
+        if not p_restart and (run["finished_at"] or run["lease_until"] >= now):
+            return []
+        if p_restart:
+            run.update(last_user_id=None, users=0)
+        run.update(lease_until=now + timedelta(seconds=p_lease_seconds), finished_at=None)
+        return [dict(run)]
+
+    def rpc_checkpoint_digest_run(self, p_period, p_period_start, p_last_user_id, p_users, p_lease_seconds,
+                                  p_finished=False):
+        now = datetime.now(timezone.utc)
+        self.tables["digest_runs"][(p_period, p_period_start)].update(
+            last_user_id=p_last_user_id, users=p_users, lease_until=now + timedelta(seconds=p_lease_seconds),
+            finished_at=now if p_finished else None)
+
+    def rpc_digest_usage(self, p_period, p_period_start, p_after, p_users):
+        rows = sorted((key[0], key[1], entry["seconds"]) for key, entry in self.tables.get("usage_totals", {}).items()
+                      if key[2] == p_period and key[3] == p_period_start and key[1] != 0
+                      and (p_after is None or key[0] > p_after))
+        users = sorted({user_id for user_id, _, _ in rows})[:p_users]
+        rows = [row for row in rows if users and row[0] <= users[-1]]
+        tasks = self.tables.get("tasks", {})
+        digests = self.tables.get("usage_digests", {})
+        days = 7 if p_period == "week" else 1
+        previous = (date.fromisoformat(p_period_start) - timedelta(days=days)).isoformat()
+        streaks = {d["user_id"]: d["streak"] for d in digests.values()
+                   if d["period"] == p_period and d["period_start"] == previous}
+        return {
+            "users": users,
+            "counts": [sum(1 for row in rows if row[0] == user_id) for user_id in users],
+            "prev_streak": [streaks.get(user_id, 0) for user_id in users],
+            "seconds": [row[2] for row in rows],
+            "app": [(tasks.get(row[1]) or {}).get("appname") for row in rows],
+            "target": [_target_seconds((tasks.get(row[1]) or {}).get("hours_perday")) for row in rows],
+        }
+
+def install(client=None):
+    client = client or FakeSupabase()
+    sys.modules["db"] = types.SimpleNamespace(supabase=client)
+    return client
@@ -0,0 +1,115 @@
+# fleet_telemetry.py
+# Stores the self-telemetry agents attach to usage samples (see
+# tracker/tracker_telemetry.py) and summarises it across the fleet. Each agent
+# keeps one row in agent_telemetry holding its latest report; the admin
+# endpoint reads the reports of agents seen in the last `hours` and returns
+# p50/p90/p99/max per field.
+import logging
+import math
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends
+
+import metrics
+from auth import require_admin
+from db import supabase
+from usage_store import task_owner
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+FIELDS = (
+    "rss_mb", "cpu_s", "cpu_pct", "samples", "matched", "match_ms_p50", "match_ms_max",
+    "uploads", "upload_failures", "upload_ms_p50", "upload_ms_max", "task_fetch_failures",
+    "tasks_age_s", "spool"
+)
+PERCENTILES = (50, 90, 99)
+MAX_VALUE = 1e9
+MAX_SPAN_SECONDS = 7 * 86400
+PAGE_SIZE = 1000
+
+TELEMETRY_REPORTS = metrics.Counter("api_agent_telemetry_reports_total", "Agent telemetry reports received")
+
+
+def _number(value, limit=MAX_VALUE):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) \
+        and math.isfinite(value) and 0 <= value <= limit
+
+
+def _clean(report):
+    # Only known, bounded numeric fields are kept, so an agent cannot grow the
+    # row. Returns None for a report without a valid window length.
+    if not _number(report.get("span_s"), MAX_SPAN_SECONDS):
+        return None
+    cleaned = {"span_s": report["span_s"]}
+    for field in FIELDS:
+        value = report.get(field)
+        if _number(value):
+            cleaned[field] = value
+    return cleaned
+
+
+def record(agent_id, task_id, report):
+    report = _clean(report) if isinstance(report, dict) else None
+    if report is None:
+        return
+    TELEMETRY_REPORTS.inc()
+    try:
+        supabase.table("agent_telemetry").upsert({
+            "agent_id": agent_id,
+            "user_id": task_owner(task_id),
+            "reported_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "report": report
+        }, on_conflict="agent_id").execute()
+    except Exception:
+        logger.warning("Could not store telemetry from agent %s", agent_id, exc_info=True)
+
+
+def latest_reports(hours=24):
+    since = (datetime.now() - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+    last_id = None
+    while True:
+        query = supabase.table("agent_telemetry").select("agent_id, report").gte("reported_at", since)
+        if last_id is not None:
+            query = query.gt("agent_id", last_id)
+        rows = query.order("agent_id").limit(PAGE_SIZE).execute().data or []
+        for row in rows:
+            yield row["report"] or {}
+        if len(rows) < PAGE_SIZE:
+            return
+        last_id = rows[-1]["agent_id"]
+
+
+def percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(reports):
+    values = {field: [] for field in FIELDS}
+    agents = uploads = failures = 0
+    for report in reports:
+        agents += 1
+        uploads += report.get("uploads") or 0
+        failures += report.get("upload_failures") or 0
+        for field in FIELDS:
+            if report.get(field) is not None:
+                values[field].append(report[field])
+
+    fields = {}
+    for field, observed in values.items():
+        if not observed:
+            continue
+        observed.sort()
+        fields[field] = {f"p{p}": percentile(observed, p) for p in PERCENTILES}
+        fields[field]["max"] = observed[-1]
+    return {
+        "agents": agents,
+        "upload_failure_rate": round(failures / uploads, 4) if uploads else None,
+        "fields": fields
+    }
+
+
+@router.get("/admin/fleet-telemetry", dependencies=[Depends(require_admin)])
+def fleet_telemetry(hours: int = 24):
+    return {"hours": hours, **summarize(latest_reports(hours))}
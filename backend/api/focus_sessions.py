@@ -0,0 +1,95 @@
+# focus_sessions.py
+# Focus sessions per task and day, segmented as usage is ingested. Each
+# sample's newly credited time is merged by extend_focus_sessions() (see
+# schema.sql) into the day's focus_sessions row: time within
+# FOCUS_GAP_SECONDS (default 120) of a session extends it, anything further
+# away starts a new one. A row is three arrays (start, end, active seconds
+# per session), so a day costs a few hundred bytes and a sample one update.
+#
+#   GET /tasks/{task_id}/sessions?until=YYYY-MM-DD&days=7
+#       {"task_id", "gap_seconds", "longest_seconds",
+#        "days": [{"day", "count", "interruptions", "focus_seconds",
+#                  "longest_seconds", "sessions": [{"start", "end",
+#                  "active_seconds", "away_seconds"}]}]}
+#
+# `interruptions` counts breaks between sessions; `away_seconds` is time
+# inside a session spent briefly in other apps.
+import logging
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+
+from fastapi import APIRouter, HTTPException, Request
+
+import auth
+from db import supabase
+from intervals import split_by_day
+from usage_store import task_owner
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+GAP_SECONDS = int(os.getenv("FOCUS_GAP_SECONDS", "120"))
+MAX_DAYS = 92
+
+
+def record(user_id, task_id, pieces, placed=False):
+    # pieces: the [start, end) intervals a sample newly credited; placed when
+    # they are a plain sample's seconds put at "now", which can overlap time
+    # already in a session. Failures are logged, not raised: the usage itself
+    # has already been stored.
+    by_day = defaultdict(list)
+    for start, end in sorted(pieces):
+        for day, s, e in split_by_day(start, end):
+            by_day[day].append([s, e])
+    for day, day_pieces in by_day.items():
+        try:
+            supabase.rpc("extend_focus_sessions", {
+                "p_task_id": task_id, "p_user_id": user_id, "p_day": day,
+                "p_pieces": day_pieces, "p_gap": GAP_SECONDS, "p_clip": placed
+            }).execute()
+        except Exception as e:
+            logger.warning("Focus sessions update failed for task %s on %s: %s", task_id, day, e)
+
+
+def _day(row):
+    sessions = [
+        # max(): rows written before overlapping pieces were clipped can hold
+        # more active time than the session spans.
+        {"start": s, "end": e, "active_seconds": min(a, e - s), "away_seconds": max(e - s - a, 0)}
+        for s, e, a in zip(row["starts"], row["ends"], row["active"])
+    ]
+    return {
+        "day": row["day"],
+        "count": len(sessions),
+        "interruptions": max(len(sessions) - 1, 0),
+        "focus_seconds": sum(s["active_seconds"] for s in sessions),
+        "longest_seconds": max((s["end"] - s["start"] for s in sessions), default=0),
+        "sessions": sessions
+    }
+
+
+@router.get("/tasks/{task_id}/sessions")
+def task_sessions(task_id: int, request: Request, until: str = None, days: int = 7):
+    auth.authorize_task(request, task_id)
+    if task_owner(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    try:
+        last = date.fromisoformat(until) if until else date.today()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="until must be YYYY-MM-DD")
+    first = last - timedelta(days=min(max(days, 1), MAX_DAYS) - 1)
+    rows = supabase.table("focus_sessions") \
+        .select("day, starts, ends, active") \
+        .eq("task_id", task_id) \
+        .gte("day", first.isoformat()) \
+        .lte("day", last.isoformat()) \
+        .order("day") \
+        .execute()
+    result = [_day(row) for row in rows.data or []]
+    return {
+        "task_id": task_id,
+        "gap_seconds": GAP_SECONDS,
+        "longest_seconds": max((d["longest_seconds"] for d in result), default=0),
+        "days": result
+    }
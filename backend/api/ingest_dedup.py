@@ -0,0 +1,48 @@
+# ingest_dedup.py
+# Exactly-once accounting for agent retries. Each agent numbers its samples
+# (agent_id, seq); agent_cursors keeps the highest seq seen plus a 64-bit mask
+# of the seqs just below it, so a late or repeated sample is recognised
+# without reading screen_time. claim_agent_seq() does the check-and-set
+# atomically; the local copy only short-circuits seqs already claimed here.
+from db import supabase
+
+WINDOW = 64
+
+_cursors = {}
+
+
+def _is_marked(cursor, seq):
+    high_water, mask = cursor
+    if seq > high_water:
+        return False
+    if high_water - seq >= WINDOW:
+        return True
+    return bool((mask >> (high_water - seq)) & 1)
+
+
+def _mark(cursor, seq):
+    high_water, mask = cursor
+    if seq > high_water:
+        shift = seq - high_water
+        mask = (mask << shift) & ((1 << WINDOW) - 1) if shift < WINDOW else 0
+        cursor[0], cursor[1] = seq, mask | 1
+    elif high_water - seq < WINDOW:
+        cursor[1] = mask | (1 << (high_water - seq))
+
+
+def claim(agent_id, seq):
+    # True if this (agent_id, seq) has not been applied before and is now reserved.
+    cursor = _cursors.setdefault(agent_id, [-1, 0])
+    if _is_marked(cursor, seq):
+        return False
+    res = supabase.rpc("claim_agent_seq", {"p_agent_id": agent_id, "p_seq": seq}).execute()
+    _mark(cursor, seq)
+    return bool(res.data)
+
+
+def release(agent_id, seq):
+    # Undo a claim whose usage write failed, so the agent's retry is accepted.
+    supabase.rpc("release_agent_seq", {"p_agent_id": agent_id, "p_seq": seq}).execute()
+    cursor = _cursors.get(agent_id)
+    if cursor and 0 <= cursor[0] - seq < WINDOW:
+        cursor[1] &= ~(1 << (cursor[0] - seq))
@@ -0,0 +1,70 @@
+# intervals.py
+# Sorted, coalesced set of [start, end) intervals. Overlapping usage reported
+# by several agents for the same task is credited once: add() returns only the
+# seconds that were not already covered.
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+
+class IntervalSet:
+    def __init__(self, intervals=()):
+        # intervals must already be sorted and disjoint (as produced by to_list()).
+        self.starts = [s for s, _ in intervals]
+        self.ends = [e for _, e in intervals]
+
+    @classmethod
+    def from_unsorted(cls, intervals):
+        merged = cls()
+        for start, end in sorted(intervals):
+            merged.add(start, end)
+        return merged
+
+    def add(self, start, end):
+        if end <= start:
+            return 0
+        # Intervals i..j-1 overlap or touch [start, end).
+        i = bisect_left(self.ends, start)
+        j = bisect_right(self.starts, end)
+        if i == j:
+            self.starts.insert(i, start)
+            self.ends.insert(i, end)
+            return end - start
+        covered = sum(self.ends[k] - self.starts[k] for k in range(i, j))
+        new_start = min(start, self.starts[i])
+        new_end = max(end, self.ends[j - 1])
+        self.starts[i:j] = [new_start]
+        self.ends[i:j] = [new_end]
+        return (new_end - new_start) - covered
+
+    def gaps(self, start, end):
+        # The parts of [start, end) not covered yet, as [s, e) pairs.
+        i = bisect_right(self.ends, start)
+        gaps = []
+        while start < end:
+            if i == len(self.starts) or self.starts[i] >= end:
+                gaps.append([start, end])
+                break
+            if self.starts[i] > start:
+                gaps.append([start, self.starts[i]])
+            start = max(start, self.ends[i])
+            i += 1
+        return gaps
+
+    def total(self):
+        return sum(e - s for s, e in zip(self.starts, self.ends))
+
+    def to_list(self):
+        return [[s, e] for s, e in zip(self.starts, self.ends)]
+
+    def __len__(self):
+        return len(self.starts)
+
+
+def split_by_day(start, end):
+    # Yields (date, start, end) pieces of an epoch-seconds interval, cut at local midnight.
+    while start < end:
+        day = datetime.fromtimestamp(start)
+        midnight = datetime(day.year, day.month, day.day) + timedelta(days=1)
+        piece_end = min(end, int(midnight.timestamp()))
+        yield day.strftime("%Y-%m-%d"), start, piece_end
+        start = piece_end
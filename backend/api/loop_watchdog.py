@@ -0,0 +1,97 @@
+# loop_watchdog.py
+# Measures event-loop lag and catches blocking calls. A coroutine wakes every
+# `interval` seconds and records how late it was; a separate thread watches
+# that heartbeat and, when the loop has not come back for `threshold`
+# seconds, captures the loop thread's current stack — the code doing the
+# blocking.
+#
+# In tests:
+#     async with LoopWatchdog(threshold=0.05, raise_on_block=True):
+#         await exercise_endpoint()
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from fastapi import APIRouter, Depends
+
+import metrics
+from auth import require_admin
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = metrics.Histogram(
+    "api_event_loop_lag_seconds", "Delay between a scheduled and an actual loop wake-up", (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+LOOP_BLOCKS = metrics.Counter("api_event_loop_blocks_total", "Times the loop was blocked past the threshold")
+
+_recent = deque(maxlen=50)
+
+
+class LoopWatchdog:
+    def __init__(self, interval=0.05, threshold=0.25, raise_on_block=False):
+        self.interval = interval
+        self.threshold = threshold
+        self.raise_on_block = raise_on_block
+        self.events = []
+        self._running = False
+
+    def start(self):
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._running = True
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._task.cancel()
+
+    async def _tick(self):
+        while self._running:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            LOOP_LAG.observe(max(now - start - self.interval, 0))
+            self._heartbeat = now
+
+    def _watch(self):
+        reported = None
+        while self._running:
+            time.sleep(self.interval)
+            beat = self._heartbeat
+            stalled = time.perf_counter() - beat - self.interval
+            if stalled < self.threshold or beat == reported:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            event = {
+                "at": time.time(),
+                "blocked_for": round(stalled, 3),
+                "stack": "".join(traceback.format_stack(frame)) if frame else ""
+            }
+            self.events.append(event)
+            _recent.append(event)
+            LOOP_BLOCKS.inc()
+            logger.warning("Event loop blocked for %.3fs", stalled, extra={"stack": event["stack"]})
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Give the watcher one more look before stopping.
+        await asyncio.sleep(self.interval * 2)
+        self.stop()
+        if self.raise_on_block and self.events and exc is None:
+            raise AssertionError(f"Event loop blocked {len(self.events)} time(s):\n{self.events[0]['stack']}")
+
+
+@router.get("/admin/loop-blocks", dependencies=[Depends(require_admin)])
+def loop_blocks():
+    return list(_recent)
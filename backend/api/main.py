@@ -1,16 +1,50 @@
-from fastapi import FastAPI, WebSocket, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-from supabase import create_client
+from fastapi.responses import PlainTextResponse
 import uvicorn
 import os
 import subprocess
 import asyncio
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+import app_logging
+import logging
+from db import supabase
+from usage_store import add_seconds, add_interval, prune_intervals, task_owner, without_intervals
+from intervals import split_by_day
+import usage_export
+import usage_heatmap
+import usage_totals
+import ingest_dedup
+import metrics
+import tracing
+import profiler
+import loop_watchdog
+import fleet_telemetry
+import auth
+import rate_limit
+import tasks_api
+import admin_summary
+import app_registry
+import usage_stream
+import task_search
+import task_progress
+import alerts
+import digests
+import focus_sessions
 
-load_dotenv()
+app_logging.setup_logging()
+logger = logging.getLogger("main")
+
+# Bounds for a sample's interval: agents report one INTERVAL_SECONDS sample
+# at a time, starting "now" on their clock, and spool them while offline.
+MAX_SAMPLE_SECONDS = int(os.getenv("INGEST_MAX_SAMPLE_SECONDS", "3600"))
+MAX_SAMPLE_AGE_SECONDS = int(os.getenv("INGEST_MAX_SAMPLE_AGE_SECONDS", str(7 * 86400)))
+MAX_CLOCK_SKEW_SECONDS = int(os.getenv("INGEST_MAX_CLOCK_SKEW_SECONDS", "300"))
 
 app = FastAPI()
+app.add_middleware(rate_limit.RateLimitMiddleware)
+app.add_middleware(auth.AuthMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -18,15 +52,48 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(profiler.ProfilingMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_supabase(supabase)
+tracing.instrument_supabase(supabase)
+app.include_router(usage_export.router)
+app.include_router(usage_totals.router)
+app.include_router(profiler.router)
+app.include_router(loop_watchdog.router)
+app.include_router(fleet_telemetry.router)
+app.include_router(tasks_api.router)
+app.include_router(admin_summary.router)
+app.include_router(app_registry.router)
+app.include_router(usage_stream.router)
+app.include_router(task_search.router)
+app.include_router(task_progress.router)
+app.include_router(alerts.router)
+app.include_router(digests.router)
+app.include_router(usage_heatmap.router)
+app.include_router(focus_sessions.router)
 
-supabase = create_client(
-    os.getenv("NEXT_PUBLIC_SUPABASE_URL"),
-    os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-)
+@app.on_event("startup")
+async def start_background_jobs():
+    profiler.install_signal_handler()
+    auth.start_key_refresh()
+    usage_stream.publisher.start()
+    loop_watchdog.LoopWatchdog(threshold=float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25"))).start()
+    interval = int(os.getenv("USAGE_RECONCILE_INTERVAL", "0"))
+    if interval > 0:
+        asyncio.create_task(usage_totals.reconcile_periodically(interval))
+    digest_interval = int(os.getenv("DIGEST_INTERVAL", "0"))
+    if digest_interval > 0:
+        asyncio.create_task(digests.build_periodically(digest_interval))
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/tracker-installed")
-def tracker_installed(payload: dict):
+def tracker_installed(payload: dict, request: Request):
     user_id = payload["user_id"]
+    auth.authorize_user(request, user_id)
     supabase.table("profiles").update({"tracker_installed": True}).eq("id", user_id).execute()
     return {"status": "ok"}
 
@@ -37,6 +104,7 @@ async def start_tracker(request: Request):
     task_id = data.get("task_id")
     if not app_name or not task_id:
         return {"error": "Missing appname or task_id"}
+    auth.authorize_task(request, task_id)
     subprocess.Popen(["python", "tracker.py", str(task_id), app_name])
     return {"message": f"Started tracking {app_name} for task {task_id}"}
 
@@ -46,6 +114,7 @@ async def stop_tracker(request: Request):
     task_id = data.get("task_id")
     if not task_id:
         return {"error": "Missing task_id"}
+    auth.authorize_task(request, task_id)
     with open(f"stop_{task_id}.flag", "w") as f:
         f.write("stop")
     return {"message": f"Stop flag written for task {task_id}"}
@@ -53,6 +122,64 @@ async def stop_tracker(request: Request):
 @app.post("/update-usage")
 async def update_usage(request: Request):
     data = await request.json()
+    agent_id = data.get("agent_id")
+    seq = data.get("seq")
+    request_span = tracing.current()
+    if request_span:
+        request_span.set("task_id", data.get("task_id"))
+        request_span.set("agent_id", agent_id)
+        request_span.set("seq", seq)
+    auth.authorize_task(request, data.get("task_id"))
+    validate_sample(data)
+    if agent_id:
+        await rate_limit.check_agent(agent_id)
+    if agent_id and seq is not None:
+        if isinstance(seq, bool) or not str(seq).isdigit():
+            raise HTTPException(status_code=400, detail="seq must be a non-negative integer")
+        seq = int(seq)
+        if not ingest_dedup.claim(agent_id, seq):
+            metrics.INGEST_SAMPLES.inc("duplicate")
+            return {"message": f"Duplicate sample {seq} from agent {agent_id}", "duplicate": True}
+        # apply_usage only raises before screen_time is written, so releasing
+        # the claim can't make the retry count the sample twice.
+        try:
+            result = apply_usage(data)
+        except Exception:
+            ingest_dedup.release(agent_id, seq)
+            raise
+    else:
+        result = apply_usage(data)
+    # Agents attach a telemetry report to one sample every few minutes.
+    if agent_id and data.get("telemetry"):
+        fleet_telemetry.record(agent_id, data.get("task_id"), data["telemetry"])
+    return result
+
+def _whole_seconds(data, key):
+    value = data.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).lstrip("-").isdigit():
+        raise HTTPException(status_code=400, detail=f"{key} must be an integer")
+    return int(value)
+
+def validate_sample(data):
+    # Normalizes seconds/start/end in place; a 400 before the seq is claimed
+    # lets nothing unbounded reach split_by_day or the hour cells.
+    if data.get("seconds") is not None:
+        data["seconds"] = _whole_seconds(data, "seconds")
+        if not 0 < data["seconds"] <= MAX_SAMPLE_SECONDS:
+            raise HTTPException(status_code=400, detail=f"seconds must be between 1 and {MAX_SAMPLE_SECONDS}")
+    if data.get("start") is None and data.get("end") is None:
+        return
+    start = data["start"] = _whole_seconds(data, "start")
+    end = data["end"] = _whole_seconds(data, "end")
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > min(data.get("seconds") or MAX_SAMPLE_SECONDS, MAX_SAMPLE_SECONDS):
+        raise HTTPException(status_code=400, detail="interval is longer than the sample")
+    now = time.time()
+    if end > now + MAX_CLOCK_SKEW_SECONDS or start < now - MAX_SAMPLE_AGE_SECONDS:
+        raise HTTPException(status_code=400, detail="interval is too far from the current time")
+
+def apply_usage(data):
     task_id = data.get("task_id")
     app_name = data.get("app_name")
     seconds = data.get("seconds", 60)
@@ -60,59 +187,68 @@ async def update_usage(request: Request):
     date_str = now.strftime("%Y-%m-%d")
     time_str = now.strftime("%H:%M:%S")
 
+    owner = task_owner(task_id)
     result = supabase.table("screen_time").select("id, duration_minutes").eq("task_id", task_id).maybe_single().execute()
+    minutes_list = (result.data.get("duration_minutes") if result and result.data else None) or []
+
+    # Samples with start/end are merged per day, so time already reported by
+    # another agent or tracker for the same task is not counted twice.
+    credited, pieces = {}, []
+    placed = data.get("start") is None or data.get("end") is None
+    if not placed:
+        for day, start, end in split_by_day(data["start"], data["end"]):
+            gaps = add_interval(minutes_list, day, time_str, start, end)
+            credited[day] = sum(e - s for s, e in gaps)
+            pieces += gaps
+    else:
+        add_seconds(minutes_list, date_str, time_str, seconds)
+        credited[date_str] = seconds
+        # Plain samples are the seconds up to now.
+        pieces.append([int(now.timestamp()) - seconds, int(now.timestamp())])
+    # Days no sample can reach any more keep their seconds but not intervals.
+    prune_intervals(minutes_list, (now - timedelta(seconds=MAX_SAMPLE_AGE_SECONDS)).strftime("%Y-%m-%d"))
+    metrics.INGEST_SAMPLES.inc("applied")
+    metrics.INGEST_SECONDS.inc(amount=sum(credited.values()))
+    if not minutes_list:
+        return {"message": f"Nothing to credit for task {task_id}", "credited_seconds": 0}
 
-    if result.data:
-        screen_time_id = result.data["id"]
-        minutes_list = result.data.get("duration_minutes") or []
-        found = False
-        for entry in minutes_list:
-            if entry["date"] == date_str:
-                entry["time"] = time_str
-                entry["seconds"] += seconds
-                found = True
-                break
-        if not found:
-            minutes_list.append({"date": date_str, "time": time_str, "seconds": seconds})
+    if result and result.data:
         supabase.table("screen_time").update({
             "duration_minutes": minutes_list,
             "updated_at": now.strftime("%Y-%m-%d %H:%M:%S")
-        }).eq("id", screen_time_id).execute()
+        }).eq("id", result.data["id"]).execute()
     else:
         supabase.table("screen_time").insert({
             "task_id": task_id,
             "app_name": app_name,
-            "date": date_str,
-            "duration_minutes": [{
-                "date": date_str,
-                "time": time_str,
-                "seconds": seconds
-            }],
+            "date": minutes_list[0]["date"],
+            "duration_minutes": minutes_list,
             "updated_at": now.strftime("%Y-%m-%d %H:%M:%S")
         }).execute()
-    return {"message": f"Screen time updated for task {task_id}"}
-
-@app.websocket("/ws/usage")
-async def websocket_usage(websocket: WebSocket):
-    await websocket.accept()
-    try:
-        while True:
-            result = supabase.table("screen_time") \
-                .select("id, app_name, duration_minutes, updated_at, task_id, tasks!inner(is_active)") \
-                .eq("tasks.is_active", True) \
-                .execute()
-            await websocket.send_json(result.data)
-            await asyncio.sleep(10)
-    except Exception as e:
-        print("WebSocket disconnected:", e)
+
+    # From here on the sample counts as applied: every later write only logs
+    # its failures (usage_totals drift is repaired by usage_totals.py --reconcile).
+    if owner:
+        try:
+            usage_totals.record_many([
+                {"user_id": owner, "task_id": task_id, "day": day, "seconds": added}
+                for day, added in credited.items() if added
+            ])
+        except Exception as e:
+            logger.warning("Usage totals update failed for task %s: %s", task_id, e)
+        usage_heatmap.record(owner, task_id, pieces)
+        focus_sessions.record(owner, task_id, pieces, placed=placed)
+        alerts.evaluate(task_id, [day for day, added in credited.items() if added])
+    return {"message": f"Screen time updated for task {task_id}", "credited_seconds": sum(credited.values())}
 
 @app.get("/screen-time")
-async def get_screen_time(task_id: int, date: str):
+async def get_screen_time(task_id: int, date: str, request: Request):
+    auth.authorize_task(request, task_id)
     result = supabase.table("screen_time").select("id, duration_minutes").eq("task_id", task_id).maybe_single().execute()
     if not result.data:
         return {"duration_minutes": []}
     today_logs = [log for log in result.data["duration_minutes"] if log["date"] == date]
-    return {"duration_minutes": today_logs}
+    return {"duration_minutes": without_intervals(today_logs)}
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000)
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, log_config=None)
@@ -0,0 +1,181 @@
+# metrics.py
+# In-process counters, gauges and histograms rendered in the Prometheus text
+# format. Recording is a dict lookup plus a bisect, cheap enough for every
+# request and every Supabase call.
+#
+#   python metrics.py   # measure the per-request overhead of MetricsMiddleware
+import asyncio
+import contextvars
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = []
+
+# ASGI scope of the request being handled, so Supabase calls can be attributed to a route.
+_current_scope = contextvars.ContextVar("metrics_scope", default=None)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _format_labels(self.labels, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self.values = {}
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self.values.items():
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                running += count
+                yield f"{self.name}_bucket", _format_labels(self.labels + ("le",), labels + (bound,)), running
+            yield f"{self.name}_sum", _format_labels(self.labels, labels), total
+            yield f"{self.name}_count", _format_labels(self.labels, labels), running
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+REQUEST_ERRORS = Counter(
+    "api_request_errors_total", "Requests that raised or returned 5xx", ("method", "route"))
+DB_LATENCY = Histogram(
+    "api_db_call_duration_seconds", "Supabase REST call latency by route and table", ("route", "table", "method"))
+WEBSOCKETS = Gauge("api_websocket_connections", "Open websocket connections", ("path",))
+INGEST_SAMPLES = Counter("api_ingest_samples_total", "Usage samples received by outcome", ("result",))
+INGEST_SECONDS = Counter("api_ingest_credited_seconds_total", "Seconds credited to screen_time")
+
+
+def current_route():
+    scope = _current_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return route.path if route is not None else scope.get("path", "unknown")
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            token = _current_scope.set(scope)
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                _current_scope.reset(token)
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_scope.reset(token)
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - start, scope["method"], route, status[0])
+            if status[0] >= 500:
+                REQUEST_ERRORS.inc(scope["method"], route)
+
+
+def _db_request_started(request):
+    request.extensions["metrics_start"] = time.perf_counter()
+
+
+def _db_response_received(response):
+    request = response.request
+    start = request.extensions.get("metrics_start")
+    if start is None:
+        return
+    table = request.url.path.split("/rest/v1/", 1)[-1]
+    DB_LATENCY.observe(time.perf_counter() - start, current_route(), table, request.method)
+
+
+def instrument_supabase(client):
+    # Times every PostgREST call (supabase.table(...) and supabase.rpc(...)).
+    session = client.postgrest.session
+    hooks = session.event_hooks
+    hooks["request"].append(_db_request_started)
+    hooks["response"].append(_db_response_received)
+    session.event_hooks = hooks
+
+
+if __name__ == "__main__":
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def noop_send(message):
+        pass
+
+    async def bench(app, n):
+        scope = {"type": "http", "method": "GET", "path": "/bench"}
+        start = time.perf_counter()
+        for _ in range(n):
+            await app(dict(scope), None, noop_send)
+        return (time.perf_counter() - start) / n
+
+    n = 200000
+    bare = asyncio.run(bench(endpoint, n))
+    wrapped = asyncio.run(bench(MetricsMiddleware(endpoint), n))
+    print(f"[METRICS] middleware overhead: {(wrapped - bare) * 1e6:.2f} us/request")
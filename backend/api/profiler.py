@@ -0,0 +1,162 @@
+# profiler.py
+# Statistical profiler for a live worker: a background thread snapshots every
+# thread's stack with sys._current_frames() at a fixed interval and counts
+# identical stacks. Output is the collapsed format ("a;b;c 42") read by
+# flamegraph.pl and speedscope.
+#
+#   GET /admin/profile?seconds=10        profile the whole worker
+#   X-Profile: 1 on any request          profile the event loop thread for that
+#                                        request; fetch with GET /admin/profile/{id}
+#   kill -USR2 <pid>                     write a 30s profile to PROFILE_DIR
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from auth import is_admin_key, require_admin
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = 60
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".")
+KEEP_REQUEST_PROFILES = 20
+
+_busy = threading.Lock()
+_request_profiles = OrderedDict()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame, thread_name):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+class Sampler:
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own or (self.thread_id is not None and ident != self.thread_id):
+                continue
+            self.stacks[_collapse(frame, names.get(ident, str(ident)))] += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            time.sleep(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.collapsed()
+
+    def run_for(self, seconds):
+        self.start()
+        time.sleep(seconds)
+        return self.stop()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_for(seconds, interval=DEFAULT_INTERVAL):
+    if not _busy.acquire(blocking=False):
+        return None
+    try:
+        return Sampler(interval).run_for(seconds)
+    finally:
+        _busy.release()
+
+
+def _profile_to_file(seconds=30):
+    output = profile_for(seconds)
+    if output is None:
+        return
+    path = os.path.join(PROFILE_DIR, f"profile-{os.getpid()}-{int(time.time())}.folded")
+    with open(path, "w") as f:
+        f.write(output)
+    logger.info("Wrote profile %s", path)
+
+
+def install_signal_handler():
+    # SIGUSR2 does not exist on Windows; there the HTTP endpoint is the only trigger.
+    # Handlers can only be installed from the main thread.
+    if hasattr(signal, "SIGUSR2") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR2, lambda signum, frame: threading.Thread(
+            target=_profile_to_file, daemon=True).start())
+
+
+class ProfilingMiddleware:
+    # Opt-in per request with "X-Profile: 1" plus a valid X-Admin-Key. Only the
+    # event loop thread is sampled, so concurrent requests on the same loop can
+    # appear in the profile too.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") != b"1" or not is_admin_key(headers.get(b"x-admin-key", b"").decode()):
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex
+        sampler = Sampler(thread_id=threading.get_ident())
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_profiles[profile_id] = sampler.stop()
+            while len(_request_profiles) > KEEP_REQUEST_PROFILES:
+                _request_profiles.popitem(last=False)
+
+
+@router.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_worker(seconds: float = 10, interval_ms: float = DEFAULT_INTERVAL * 1000):
+    seconds = min(max(seconds, 0.1), MAX_SECONDS)
+    output = await asyncio.to_thread(profile_for, seconds, max(interval_ms, 1) / 1000)
+    if output is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(output)
+
+
+@router.get("/admin/profile/{profile_id}", dependencies=[Depends(require_admin)])
+def get_request_profile(profile_id: str):
+    if profile_id not in _request_profiles:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(_request_profiles[profile_id])
@@ -0,0 +1,223 @@
+# rate_limit.py
+# Token-bucket rate limiting and admission control.
+#
+#   RATE_LIMIT_USER    "rate/burst" per user (requests per second / bucket
+#                      size) for every authenticated request, default "20/200"
+#   RATE_LIMIT_AGENT   per tracker agent on /update-usage, default "1/120" so
+#                      an agent can drain its spool after an outage
+#   WS_PER_USER        concurrent live usage connections (/ws/usage and
+#                      /usage/stream) per user, default 5
+#   DB_CONCURRENCY     requests doing database work at once, default 32;
+#                      others wait up to DB_QUEUE_SECONDS (default 2) and then
+#                      get 503. Live usage connections are fed by the shared
+#                      publisher and don't take a slot.
+#   RATE_LIMIT_DB      path of a SQLite file to share buckets between workers
+#                      on one host; buckets are per process when unset. The
+#                      file is used from a worker thread, and while it fails
+#                      (e.g. stays locked) the process's own buckets apply.
+#
+# Limited requests get 429 with Retry-After (1013 close for websockets).
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter as Tally
+
+import anyio
+from fastapi import HTTPException
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_PATHS = {"/metrics", "/docs", "/redoc", "/openapi.json"}
+STREAM_PATHS = {"/usage/stream"}
+IDLE_SECONDS = 3600
+SWEEP_SECONDS = 60
+
+RATE_LIMITED = metrics.Counter("api_rate_limited_total", "Requests rejected by rate limiting or admission", ("scope",))
+RATE_LIMITED_FALLBACK = metrics.Counter(
+    "api_rate_limit_fallbacks_total", "Bucket checks that fell back from RATE_LIMIT_DB to in-process buckets")
+DB_INFLIGHT = metrics.Gauge("api_db_bound_requests", "Requests holding a database admission slot")
+
+
+def parse_limit(spec, default):
+    rate, _, burst = (spec or default).partition("/")
+    return float(rate), float(burst or rate)
+
+
+USER_LIMIT = parse_limit(os.getenv("RATE_LIMIT_USER"), "20/200")
+AGENT_LIMIT = parse_limit(os.getenv("RATE_LIMIT_AGENT"), "1/120")
+WS_PER_USER = int(os.getenv("WS_PER_USER", "5"))
+DB_CONCURRENCY = int(os.getenv("DB_CONCURRENCY", "32"))
+DB_QUEUE_SECONDS = float(os.getenv("DB_QUEUE_SECONDS", "2"))
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self.buckets = {}
+        self.swept = 0.0
+
+    def take(self, key, rate, burst):
+        # Returns 0 when a token was taken, else seconds until one is available.
+        now = time.monotonic()
+        if now - self.swept > SWEEP_SECONDS:
+            self._sweep(now)
+        tokens, last = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        allowed = tokens >= 1
+        self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def _sweep(self, now):
+        # A bucket idle this long has refilled and carries no state.
+        self.swept = now
+        for key, (tokens, last) in list(self.buckets.items()):
+            if now - last > IDLE_SECONDS:
+                del self.buckets[key]
+
+
+class SqliteBuckets:
+    # Same interface as MemoryBuckets, stored in a SQLite file so that every
+    # worker process on the host draws from the same bucket.
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.fallback = MemoryBuckets()
+        self.warned = 0.0
+        self._connection().execute(
+            "create table if not exists buckets (key text primary key, tokens real, updated real)")
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=off")
+            self.local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst):
+        # Blocking; see take() below.
+        try:
+            return self._take(key, rate, burst)
+        except sqlite3.Error as e:
+            RATE_LIMITED_FALLBACK.inc()
+            if time.monotonic() - self.warned > SWEEP_SECONDS:
+                self.warned = time.monotonic()
+                logger.warning("Rate limit database unavailable, using in-process buckets: %s", e)
+            return self.fallback.take(key, rate, burst)
+
+    def _take(self, key, rate, burst):
+        now = time.time()
+        conn = self._connection()
+        conn.execute("begin immediate")
+        try:
+            row = conn.execute("select tokens, updated from buckets where key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            allowed = tokens >= 1
+            conn.execute(
+                "insert into buckets (key, tokens, updated) values (?, ?, ?) "
+                "on conflict (key) do update set tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens - 1 if allowed else tokens, now))
+            conn.execute("commit")
+        except Exception:
+            conn.execute("rollback")
+            raise
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+buckets = SqliteBuckets(os.environ["RATE_LIMIT_DB"]) if os.getenv("RATE_LIMIT_DB") else MemoryBuckets()
+_streams = Tally()
+_db_slots = None
+
+
+def _retry_after(seconds):
+    return str(max(1, math.ceil(seconds)))
+
+
+async def take(key, rate, burst):
+    # SQLite buckets can wait on the file lock, so they run in a worker thread.
+    if isinstance(buckets, SqliteBuckets):
+        return await anyio.to_thread.run_sync(buckets.take, key, rate, burst)
+    return buckets.take(key, rate, burst)
+
+
+async def check_agent(agent_id):
+    wait = await take(f"agent:{agent_id}", *AGENT_LIMIT)
+    if wait:
+        RATE_LIMITED.inc("agent")
+        raise HTTPException(status_code=429, detail="Too many samples from this agent",
+                            headers={"Retry-After": _retry_after(wait)})
+
+
+def _client_key(scope):
+    user = scope.get("state", {}).get("user")
+    if user and user.get("sub"):
+        return f"user:{user['sub']}"
+    if user:
+        return None  # admin key
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else None
+
+
+class RateLimitMiddleware:
+    # Runs inside AuthMiddleware so requests are keyed by the verified user.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or scope["path"] in PUBLIC_PATHS:
+            return await self.app(scope, receive, send)
+        if scope.get("method") == "OPTIONS":
+            return await self.app(scope, receive, send)
+        key = _client_key(scope)
+        if key:
+            wait = await take(key, *USER_LIMIT)
+            if wait:
+                RATE_LIMITED.inc("user")
+                return await self._reject(scope, send, 429, wait)
+        if scope["type"] == "websocket" or scope["path"] in STREAM_PATHS:
+            return await self._stream(scope, receive, send, key)
+
+        global _db_slots
+        if _db_slots is None:
+            _db_slots = asyncio.Semaphore(DB_CONCURRENCY)
+        try:
+            await asyncio.wait_for(_db_slots.acquire(), DB_QUEUE_SECONDS)
+        except asyncio.TimeoutError:
+            RATE_LIMITED.inc("db_admission")
+            return await self._reject(scope, send, 503, 1)
+        DB_INFLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            DB_INFLIGHT.dec()
+            _db_slots.release()
+
+    async def _stream(self, scope, receive, send, key):
+        if key and _streams[key] >= WS_PER_USER:
+            RATE_LIMITED.inc("stream")
+            return await self._reject(scope, send, 429, 5)
+        _streams[key] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _streams[key] -= 1
+            if not _streams[key]:
+                del _streams[key]
+
+    async def _reject(self, scope, send, status, wait):
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1013})
+            return
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"retry-after", _retry_after(wait).encode())]
+        })
+        detail = b"Too many requests" if status == 429 else b"Server busy"
+        await send({"type": "http.response.body", "body": b'{"detail":"' + detail + b'"}'})
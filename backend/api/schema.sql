@@ -0,0 +1,601 @@
+-- schema.sql
+-- Tables and functions used by the backend on top of `tasks`, `profiles`,
+-- `screen_time` and `app_registry` (see README). Run in the Supabase SQL editor.
+
+-- usage_import.py: one row per log file a user imported, keyed by content hash.
+create table if not exists usage_imports (
+  user_id     uuid not null,
+  file_hash   text not null,
+  file_name   text not null,
+  status      text not null default 'complete' check (status in ('pending', 'complete')),
+  imported_at timestamp not null default now(),
+  primary key (user_id, file_hash)
+);
+
+alter table usage_imports add column if not exists status text not null default 'complete'
+  check (status in ('pending', 'complete'));
+-- Older tables were keyed by file_hash alone, so a file was imported for one user only.
+alter table usage_imports drop constraint if exists usage_imports_pkey,
+  add constraint usage_imports_pkey primary key (user_id, file_hash);
+
+-- usage_totals.py: materialized day/week totals. task_id 0 = all of the user's tasks.
+create table if not exists usage_totals (
+  user_id      uuid not null,
+  task_id      bigint not null default 0,
+  period       text not null check (period in ('day', 'week')),
+  period_start date not null,
+  seconds      bigint not null default 0,
+  updated_at   timestamp not null default now(),
+  primary key (user_id, task_id, period, period_start)
+);
+
+-- p_rows: [{"user_id", "task_id", "day", "seconds"}]. Adds each increment to the
+-- task's and the user's day and week rows in a single statement.
+create or replace function increment_usage_totals(p_rows jsonb)
+returns void language sql as $$
+  insert into usage_totals (user_id, task_id, period, period_start, seconds)
+  select r.user_id,
+         t.task_id,
+         p.period,
+         case when p.period = 'day' then r.day else date_trunc('week', r.day)::date end,
+         sum(r.seconds)
+  from jsonb_to_recordset(p_rows) as r(user_id uuid, task_id bigint, day date, seconds bigint)
+  cross join lateral (values (r.task_id), (0::bigint)) as t(task_id)
+  cross join (values ('day'), ('week')) as p(period)
+  group by 1, 2, 3, 4
+  on conflict (user_id, task_id, period, period_start)
+  do update set seconds = usage_totals.seconds + excluded.seconds, updated_at = now();
+$$;
+
+-- ingest_dedup.py: per-agent high-water mark plus a 64-seq window below it
+-- (bit n of seen_mask = high_water - n has been applied).
+create table if not exists agent_cursors (
+  agent_id   text primary key,
+  high_water bigint not null default -1,
+  seen_mask  bigint not null default 0,
+  updated_at timestamp not null default now()
+);
+
+create or replace function claim_agent_seq(p_agent_id text, p_seq bigint)
+returns boolean language plpgsql as $$
+declare
+  hw bigint;
+  mask bigint;
+begin
+  insert into agent_cursors (agent_id) values (p_agent_id) on conflict (agent_id) do nothing;
+  select high_water, seen_mask into hw, mask from agent_cursors where agent_id = p_agent_id for update;
+  if p_seq > hw then
+    mask := case when p_seq - hw >= 64 then 0 else mask << (p_seq - hw)::int end | 1;
+    hw := p_seq;
+  elsif hw - p_seq >= 64 or (mask >> (hw - p_seq)::int) & 1 = 1 then
+    return false;
+  else
+    mask := mask | (1::bigint << (hw - p_seq)::int);
+  end if;
+  update agent_cursors set high_water = hw, seen_mask = mask, updated_at = now() where agent_id = p_agent_id;
+  return true;
+end;
+$$;
+
+create or replace function release_agent_seq(p_agent_id text, p_seq bigint)
+returns void language sql as $$
+  update agent_cursors
+  set seen_mask = seen_mask & ~(1::bigint << (high_water - p_seq)::int), updated_at = now()
+  where agent_id = p_agent_id and high_water - p_seq between 0 and 63;
+$$;
+
+-- fleet_telemetry.py: latest self-telemetry report per tracker agent.
+create table if not exists agent_telemetry (
+  agent_id    text primary key,
+  user_id     uuid,
+  reported_at timestamp not null default now(),
+  report      jsonb not null default '{}'::jsonb
+);
+
+create index if not exists agent_telemetry_reported_at on agent_telemetry (reported_at);
+
+-- admin_summary.py: per-user task counts, kept current by a trigger on tasks.
+create table if not exists user_task_counts (
+  user_id      uuid primary key,
+  tasks        integer not null default 0,
+  active_tasks integer not null default 0,
+  done_tasks   integer not null default 0
+);
+
+create or replace function track_user_task_counts()
+returns trigger language plpgsql as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') and old.user_id is not null then
+    update user_task_counts set
+      tasks        = tasks - 1,
+      active_tasks = active_tasks - coalesce(old.is_active, false)::int,
+      done_tasks   = done_tasks - coalesce(old.status, false)::int
+    where user_id = old.user_id;
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') and new.user_id is not null then
+    insert into user_task_counts (user_id, tasks, active_tasks, done_tasks)
+    values (new.user_id, 1, coalesce(new.is_active, false)::int, coalesce(new.status, false)::int)
+    on conflict (user_id) do update set
+      tasks        = user_task_counts.tasks + 1,
+      active_tasks = user_task_counts.active_tasks + excluded.active_tasks,
+      done_tasks   = user_task_counts.done_tasks + excluded.done_tasks;
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists tasks_user_counts on tasks;
+create trigger tasks_user_counts
+after insert or delete or update of user_id, is_active, status on tasks
+for each row execute function track_user_task_counts();
+
+insert into user_task_counts (user_id, tasks, active_tasks, done_tasks)
+select user_id, count(*), count(*) filter (where is_active), count(*) filter (where status)
+from tasks
+where user_id is not null
+group by user_id
+on conflict (user_id) do update set
+  tasks = excluded.tasks, active_tasks = excluded.active_tasks, done_tasks = excluded.done_tasks;
+
+create index if not exists usage_totals_user_period
+  on usage_totals (period, period_start, task_id, user_id) include (seconds);
+create index if not exists profiles_name on profiles (lower(coalesce(full_name, '')), id);
+-- Keyset orders for the numeric sorts of admin_user_summary().
+create index if not exists user_task_counts_tasks on user_task_counts (tasks, user_id);
+create index if not exists user_task_counts_active on user_task_counts (active_tasks, user_id);
+create index if not exists usage_totals_rank on usage_totals (period, period_start, task_id, seconds, user_id);
+
+-- One page of users with task counts and today's/this week's usage.
+-- p_sort: name | tasks | active | today | week. Keyset: pass the last row's
+-- (sort_num, sort_text, id) as p_after_*. p_search matches a substring of the
+-- name literally (%, _ and \ are escaped).
+--
+-- Each sort pages through its own index and only then joins the rest of
+-- the summary, so a page reads about p_limit rows whatever the user count.
+-- A numeric sort merges two keyset scans: users with a counts/usage row, in
+-- (value, id) order, and users without one (value 0), in id order.
+create or replace function admin_user_summary(
+  p_sort        text default 'name',
+  p_desc        boolean default false,
+  p_search      text default null,
+  p_role        text default 'user',
+  p_today       date default current_date,
+  p_after_num   bigint default null,
+  p_after_text  text default null,
+  p_after_id    uuid default null,
+  p_limit       integer default 50
+)
+returns table (
+  id uuid, full_name text, role text, tracker_installed boolean,
+  tasks integer, active_tasks integer, done_tasks integer,
+  today_seconds bigint, week_seconds bigint,
+  sort_num bigint, sort_text text
+)
+language plpgsql stable as $$
+declare
+  dir text := case when p_desc then 'desc' else 'asc' end;
+  cmp text := case when p_desc then '<' else '>' end;
+  pattern text;
+  source text;
+  val text;
+  page text;
+begin
+  if p_search is not null then
+    pattern := '%' || replace(replace(replace(p_search, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+  end if;
+  -- $1 after_num, $2 after_text, $3 after_id, $4 limit, $5 role, $6 pattern,
+  -- $7 today, $8 week start.
+  if p_sort in ('tasks', 'active', 'today', 'week') then
+    source := case p_sort
+      when 'tasks' then 'user_task_counts c where true'
+      when 'active' then 'user_task_counts c where true'
+      when 'today' then 'usage_totals c where c.period = ''day'' and c.period_start = $7 and c.task_id = 0'
+      else 'usage_totals c where c.period = ''week'' and c.period_start = $8 and c.task_id = 0'
+    end;
+    val := case p_sort when 'tasks' then 'c.tasks' when 'active' then 'c.active_tasks' else 'c.seconds' end;
+    page := format($q$
+      select * from (
+        (select c.user_id as id, %2$s::bigint as sort_num, ''::text as sort_text
+         from %1$s
+           and ($3 is null or (%2$s, c.user_id) %3$s ($1, $3))
+           and exists (select 1 from profiles p where p.id = c.user_id
+                       and ($5 is null or p.role = $5) and ($6 is null or p.full_name ilike $6))
+         order by %2$s %4$s, c.user_id %4$s
+         limit $4)
+        union all
+        (select p.id, 0::bigint, ''::text
+         from profiles p
+         where ($5 is null or p.role = $5) and ($6 is null or p.full_name ilike $6)
+           and ($3 is null or 0 %3$s $1 or (0 = $1 and p.id %3$s $3))
+           and not exists (select 1 from %1$s and c.user_id = p.id)
+         order by p.id %4$s
+         limit $4)
+      ) m
+      order by sort_num %4$s, id %4$s
+      limit $4$q$, source, val, cmp, dir);
+  else
+    page := format($q$
+      select p.id, 0::bigint as sort_num, lower(coalesce(p.full_name, '')) as sort_text
+      from profiles p
+      where ($5 is null or p.role = $5) and ($6 is null or p.full_name ilike $6)
+        and ($3 is null or (lower(coalesce(p.full_name, '')), p.id) %1$s ($2, $3))
+      order by lower(coalesce(p.full_name, '')) %2$s, p.id %2$s
+      limit $4$q$, cmp, dir);
+  end if;
+  return query execute format($q$
+    with page as (%1$s)
+    select p.id, p.full_name, p.role, p.tracker_installed,
+           coalesce(c.tasks, 0), coalesce(c.active_tasks, 0), coalesce(c.done_tasks, 0),
+           coalesce(d.seconds, 0)::bigint, coalesce(w.seconds, 0)::bigint,
+           k.sort_num, k.sort_text
+    from page k
+    join profiles p on p.id = k.id
+    left join user_task_counts c on c.user_id = p.id
+    left join usage_totals d on d.period = 'day' and d.period_start = $7 and d.task_id = 0 and d.user_id = p.id
+    left join usage_totals w on w.period = 'week' and w.period_start = $8 and w.task_id = 0 and w.user_id = p.id
+    order by k.sort_num %2$s, k.sort_text %2$s, k.id %2$s$q$, page, dir)
+  using p_after_num, p_after_text, p_after_id, p_limit, p_role, pattern,
+        p_today, date_trunc('week', p_today)::date;
+end;
+$$;
+
+-- task_search.py: full-text search over task titles (weight A) and appnames
+-- (weight B). The generated column is rewritten by Postgres on every task
+-- insert and update, so the GIN index never needs a rebuild.
+alter table tasks add column if not exists search tsvector generated always as (
+  setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+  setweight(to_tsvector('simple', coalesce(appname, '')), 'B')
+) stored;
+create index if not exists tasks_search on tasks using gin (search);
+
+-- p_terms: lower-cased words, each matched as a prefix. Ranked by ts_rank,
+-- scaled to an integer score so that the last row's (score, id) can be
+-- passed back as p_after_*. p_user_id null searches every user's tasks.
+create or replace function search_tasks(
+  p_terms       text[],
+  p_user_id     uuid default null,
+  p_status      boolean default null,
+  p_is_active   boolean default null,
+  p_after_score bigint default null,
+  p_after_id    bigint default null,
+  p_limit       integer default 20
+)
+returns table (task jsonb, score bigint)
+language sql stable as $$
+  with q as (
+    select to_tsquery('simple', string_agg(quote_literal(term) || ':*', ' & ')) as query
+    from unnest(p_terms) as term
+  ), hits as (
+    select t.*, (ts_rank(t.search, q.query) * 1000000)::bigint as rank_score
+    from tasks t, q
+    where t.search @@ q.query
+      and (p_user_id is null or t.user_id = p_user_id)
+      and (p_status is null or t.status = p_status)
+      and (p_is_active is null or t.is_active = p_is_active)
+  )
+  select to_jsonb(h) - 'search' - 'rank_score', h.rank_score
+  from hits h
+  where p_after_id is null or (h.rank_score, h.id) < (p_after_score, p_after_id)
+  order by h.rank_score desc, h.id desc
+  limit p_limit;
+$$;
+
+-- alerts.py: daily goal alerts per task. alert_state holds the day being
+-- tracked and a bitmask of the thresholds already crossed that day; events
+-- are appended to alert_outbox.
+create table if not exists alert_state (
+  task_id bigint primary key,
+  day     date not null,
+  fired   integer not null default 0
+);
+
+create table if not exists alert_outbox (
+  id             bigserial primary key,
+  user_id        uuid not null,
+  task_id        bigint not null,
+  kind           text not null,
+  day            date not null,
+  threshold      integer not null,
+  seconds        bigint not null,
+  target_seconds bigint not null,
+  created_at     timestamptz not null default now()
+);
+create index if not exists alert_outbox_user on alert_outbox (user_id, id);
+
+-- tasks.hours_perday is "HH:MM:SS" from the dashboard, or a number of hours.
+create or replace function task_target_seconds(p_hours text)
+returns bigint language sql immutable as $$
+  select case
+    when coalesce(trim(p_hours), '') = '' then 0
+    when trim(p_hours) ~ '^[0-9]+(\.[0-9]+)?$' then (trim(p_hours)::numeric * 3600)::bigint
+    else extract(epoch from trim(p_hours)::interval)::bigint
+  end;
+$$;
+
+-- Called after increment_usage_totals() for each day a sample credited.
+-- Crossing p_thresholds[i] percent of the target emits goal_progress (< 100),
+-- goal_reached (= 100) or over_budget (> 100), once per day. The first
+-- sample of a new day emits goal_missed for the previous tracked day if it
+-- ended below target. Samples for days before the tracked one are ignored.
+create or replace function apply_alert_increment(p_task_id bigint, p_day date, p_thresholds integer[])
+returns setof alert_outbox language plpgsql as $$
+declare
+  t record;
+  s alert_state;
+  total bigint;
+  i integer;
+begin
+  select user_id, task_target_seconds(hours_perday::text) as target into t from tasks where id = p_task_id;
+  if not found or t.target <= 0 then
+    return;
+  end if;
+  insert into alert_state (task_id, day) values (p_task_id, p_day) on conflict (task_id) do nothing;
+  select * into s from alert_state where task_id = p_task_id for update;
+  if p_day < s.day then
+    return;
+  end if;
+  if p_day > s.day then
+    select coalesce(sum(seconds), 0) into total from usage_totals
+    where user_id = t.user_id and task_id = p_task_id and period = 'day' and period_start = s.day;
+    if total < t.target then
+      return query insert into alert_outbox (user_id, task_id, kind, day, threshold, seconds, target_seconds)
+        values (t.user_id, p_task_id, 'goal_missed', s.day, 100, total, t.target) returning *;
+    end if;
+    s.day := p_day;
+    s.fired := 0;
+  end if;
+  select coalesce(sum(seconds), 0) into total from usage_totals
+  where user_id = t.user_id and task_id = p_task_id and period = 'day' and period_start = p_day;
+  for i in 1 .. coalesce(array_length(p_thresholds, 1), 0) loop
+    if s.fired & (1 << (i - 1)) = 0 and total * 100 >= t.target * p_thresholds[i] then
+      s.fired := s.fired | (1 << (i - 1));
+      return query insert into alert_outbox (user_id, task_id, kind, day, threshold, seconds, target_seconds)
+        values (t.user_id, p_task_id,
+                case when p_thresholds[i] < 100 then 'goal_progress'
+                     when p_thresholds[i] = 100 then 'goal_reached'
+                     else 'over_budget' end,
+                p_day, p_thresholds[i], total, t.target)
+        returning *;
+    end if;
+  end loop;
+  update alert_state set day = s.day, fired = s.fired where task_id = p_task_id;
+end;
+$$;
+
+-- digests.py: per-user daily and weekly digests, built in batch.
+create table if not exists usage_digests (
+  user_id       uuid not null,
+  period        text not null check (period in ('day', 'week')),
+  period_start  date not null,
+  total_seconds bigint not null,
+  tasks_tracked integer not null,
+  top_apps      jsonb not null default '[]',
+  goals_set     integer not null default 0,
+  goals_met     integer not null default 0,
+  streak        integer not null default 0,
+  created_at    timestamptz not null default now(),
+  primary key (user_id, period, period_start)
+);
+
+-- One row per digest run: a lease so that only one worker builds a period,
+-- and the last user written as a checkpoint to resume from.
+create table if not exists digest_runs (
+  period       text not null,
+  period_start date not null,
+  last_user_id uuid,
+  users        integer not null default 0,
+  lease_until  timestamptz not null default 'epoch',
+  finished_at  timestamptz,
+  primary key (period, period_start)
+);
+
+create index if not exists usage_totals_digest
+  on usage_totals (period, period_start, user_id, task_id) include (seconds);
+
+-- Returns the run with its checkpoint, or nothing when it's finished or
+-- leased by another worker. p_restart takes it regardless and starts over.
+create or replace function claim_digest_run(
+  p_period text, p_period_start date, p_lease_seconds integer, p_restart boolean default false
+)
+returns setof digest_runs language sql as $$
+  insert into digest_runs (period, period_start) values (p_period, p_period_start)
+  on conflict (period, period_start) do nothing;
+  update digest_runs
+  set lease_until  = now() + make_interval(secs => p_lease_seconds),
+      last_user_id = case when p_restart then null else last_user_id end,
+      users        = case when p_restart then 0 else users end,
+      finished_at  = null
+  where period = p_period and period_start = p_period_start
+    and (p_restart or (finished_at is null and lease_until < now()))
+  returning *;
+$$;
+
+create or replace function checkpoint_digest_run(
+  p_period text, p_period_start date, p_last_user_id uuid, p_users integer,
+  p_lease_seconds integer, p_finished boolean default false
+)
+returns void language sql as $$
+  update digest_runs
+  set last_user_id = p_last_user_id,
+      users        = p_users,
+      lease_until  = now() + make_interval(secs => p_lease_seconds),
+      finished_at  = case when p_finished then now() end
+  where period = p_period and period_start = p_period_start;
+$$;
+
+-- The usage of the next p_users users after p_after (by user_id) for one
+-- period, as columns: per user "users", "counts" (rows per user) and
+-- "prev_streak" (from the previous period's digest); per row, in user order,
+-- "seconds", "app" and "target" (the task's daily target in seconds). One
+-- jsonb value, so PostgREST's max-rows cap doesn't apply.
+create or replace function digest_usage(p_period text, p_period_start date, p_after uuid, p_users integer)
+returns jsonb language sql stable as $$
+  with users as (
+    select distinct u.user_id
+    from usage_totals u
+    where u.period = p_period and u.period_start = p_period_start and u.task_id <> 0
+      and (p_after is null or u.user_id > p_after)
+    order by u.user_id
+    limit p_users
+  ), usage as (
+    select u.user_id, u.task_id, u.seconds, t.appname,
+           coalesce(task_target_seconds(t.hours_perday::text), 0) as target
+    from usage_totals u
+    join users using (user_id)
+    left join tasks t on t.id = u.task_id
+    where u.period = p_period and u.period_start = p_period_start and u.task_id <> 0
+  ), per_user as (
+    select g.user_id, count(*) as n, coalesce(max(d.streak), 0) as prev_streak
+    from usage g
+    left join usage_digests d on d.user_id = g.user_id and d.period = p_period
+      and d.period_start = p_period_start - case when p_period = 'week' then 7 else 1 end
+    group by g.user_id
+  )
+  select jsonb_build_object(
+    'users', coalesce((select jsonb_agg(user_id order by user_id) from per_user), '[]'),
+    'counts', coalesce((select jsonb_agg(n order by user_id) from per_user), '[]'),
+    'prev_streak', coalesce((select jsonb_agg(prev_streak order by user_id) from per_user), '[]'),
+    'seconds', coalesce((select jsonb_agg(seconds order by user_id, task_id) from usage), '[]'),
+    'app', coalesce((select jsonb_agg(appname order by user_id, task_id) from usage), '[]'),
+    'target', coalesce((select jsonb_agg(target order by user_id, task_id) from usage), '[]')
+  );
+$$;
+
+-- usage_heatmap.py: seconds per hour of the week (cell = weekday * 24 + hour,
+-- Monday 0, server local time), one 168-cell tile per task and week.
+-- task_id 0 = all of the user's tasks.
+create table if not exists usage_hours (
+  user_id    uuid not null,
+  task_id    bigint not null default 0,
+  week_start date not null,
+  seconds    bigint[] not null,
+  updated_at timestamp not null default now(),
+  primary key (user_id, task_id, week_start)
+);
+
+-- p_rows: [{"user_id", "task_id", "week", "cell", "seconds"}]. Adds each cell to
+-- the task's and the user's tile in a single statement.
+create or replace function increment_usage_hours(p_rows jsonb)
+returns void language sql as $$
+  with cells as (
+    select r.user_id, t.task_id, r.week, r.cell, sum(r.seconds) as seconds
+    from jsonb_to_recordset(p_rows) as r(user_id uuid, task_id bigint, week date, cell integer, seconds bigint)
+    cross join lateral (values (r.task_id), (0::bigint)) as t(task_id)
+    group by 1, 2, 3, 4
+  )
+  insert into usage_hours (user_id, task_id, week_start, seconds)
+  select k.user_id, k.task_id, k.week,
+         array(select coalesce(c.seconds, 0)::bigint
+               from generate_series(0, 167) as g(cell)
+               left join cells c on c.user_id = k.user_id and c.task_id = k.task_id
+                                and c.week = k.week and c.cell = g.cell
+               order by g.cell)
+  from (select distinct user_id, task_id, week from cells) k
+  on conflict (user_id, task_id, week_start)
+  do update set seconds = array(select a + b
+                                from unnest(usage_hours.seconds, excluded.seconds) with ordinality as x(a, b, i)
+                                order by x.i),
+                updated_at = now();
+$$;
+
+-- One summed tile per week in [p_from, p_to] that has usage. A null
+-- p_user_id sums every user's task 0 tiles (the whole tenant).
+create or replace function usage_heatmap(p_user_id uuid, p_task_id bigint, p_from date, p_to date)
+returns table (week_start date, seconds bigint[]) language sql stable as $$
+  select h.week_start, array_agg(h.total order by h.i)
+  from (
+    select u.week_start, x.i, sum(x.s)::bigint as total
+    from usage_hours u
+    cross join lateral unnest(u.seconds) with ordinality as x(s, i)
+    where u.week_start between p_from and p_to
+      and (case when p_user_id is null then u.task_id = 0
+                else u.user_id = p_user_id and u.task_id = p_task_id end)
+    group by u.week_start, x.i
+  ) h
+  group by h.week_start
+  order by h.week_start;
+$$;
+
+-- focus_sessions.py: a task's focus sessions per day, as parallel arrays
+-- sorted by start (epoch seconds). active = seconds actually tracked, so
+-- ends - starts - active is time spent briefly away.
+create table if not exists focus_sessions (
+  task_id bigint not null,
+  day     date not null,
+  user_id uuid not null,
+  starts  bigint[] not null default '{}',
+  ends    bigint[] not null default '{}',
+  active  bigint[] not null default '{}',
+  primary key (task_id, day)
+);
+
+-- p_pieces: [[start, end], ...] on p_day, newly credited. A piece within
+-- p_gap seconds of a session joins it, and can bridge two; otherwise it
+-- starts a new session. Pieces of interval samples are new time (they can
+-- fill a session's away time); a plain sample is only placed at "now", so
+-- with p_clip the part of it inside a session it joins is not counted again.
+-- The version without p_clip would make named calls ambiguous.
+drop function if exists extend_focus_sessions(bigint, uuid, date, jsonb, integer);
+create or replace function extend_focus_sessions(p_task_id bigint, p_user_id uuid, p_day date,
+                                                 p_pieces jsonb, p_gap integer, p_clip boolean default false)
+returns void language plpgsql as $$
+declare
+  f focus_sessions;
+  piece jsonb;
+  ps bigint;
+  pe bigint;
+  s bigint;
+  e bigint;
+  a bigint;
+  placed boolean;
+  ns bigint[];
+  ne bigint[];
+  na bigint[];
+  i integer;
+begin
+  insert into focus_sessions (task_id, day, user_id) values (p_task_id, p_day, p_user_id)
+  on conflict (task_id, day) do nothing;
+  select * into f from focus_sessions where task_id = p_task_id and day = p_day for update;
+  for piece in select value from jsonb_array_elements(p_pieces) loop
+    ps := (piece->>0)::bigint;
+    pe := (piece->>1)::bigint;
+    s := ps;
+    e := pe;
+    a := pe - ps;
+    ns := '{}';
+    ne := '{}';
+    na := '{}';
+    placed := false;
+    for i in 1 .. coalesce(array_length(f.starts, 1), 0) loop
+      if f.ends[i] + p_gap < s or f.starts[i] - p_gap > e then
+        if not placed and f.starts[i] > e then
+          ns := ns || s;
+          ne := ne || e;
+          na := na || a;
+          placed := true;
+        end if;
+        ns := ns || f.starts[i];
+        ne := ne || f.ends[i];
+        na := na || f.active[i];
+      else
+        s := least(s, f.starts[i]);
+        e := greatest(e, f.ends[i]);
+        a := a + f.active[i];
+        if p_clip then
+          a := a - greatest(0, least(pe, f.ends[i]) - greatest(ps, f.starts[i]));
+        end if;
+      end if;
+    end loop;
+    if not placed then
+      ns := ns || s;
+      ne := ne || e;
+      na := na || a;
+    end if;
+    f.starts := ns;
+    f.ends := ne;
+    f.active := na;
+  end loop;
+  update focus_sessions set starts = f.starts, ends = f.ends, active = f.active
+  where task_id = p_task_id and day = p_day;
+end;
+$$;
@@ -0,0 +1,137 @@
+# task_progress.py
+# Daily actual vs target time for one task, built from the usage_totals day
+# rows instead of the task's whole screen_time history.
+#
+#   GET /tasks/{task_id}/progress?limit=30&before=YYYY-MM-DD
+#       {"task_id", "title", "target_seconds", "total_days", "average_percent",
+#        "days": [{"date", "seconds", "target_seconds", "percent"}, ...],
+#        "next"}
+#
+# `days` are the newest `limit` days before `before`, oldest first; pass
+# `next` back as `before` for older ones. Days before yesterday are closed:
+# a task's closed days are read once and cached for PROGRESS_CLOSED_TTL_SECONDS
+# (default 3600), so log imports and reconcile fixes for old days show up
+# within that time. Yesterday and today are read on every request.
+import bisect
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from fastapi import APIRouter, HTTPException, Request
+
+import auth
+from db import supabase
+
+router = APIRouter()
+
+CLOSED_TTL_SECONDS = int(os.getenv("PROGRESS_CLOSED_TTL_SECONDS", "3600"))
+OPEN_DAYS = 2
+CACHE_TASKS = 5000
+MAX_LIMIT = 366
+PAGE_SIZE = 1000
+NUMERIC_HOURS = re.compile(r"[0-9]+(\.[0-9]+)?")
+
+_closed = OrderedDict()
+_lock = threading.Lock()
+
+
+def target_seconds(hours_perday):
+    # hours_perday is "HH:MM:SS" from the dashboard, or a number of hours
+    # (possibly as a string, e.g. "1.5"); read like task_target_seconds() in
+    # schema.sql so progress and alerts agree.
+    hours = str(hours_perday if hours_perday is not None else "").strip()
+    try:
+        if NUMERIC_HOURS.fullmatch(hours):
+            return round(float(hours) * 3600)
+        h, m, s = (hours.split(":") + ["0", "0"])[:3]
+        return int(h) * 3600 + int(m) * 60 + round(float(s))
+    except ValueError:
+        return 0
+
+
+def _day_totals(user_id, task_id, start=None, end=None):
+    totals, offset = {}, 0
+    while True:
+        query = supabase.table("usage_totals") \
+            .select("period_start, seconds") \
+            .eq("user_id", user_id) \
+            .eq("task_id", task_id) \
+            .eq("period", "day")
+        if start:
+            query = query.gte("period_start", start)
+        if end:
+            query = query.lt("period_start", end)
+        rows = query.order("period_start").range(offset, offset + PAGE_SIZE - 1).execute().data or []
+        totals.update((row["period_start"], row["seconds"]) for row in rows)
+        if len(rows) < PAGE_SIZE:
+            return totals
+        offset += PAGE_SIZE
+
+
+def _closed_days(user_id, task_id, open_from):
+    # {date: seconds} for days before open_from, from cache when fresh. At
+    # midnight only the day that just closed is read.
+    with _lock:
+        entry = _closed.get(task_id)
+        if entry is not None:
+            _closed.move_to_end(task_id)
+    if entry is not None and time.monotonic() - entry["loaded"] <= CLOSED_TTL_SECONDS:
+        if entry["until"] == open_from:
+            return entry["days"]
+        days = dict(entry["days"], **_day_totals(user_id, task_id, entry["until"], open_from))
+        entry = dict(entry, until=open_from, days=days)
+    else:
+        entry = {"loaded": time.monotonic(), "until": open_from,
+                 "days": _day_totals(user_id, task_id, end=open_from)}
+    with _lock:
+        _closed[task_id] = entry
+        if len(_closed) > CACHE_TASKS:
+            _closed.popitem(last=False)
+    return entry["days"]
+
+
+def invalidate(task_id=None):
+    with _lock:
+        if task_id is None:
+            _closed.clear()
+        else:
+            _closed.pop(task_id, None)
+
+
+def _percent(seconds, target):
+    return round(seconds / target * 100, 1) if target else None
+
+
+@router.get("/tasks/{task_id}/progress")
+def task_progress(task_id: int, request: Request, limit: int = 30, before: str = None):
+    auth.authorize_task(request, task_id)
+    task = supabase.table("tasks").select("title, hours_perday, user_id").eq("id", task_id).maybe_single().execute()
+    if not task or not task.data:
+        raise HTTPException(status_code=404, detail="Task not found")
+    task = task.data
+    limit = min(max(limit, 1), MAX_LIMIT)
+    target = target_seconds(task.get("hours_perday"))
+
+    open_from = (date.today() - timedelta(days=OPEN_DAYS - 1)).isoformat()
+    days = dict(_closed_days(task["user_id"], task_id, open_from))
+    days.update(_day_totals(task["user_id"], task_id, start=open_from))
+    dates = sorted(days)
+
+    end = bisect.bisect_left(dates, before) if before else len(dates)
+    page = dates[max(0, end - limit):end]
+    percents = [_percent(days[d], target) for d in dates]
+    return {
+        "task_id": task_id,
+        "title": task.get("title"),
+        "target_seconds": target,
+        "total_days": len(dates),
+        "average_percent": round(sum(percents) / len(percents), 1) if target and percents else None,
+        "days": [
+            {"date": d, "seconds": days[d], "target_seconds": target, "percent": _percent(days[d], target)}
+            for d in page
+        ],
+        "next": page[0] if end > limit else None
+    }
@@ -0,0 +1,62 @@
+# task_search.py
+# Full-text task search, backed by the tasks.search tsvector column and the
+# search_tasks() function (see schema.sql).
+#
+#   GET /tasks/search?q=rep wri&status=&is_active=&user_id=&limit=20&after=<next>
+#
+# Every word of q must match the start of a word in the title or appname.
+# Title matches rank above appname matches. Users search their own tasks;
+# admins search everyone's unless they pass user_id.
+import re
+
+from fastapi import APIRouter, HTTPException, Request
+
+import auth
+from db import supabase
+
+router = APIRouter()
+
+MAX_TERMS = 8
+MAX_LIMIT = 100
+
+
+def terms(q):
+    return list(dict.fromkeys(re.findall(r"\w+", (q or "").lower())))[:MAX_TERMS]
+
+
+def _searched_user(request, user_id):
+    user = auth.current_user(request)
+    if user_id is None and user is not None and not auth.is_admin(user):
+        user_id = user["sub"]
+    if user_id:
+        auth.authorize_user(request, user_id)
+    return user_id
+
+
+def _cursor(after):
+    try:
+        score, task_id = after.split(".")
+        return int(score), int(task_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/tasks/search")
+def search_tasks(request: Request, q: str, user_id: str = None, status: bool = None, is_active: bool = None,
+                 limit: int = 20, after: str = None):
+    words = terms(q)
+    if not words:
+        raise HTTPException(status_code=400, detail="q must contain at least one word")
+    limit = min(max(limit, 1), MAX_LIMIT)
+    params = {
+        "p_terms": words,
+        "p_user_id": _searched_user(request, user_id),
+        "p_status": status,
+        "p_is_active": is_active,
+        "p_limit": limit
+    }
+    if after:
+        params["p_after_score"], params["p_after_id"] = _cursor(after)
+    rows = supabase.rpc("search_tasks", params).execute().data or []
+    next_after = f"{rows[-1]['score']}.{rows[-1]['task']['id']}" if len(rows) == limit else None
+    return {"tasks": [dict(row["task"], score=row["score"]) for row in rows], "next": next_after}
@@ -0,0 +1,119 @@
+# tasks_api.py
+# Task listing and bulk changes for the dashboard.
+#
+#   GET  /tasks?user_id=&status=&is_active=&fields=id,title&limit=100&after=<id>
+#        newest first, paged by id (keyset): pass `next` back as `after`
+#   POST /tasks/bulk {"ids": [...], "action": "update"|"deactivate"|"delete", "values": {...}}
+#        one statement for all ids, restricted to the caller's tasks
+#
+# Completed tasks never stay active: a bulk update that sets status also
+# clears is_active, and one that activates tasks skips completed ones. Rows
+# written around the API are tidied when their owner lists them (one
+# update); a list read by anyone else, e.g. an admin, never writes.
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Request
+
+import auth
+from db import supabase
+
+router = APIRouter()
+
+FIELDS = ("id", "user_id", "title", "appname", "hours_perday", "status", "is_active",
+          "deadline", "created_at", "updated_at")
+UPDATABLE = ("title", "appname", "hours_perday", "status", "is_active", "deadline")
+ACTIONS = ("update", "deactivate", "delete")
+MAX_LIMIT = 500
+MAX_BULK = 1000
+
+
+def _owner(request, user_id):
+    user = auth.current_user(request)
+    user_id = user_id or (user and user["sub"])
+    if not user_id:
+        raise HTTPException(status_code=400, detail="user_id is required")
+    auth.authorize_user(request, user_id)
+    return user_id
+
+
+def _columns(fields):
+    if not fields:
+        return list(FIELDS)
+    columns = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(columns) - set(FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # id is the page cursor; status/is_active are needed for auto-deactivation.
+    return list(dict.fromkeys(["id", "status", "is_active"] + columns))
+
+
+def _deactivate_completed(user_id, rows):
+    stale = [row["id"] for row in rows if row.get("status") and row.get("is_active")]
+    if not stale:
+        return
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    supabase.table("tasks") \
+        .update({"is_active": False, "updated_at": now}) \
+        .in_("id", stale) \
+        .eq("user_id", user_id) \
+        .execute()
+    for row in rows:
+        if row["id"] in stale:
+            row["is_active"] = False
+            if "updated_at" in row:
+                row["updated_at"] = now
+
+
+@router.get("/tasks")
+def list_tasks(request: Request, user_id: str = None, status: bool = None, is_active: bool = None,
+               fields: str = None, limit: int = 100, after: int = None):
+    user_id = _owner(request, user_id)
+    limit = min(max(limit, 1), MAX_LIMIT)
+    query = supabase.table("tasks").select(", ".join(_columns(fields))).eq("user_id", user_id)
+    if status is not None:
+        query = query.eq("status", status)
+    if is_active is not None:
+        query = query.eq("is_active", is_active)
+    if after is not None:
+        query = query.lt("id", after)
+    rows = query.order("id", desc=True).limit(limit).execute().data or []
+
+    next_after = rows[-1]["id"] if len(rows) == limit else None
+    user = auth.current_user(request)
+    if user is not None and user["sub"] == user_id:
+        _deactivate_completed(user_id, rows)
+    if is_active:
+        rows = [row for row in rows if row["is_active"]]
+    return {"tasks": rows, "next": next_after}
+
+
+@router.post("/tasks/bulk")
+async def bulk_tasks(request: Request):
+    data = await request.json()
+    ids = data.get("ids") or []
+    action = data.get("action")
+    if action not in ACTIONS:
+        raise HTTPException(status_code=400, detail=f"action must be one of {', '.join(ACTIONS)}")
+    if not ids or len(ids) > MAX_BULK or not all(isinstance(i, int) for i in ids):
+        raise HTTPException(status_code=400, detail=f"ids must be 1 to {MAX_BULK} task ids")
+
+    if action == "delete":
+        query = supabase.table("tasks").delete()
+    else:
+        values = {"is_active": False} if action == "deactivate" else {
+            k: v for k, v in (data.get("values") or {}).items() if k in UPDATABLE}
+        if not values:
+            raise HTTPException(status_code=400, detail=f"values may set {', '.join(UPDATABLE)}")
+        if values.get("status"):
+            values["is_active"] = False
+        values["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        query = supabase.table("tasks").update(values)
+
+    query = query.in_("id", ids)
+    if action == "update" and values.get("is_active") and "status" not in values:
+        query = query.eq("status", False)
+    user = auth.current_user(request)
+    if user is not None and not auth.is_admin(user):
+        query = query.eq("user_id", user["sub"])
+    rows = query.execute().data or []
+    return {"action": action, "ids": [row["id"] for row in rows]}
@@ -0,0 +1,45 @@
+# Tests run against fake_supabase, installed before any API module imports db.
+import os
+import sys
+import time
+from pathlib import Path
+
+import jwt
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("SUPABASE_JWT_SECRET", "secret-for-tests-secret-for-tests")
+os.environ.setdefault("ADMIN_API_KEY", "admin-key-for-tests")
+
+import fake_supabase  # noqa: E402
+
+client = fake_supabase.install()
+
+import ingest_dedup  # noqa: E402
+import usage_store  # noqa: E402
+
+ADMIN = {"X-Admin-Key": os.environ["ADMIN_API_KEY"]}
+
+
+def bearer(user_id):
+    token = jwt.encode({"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 600},
+                       os.environ["SUPABASE_JWT_SECRET"], "HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def fake():
+    client.tables.clear()
+    client.ids.clear()
+    ingest_dedup._cursors.clear()
+    usage_store._task_owners.clear()
+    yield client
+
+
+@pytest.fixture
+def api(fake):
+    from fastapi.testclient import TestClient
+
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
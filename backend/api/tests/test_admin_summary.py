@@ -0,0 +1,126 @@
+import os
+import uuid
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from conftest import ADMIN
+
+SCHEMA = Path(__file__).resolve().parents[1] / "schema.sql"
+TODAY = date.today().isoformat()
+NAMES = ["Ada", "bob", "Cy 100%", "Dee_x", "Eve", None, "Finn", "Gus", "Hal", "Ida"]
+SORTS = ["name", "tasks", "active", "today", "week"]
+
+
+def profiles():
+    return [{"id": str(uuid.UUID(int=i + 1)), "full_name": name, "role": "admin" if i == 9 else "user",
+             "tracker_installed": i % 2 == 0} for i, name in enumerate(NAMES)]
+
+
+def usage():
+    # (profile index, seconds today); a few users have none.
+    return [(0, 300), (1, 300), (3, 60), (4, 0), (6, 1200)]
+
+
+def tasks():
+    return [(i, i % 2 == 0) for i in range(8) for _ in range(i % 3)]
+
+
+@pytest.fixture
+def seeded(fake):
+    for profile in profiles():
+        fake.table("profiles").insert(profile).execute()
+    fake.table("tasks").insert([{"user_id": profiles()[i]["id"], "is_active": active, "status": False}
+                                for i, active in tasks()]).execute()
+    fake.rpc_increment_usage_totals([{"user_id": profiles()[i]["id"], "task_id": 1, "day": TODAY, "seconds": s}
+                                     for i, s in usage()])
+    return fake
+
+
+def pages(fetch, sort, desc, search=None):
+    ids, after = [], None
+    for _ in range(len(NAMES)):
+        rows = fetch(sort, desc, search, after)
+        ids += [row["id"] for row in rows]
+        if len(rows) < 3:
+            return ids
+        after = (rows[-1]["sort_num"], rows[-1]["sort_text"], rows[-1]["id"])
+    pytest.fail("paging did not finish")
+
+
+def fake_fetch(fake):
+    def fetch(sort, desc, search, after):
+        num, text, user_id = after or (None, None, None)
+        return fake.rpc_admin_user_summary(p_sort=sort, p_desc=desc, p_search=search, p_today=TODAY,
+                                           p_after_num=num, p_after_text=text, p_after_id=user_id, p_limit=3)
+    return fetch
+
+
+def test_pages_cover_every_user_once(api, seeded):
+    for sort in SORTS:
+        ids, after = [], None
+        while True:
+            params = {"sort": sort, "limit": 3, **({"after": after} if after else {})}
+            body = api.get("/admin/users", params=params, headers=ADMIN).json()
+            ids += [user["id"] for user in body["users"]]
+            after = body["next"]
+            if not after:
+                break
+        assert sorted(ids) == sorted(p["id"] for p in profiles() if p["role"] == "user"), sort
+
+
+def test_search_is_literal(seeded):
+    fetch = fake_fetch(seeded)
+    assert [r["full_name"] for r in fetch("name", False, "%", None)] == ["Cy 100%"]
+    assert [r["full_name"] for r in fetch("name", False, "_", None)] == ["Dee_x"]
+
+
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("desc", [False, True])
+@pytest.mark.parametrize("search", [None, "%", "_", "e"])
+def test_sql_matches_fake(seeded, sort, desc, search):
+    psycopg = pytest.importorskip("psycopg")
+    url = os.getenv("TEST_DATABASE_URL") or pytest.skip("TEST_DATABASE_URL is not set")
+    sql = SCHEMA.read_text()
+    usage_table = sql[sql.index("create table if not exists usage_totals"):]
+    usage_table = usage_table[:usage_table.index(");") + 2]
+    counts_table = sql[sql.index("create table if not exists user_task_counts"):]
+    counts_table = counts_table[:counts_table.index(");") + 2]
+    function = sql[sql.index("create or replace function admin_user_summary"):]
+    function = function[:function.index("$$;") + 3]
+    with psycopg.connect(url) as conn:
+        # Everything runs in one transaction that is rolled back on exit.
+        conn.execute("create schema summary_test; set local search_path to summary_test")
+        conn.execute("create table profiles (id uuid primary key, full_name text, role text, "
+                     "tracker_installed boolean)")
+        conn.execute(usage_table)
+        conn.execute(counts_table)
+        conn.execute(function)
+        for p in profiles():
+            conn.execute("insert into profiles values (%s, %s, %s, %s)",
+                         (p["id"], p["full_name"], p["role"], p["tracker_installed"]))
+        counts = {}
+        for i, active in tasks():
+            c = counts.setdefault(profiles()[i]["id"], [0, 0])
+            c[0] += 1
+            c[1] += active
+        for user_id, (total, active) in counts.items():
+            conn.execute("insert into user_task_counts values (%s, %s, %s, 0)", (user_id, total, active))
+        for row in seeded.tables["usage_totals"].values():
+            if row["task_id"] == 0:
+                conn.execute("insert into usage_totals (user_id, task_id, period, period_start, seconds) "
+                             "values (%s, 0, %s, %s, %s)",
+                             (row["user_id"], row["period"], row["period_start"], row["seconds"]))
+
+        def sql_fetch(sort, desc, search, after):
+            num, text, user_id = after or (None, None, None)
+            cur = conn.execute("select * from admin_user_summary(%s, %s, %s::text, 'user', %s::date, "
+                               "%s::bigint, %s::text, %s::uuid, 3)",
+                               (sort, desc, search, TODAY, num, text, user_id))
+            columns = [c.name for c in cur.description]
+            return [dict(zip(columns, (str(v) if k == "id" else v for k, v in zip(columns, row))))
+                    for row in cur.fetchall()]
+
+        assert pages(sql_fetch, sort, desc, search) == pages(fake_fetch(seeded), sort, desc, search)
+        conn.rollback()
@@ -0,0 +1,68 @@
+import base64
+import json
+import types
+from collections import OrderedDict
+
+import pytest
+
+import auth
+
+
+def unsigned_token(kid):
+    def part(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+    return f"{part({'alg': 'RS256', 'kid': kid})}.{part({'sub': 'u1'})}.c2ln"
+
+
+class FakeJwks:
+    def __init__(self, kids):
+        self.kids = kids
+        self.fetches = 0
+
+    def get_jwk_set(self, refresh=False):
+        self.fetches += 1
+        return types.SimpleNamespace(keys=[
+            types.SimpleNamespace(key_id=kid, public_key_use="sig", key=None) for kid in self.kids])
+
+
+@pytest.fixture
+def jwks(monkeypatch):
+    fake = FakeJwks(["current"])
+    monkeypatch.setattr(auth, "_jwks", fake)
+    monkeypatch.setattr(auth, "_keys", {})
+    monkeypatch.setattr(auth, "_missing_kids", OrderedDict())
+    monkeypatch.setattr(auth, "_last_fetch", None)
+    return fake
+
+
+def test_unknown_kid_is_not_fetched_inline(jwks):
+    with pytest.raises(auth.UnknownKeyError):
+        auth._decode(unsigned_token("current"))
+    assert jwks.fetches == 0
+
+
+def test_refresh_finds_rotated_key(jwks):
+    assert auth.refresh_for_kid("current")
+    assert jwks.fetches == 1
+    assert auth.refresh_for_kid("current")
+    assert jwks.fetches == 1
+
+
+def test_random_kids_fetch_at_most_once_per_cooldown(jwks):
+    for i in range(100):
+        assert not auth.refresh_for_kid(f"random-{i}")
+    assert jwks.fetches == 1
+
+
+def test_missing_kid_is_remembered_after_cooldown(jwks, monkeypatch):
+    assert not auth.refresh_for_kid("bogus")
+    monkeypatch.setattr(auth, "_last_fetch", auth._last_fetch - auth.JWKS_MIN_REFRESH_SECONDS - 1)
+    assert not auth.refresh_for_kid("bogus")
+    assert jwks.fetches == 1
+
+
+def test_requests_with_unknown_kids_are_rejected(api, jwks):
+    for i in range(20):
+        res = api.get("/alerts", headers={"Authorization": f"Bearer {unsigned_token(f'random-{i}')}"})
+        assert res.status_code == 401
+    assert jwks.fetches == 1
@@ -0,0 +1,48 @@
+from datetime import date
+
+import digests
+
+
+def test_summarize_totals_top_apps_and_goals():
+    chunk = {
+        "users": ["u1", "u2"],
+        "counts": [4, 1],
+        "seconds": [100, 400, 300, 200, 50],
+        "app": ["chrome", "code", "slack", "code", None],
+        "target": [100, 500, 0, 0, 0],
+        "prev_streak": [3, 2],
+    }
+    u1, u2 = digests.summarize(chunk, "day", date(2026, 10, 5))
+    assert (u1["user_id"], u1["period_start"], u1["total_seconds"], u1["tasks_tracked"]) == (
+        "u1", "2026-10-05", 1000, 4)
+    assert u1["top_apps"] == [{"app": "code", "seconds": 600}, {"app": "slack", "seconds": 300},
+                              {"app": "chrome", "seconds": 100}]
+    assert (u1["goals_set"], u1["goals_met"], u1["streak"]) == (2, 1, 0)
+    # No goals set breaks the streak too.
+    assert (u2["total_seconds"], u2["top_apps"], u2["goals_set"], u2["streak"]) == (
+        50, [{"app": "", "seconds": 50}], 0, 0)
+
+
+def test_summarize_scales_targets_to_the_week():
+    chunk = {"users": ["u1"], "counts": [1], "seconds": [7 * 3600], "app": ["code"], "target": [3600],
+             "prev_streak": [1]}
+    [row] = digests.summarize(chunk, "week", date(2026, 10, 5))
+    assert (row["goals_met"], row["streak"]) == (1, 2)
+    assert digests.summarize({"users": []}, "day", date(2026, 10, 5)) == []
+
+
+def test_build_runs_in_chunks_and_extends_streaks(fake):
+    fake.table("tasks").insert([
+        {"user_id": "u1", "appname": "code", "hours_perday": "1"},
+        {"user_id": "u2", "appname": "chrome", "hours_perday": "2"},
+    ]).execute()
+    for day, seconds in (("2026-10-04", 3600), ("2026-10-05", 4000)):
+        for user_id, task_id in (("u1", 1), ("u2", 2)):
+            fake.rpc_increment_usage_totals([{"user_id": user_id, "task_id": task_id, "day": day,
+                                              "seconds": seconds}])
+        assert digests.build("day", date.fromisoformat(day), chunk_users=1) == 2
+    assert digests.build("day", date(2026, 10, 5)) is None
+
+    rows = {(d["user_id"], d["period_start"]): d for d in fake.tables["usage_digests"].values()}
+    assert [rows["u1", day]["streak"] for day in ("2026-10-04", "2026-10-05")] == [1, 2]
+    assert [rows["u2", day]["streak"] for day in ("2026-10-04", "2026-10-05")] == [0, 0]
@@ -0,0 +1,22 @@
+import pytest
+
+import fleet_telemetry
+
+
+def test_clean_keeps_bounded_known_fields():
+    report = {"span_s": 300, "rss_mb": 42.5, "samples": 5, "extra": "x" * 1000,
+              "cpu_pct": float("nan"), "spool": -1, "uploads": True}
+    assert fleet_telemetry._clean(report) == {"span_s": 300, "rss_mb": 42.5, "samples": 5}
+
+
+@pytest.mark.parametrize("span", ["x" * 100_000, None, -5, float("inf"), 10 ** 12, False])
+def test_clean_rejects_reports_without_valid_span(span):
+    assert fleet_telemetry._clean({"span_s": span, "rss_mb": 1}) is None
+
+
+def test_invalid_report_is_not_stored(fake):
+    fake.table("tasks").insert({"user_id": "u1", "title": "t"}).execute()
+    fleet_telemetry.record("agent", 1, {"span_s": "x" * 100_000})
+    assert not fake.tables.get("agent_telemetry")
+    fleet_telemetry.record("agent", 1, {"span_s": 300, "rss_mb": 12})
+    assert [row["report"] for row in fake.tables["agent_telemetry"].values()] == [{"span_s": 300, "rss_mb": 12}]
@@ -0,0 +1,105 @@
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+import focus_sessions
+from conftest import ADMIN
+
+GAP = focus_sessions.GAP_SECONDS
+SCHEMA = Path(__file__).resolve().parents[1] / "schema.sql"
+
+# [(pieces, placed) per call] -> (start, end, active) of the sessions, checked
+# against fake_supabase and, with TEST_DATABASE_URL set, schema.sql itself.
+CASES = {
+    "interval piece fills away time": (
+        [([[0, 60]], False), ([[100, 160]], False), ([[60, 100]], False)], [(0, 160, 160)]),
+    "placed piece overlapping a session": (
+        [([[0, 600]], False), ([[300, 900]], True)], [(0, 900, 900)]),
+    "interval piece after a gap": (
+        [([[0, 60]], False), ([[60 + GAP + 1, 200 + GAP]], False)], [(0, 60, 60), (61 + GAP, 200 + GAP, 139)]),
+}
+
+
+@pytest.fixture
+def task(fake):
+    fake.table("tasks").insert({"user_id": "u1", "title": "Write", "appname": "code", "is_active": True}).execute()
+    return 1
+
+
+def at(hour, minute=0, second=0):
+    return int(datetime(2026, 10, 5, hour, minute, second).timestamp())
+
+
+def sessions(api):
+    days = api.get("/tasks/1/sessions?until=2026-10-05&days=1", headers=ADMIN).json()["days"]
+    return days[0]["sessions"] if days else []
+
+
+def test_pieces_within_the_gap_form_one_session(api, task):
+    focus_sessions.record("u1", 1, [[at(9), at(9, 10)], [at(9, 11), at(9, 20)]])
+    focus_sessions.record("u1", 1, [[at(9, 30), at(9, 40)]])
+    assert [(s["start"], s["end"], s["active_seconds"], s["away_seconds"]) for s in sessions(api)] == [
+        (at(9), at(9, 20), 1140, 60),
+        (at(9, 30), at(9, 40), 600, 0),
+    ]
+
+
+def test_a_piece_can_bridge_two_sessions(api, task):
+    focus_sessions.record("u1", 1, [[at(9), at(9, 10)], [at(9, 20), at(9, 30)]])
+    focus_sessions.record("u1", 1, [[at(9, 10) + GAP, at(9, 20) - GAP]])
+    [session] = sessions(api)
+    assert (session["start"], session["end"]) == (at(9), at(9, 30))
+    assert session["active_seconds"] + session["away_seconds"] == 1800
+
+
+def test_overlapping_plain_sample_is_not_counted_twice(api, task):
+    focus_sessions.record("u1", 1, [[at(9), at(9, 10)]])
+    focus_sessions.record("u1", 1, [[at(9, 5), at(9, 15)]], placed=True)
+    [session] = sessions(api)
+    assert (session["end"], session["active_seconds"], session["away_seconds"]) == (at(9, 15), 900, 0)
+
+
+def test_pieces_are_split_at_midnight(api, task):
+    focus_sessions.record("u1", 1, [[at(23, 55), at(23, 55) + 600]])
+    assert [s["active_seconds"] for s in sessions(api)] == [300]
+    later = api.get("/tasks/1/sessions?until=2026-10-06&days=1", headers=ADMIN).json()["days"]
+    assert later[0]["day"] == "2026-10-06" and later[0]["focus_seconds"] == 300
+
+
+def sql_extend(calls):
+    psycopg = pytest.importorskip("psycopg")
+    url = os.getenv("TEST_DATABASE_URL") or pytest.skip("TEST_DATABASE_URL is not set")
+    sql = SCHEMA.read_text()
+    start = sql.index("create table if not exists focus_sessions")
+    end = sql.index("$$;", sql.index("create or replace function extend_focus_sessions")) + 3
+    with psycopg.connect(url) as conn:
+        # Everything runs in one transaction that is rolled back on exit.
+        conn.execute("create schema focus_test; set local search_path to focus_test")
+        conn.execute(sql[start:end])
+        for pieces, placed in calls:
+            conn.execute("select extend_focus_sessions(1, gen_random_uuid(), '2026-10-05', %s::jsonb, %s, %s)",
+                         (str(pieces), GAP, placed))
+        starts, ends, active = conn.execute("select starts, ends, active from focus_sessions").fetchone()
+        conn.rollback()
+    return list(zip(starts, ends, active))
+
+
+def fake_extend(fake, calls):
+    for pieces, placed in calls:
+        fake.rpc_extend_focus_sessions(1, "u1", "2026-10-05", pieces, GAP, placed)
+    row = fake.tables["focus_sessions"][(1, "2026-10-05")]
+    return list(zip(row["starts"], row["ends"], row["active"]))
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_extend_focus_sessions_fake(fake, case):
+    calls, expected = CASES[case]
+    assert fake_extend(fake, calls) == expected
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_extend_focus_sessions_sql(case):
+    calls, expected = CASES[case]
+    assert sql_extend(calls) == expected
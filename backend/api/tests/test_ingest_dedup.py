@@ -0,0 +1,35 @@
+import ingest_dedup
+
+
+def test_claim_rejects_repeats(fake):
+    assert ingest_dedup.claim("agent", 5)
+    assert not ingest_dedup.claim("agent", 5)
+
+
+def test_claim_accepts_late_seqs_inside_window(fake):
+    assert ingest_dedup.claim("agent", 100)
+    assert ingest_dedup.claim("agent", 90)
+    assert not ingest_dedup.claim("agent", 90)
+    assert ingest_dedup.claim("agent", 100 - ingest_dedup.WINDOW + 1)
+
+
+def test_claim_rejects_seqs_below_window(fake):
+    assert ingest_dedup.claim("agent", 100)
+    assert not ingest_dedup.claim("agent", 100 - ingest_dedup.WINDOW)
+
+
+def test_claim_survives_process_restart(fake):
+    assert ingest_dedup.claim("agent", 7)
+    ingest_dedup._cursors.clear()
+    assert not ingest_dedup.claim("agent", 7)
+
+
+def test_release_lets_retry_claim_again(fake):
+    assert ingest_dedup.claim("agent", 3)
+    ingest_dedup.release("agent", 3)
+    assert ingest_dedup.claim("agent", 3)
+
+
+def test_agents_are_independent(fake):
+    assert ingest_dedup.claim("a", 1)
+    assert ingest_dedup.claim("b", 1)
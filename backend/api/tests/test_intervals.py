@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from intervals import IntervalSet, split_by_day
+
+
+def test_add_returns_only_uncovered_seconds():
+    covered = IntervalSet()
+    assert covered.add(10, 20) == 10
+    assert covered.add(15, 30) == 10
+    assert covered.add(0, 40) == 20
+    assert covered.add(5, 35) == 0
+    assert covered.to_list() == [[0, 40]]
+
+
+def test_add_keeps_disjoint_intervals_sorted():
+    covered = IntervalSet()
+    covered.add(50, 60)
+    covered.add(10, 20)
+    covered.add(30, 40)
+    assert covered.to_list() == [[10, 20], [30, 40], [50, 60]]
+    assert covered.total() == 30
+
+
+def test_add_merges_touching_intervals():
+    covered = IntervalSet([[10, 20]])
+    assert covered.add(20, 30) == 10
+    assert covered.to_list() == [[10, 30]]
+
+
+def test_empty_interval_adds_nothing():
+    covered = IntervalSet()
+    assert covered.add(10, 10) == 0
+    assert len(covered) == 0
+
+
+def test_gaps_match_what_add_credits():
+    covered = IntervalSet([[10, 20], [30, 40]])
+    assert covered.gaps(0, 50) == [[0, 10], [20, 30], [40, 50]]
+    assert covered.gaps(12, 18) == []
+    assert covered.gaps(15, 35) == [[20, 30]]
+    assert sum(e - s for s, e in covered.gaps(5, 45)) == covered.add(5, 45)
+
+
+def test_from_unsorted_coalesces():
+    assert IntervalSet.from_unsorted([[30, 40], [0, 10], [5, 15]]).to_list() == [[0, 15], [30, 40]]
+
+
+def test_split_by_day_cuts_at_local_midnight():
+    midnight = int(datetime(2026, 3, 2).timestamp())
+    assert list(split_by_day(midnight - 60, midnight + 30)) == [
+        ("2026-03-01", midnight - 60, midnight),
+        ("2026-03-02", midnight, midnight + 30),
+    ]
+
+
+def test_split_by_day_within_one_day():
+    start = int(datetime(2026, 3, 2, 9).timestamp())
+    assert list(split_by_day(start, start + 60)) == [("2026-03-02", start, start + 60)]
+    assert list(split_by_day(start, start)) == []
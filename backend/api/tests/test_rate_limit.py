@@ -0,0 +1,57 @@
+import sqlite3
+import threading
+
+import anyio
+
+import rate_limit
+
+
+def test_memory_buckets_limit_and_refill(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    buckets = rate_limit.MemoryBuckets()
+    assert [buckets.take("k", 1, 2) for _ in range(3)] == [0.0, 0.0, 1.0]
+    clock[0] += 1
+    assert buckets.take("k", 1, 2) == 0.0
+
+
+def test_memory_buckets_sweep_idle_keys_without_denials(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    buckets = rate_limit.MemoryBuckets()
+    for i in range(1000):
+        assert buckets.take(f"user:{i}", 20, 200) == 0.0
+    clock[0] += rate_limit.IDLE_SECONDS + 1
+    assert buckets.take("user:new", 20, 200) == 0.0
+    assert list(buckets.buckets) == ["user:new"]
+
+
+def test_sqlite_buckets_are_shared(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    first, second = rate_limit.SqliteBuckets(path), rate_limit.SqliteBuckets(path)
+    assert first.take("k", 0.001, 1) == 0.0
+    assert second.take("k", 0.001, 1) > 0
+
+
+def test_sqlite_buckets_fall_back_when_locked(tmp_path, monkeypatch):
+    buckets = rate_limit.SqliteBuckets(str(tmp_path / "buckets.db"))
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(buckets, "_take", locked)
+    assert buckets.take("k", 1, 1) == 0.0
+    assert buckets.take("k", 1, 1) > 0
+
+
+def test_sqlite_buckets_run_off_the_event_loop(tmp_path, monkeypatch):
+    buckets = rate_limit.SqliteBuckets(str(tmp_path / "buckets.db"))
+    monkeypatch.setattr(rate_limit, "buckets", buckets)
+    original, seen = buckets.take, []
+
+    def take(*args):
+        seen.append(threading.get_ident())
+        return original(*args)
+    monkeypatch.setattr(buckets, "take", take)
+
+    assert anyio.run(rate_limit.take, "k", 1, 1) == 0.0
+    assert seen and seen[0] != threading.get_ident()
@@ -0,0 +1,42 @@
+import os
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import task_progress
+from conftest import ADMIN
+
+SCHEMA = Path(__file__).resolve().parents[1] / "schema.sql"
+HOURS = ["1.5", "2", " 0.25 ", "01:30:00", "1:30", "0:00:30.6", "", None]
+
+
+@pytest.mark.parametrize("hours, seconds", [("1.5", 5400), ("2", 7200), (1.5, 5400), ("01:30:00", 5400),
+                                            ("1:30", 5400), (None, 0), ("", 0), ("soon", 0)])
+def test_target_seconds(hours, seconds):
+    assert task_progress.target_seconds(hours) == seconds
+
+
+def test_decimal_hour_goal(api, fake):
+    task_progress.invalidate()
+    fake.table("tasks").insert({"user_id": "u1", "title": "Write", "appname": "code", "hours_perday": "1.5"}).execute()
+    fake.rpc_increment_usage_totals([{"user_id": "u1", "task_id": 1, "day": date.today().isoformat(),
+                                      "seconds": 2700}])
+    body = api.get("/tasks/1/progress", headers=ADMIN).json()
+    assert body["target_seconds"] == 5400
+    assert body["days"][0]["percent"] == 50.0
+
+
+def test_matches_sql():
+    psycopg = pytest.importorskip("psycopg")
+    url = os.getenv("TEST_DATABASE_URL") or pytest.skip("TEST_DATABASE_URL is not set")
+    sql = SCHEMA.read_text()
+    function = sql[sql.index("create or replace function task_target_seconds"):]
+    function = function[:function.index("$$;") + 3]
+    with psycopg.connect(url) as conn:
+        conn.execute("create schema target_test; set local search_path to target_test")
+        conn.execute(function)
+        for hours in HOURS:
+            [(seconds,)] = conn.execute("select task_target_seconds(%s::text)", (hours,)).fetchall()
+            assert task_progress.target_seconds(hours) == seconds, hours
+        conn.rollback()
@@ -0,0 +1,44 @@
+import pytest
+
+from conftest import ADMIN, bearer
+
+
+@pytest.fixture
+def tasks(fake):
+    for title, status, is_active in [("done", True, True), ("open", False, True), ("closed", True, False)]:
+        fake.table("tasks").insert({"user_id": "u1", "title": title, "status": status, "is_active": is_active}).execute()
+
+
+def active(fake):
+    return {row["title"] for row in fake.tables["tasks"].values() if row["is_active"]}
+
+
+def test_admin_listing_does_not_change_tasks(api, fake, tasks):
+    res = api.get("/tasks?user_id=u1", headers=ADMIN)
+    assert res.status_code == 200
+    assert {t["title"]: t["is_active"] for t in res.json()["tasks"]}["done"] is True
+    assert active(fake) == {"done", "open"}
+
+
+def test_owner_listing_deactivates_completed_tasks(api, fake, tasks):
+    res = api.get("/tasks", headers=bearer("u1"))
+    assert {t["title"]: t["is_active"] for t in res.json()["tasks"]}["done"] is False
+    assert active(fake) == {"open"}
+
+
+def test_completing_a_task_deactivates_it(api, fake, tasks):
+    api.post("/tasks/bulk", json={"ids": [2], "action": "update", "values": {"status": True}}, headers=bearer("u1"))
+    assert active(fake) == {"done"}
+
+
+def test_activating_skips_completed_tasks(api, fake, tasks):
+    res = api.post("/tasks/bulk", json={"ids": [2, 3], "action": "update", "values": {"is_active": True}},
+                   headers=bearer("u1"))
+    assert res.json()["ids"] == [2]
+    assert active(fake) == {"done", "open"}
+
+
+def test_bulk_is_limited_to_own_tasks(api, fake, tasks):
+    res = api.post("/tasks/bulk", json={"ids": [1, 2], "action": "deactivate"}, headers=bearer("u2"))
+    assert res.json()["ids"] == []
+    assert active(fake) == {"done", "open"}
@@ -0,0 +1,33 @@
+import pytest
+
+import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SPAN_ID = "00f067aa0ba902b7"
+
+
+def test_valid_traceparent():
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-{SPAN_ID}-01") == (TRACE_ID, SPAN_ID, True)
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-{SPAN_ID}-00") == (TRACE_ID, SPAN_ID, False)
+
+
+@pytest.mark.parametrize("header", [
+    f"00-{TRACE_ID}-{SPAN_ID}-zz",
+    f"00-{TRACE_ID.upper()}-{SPAN_ID}-01",
+    f"00-{TRACE_ID}-{SPAN_ID}",
+    f"00-{TRACE_ID[:-1]}-{SPAN_ID}-01",
+    f"ff-{TRACE_ID}-{SPAN_ID}-01",
+    f"00-{'0' * 32}-{SPAN_ID}-01",
+    f"00-{TRACE_ID}-{'0' * 16}-01",
+    "",
+    None,
+])
+def test_malformed_traceparent_starts_a_new_trace(header):
+    assert tracing.parse_traceparent(header) is None
+    span = tracing.begin("request", traceparent=header)
+    assert span.trace_id != TRACE_ID and span.parent_id is None
+
+
+def test_malformed_traceparent_does_not_fail_the_request(api):
+    res = api.get("/metrics", headers={"traceparent": f"00-{TRACE_ID}-{SPAN_ID}-zz"})
+    assert res.status_code == 200
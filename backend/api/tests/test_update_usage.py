@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from conftest import ADMIN
+
+
+@pytest.fixture
+def task(fake):
+    fake.table("tasks").insert({"user_id": "u1", "title": "Write", "appname": "code", "is_active": True}).execute()
+    return 1
+
+
+def sample(seq, start, seconds=60, **extra):
+    return dict({"task_id": 1, "app_name": "code", "seconds": seconds, "start": start,
+                 "end": start + seconds, "agent_id": "agent-1", "seq": seq}, **extra)
+
+
+def day_seconds(fake):
+    rows = fake.table("screen_time").select("duration_minutes").eq("task_id", 1).execute().data
+    return sum(entry["seconds"] for row in rows for entry in row["duration_minutes"])
+
+
+def total_seconds(fake):
+    return sum(row["seconds"] for row in fake.tables.get("usage_totals", {}).values()
+               if row["task_id"] == 1 and row["period"] == "day")
+
+
+def test_sample_is_credited_once(api, fake, task):
+    start = int(time.time()) - 120
+    assert api.post("/update-usage", json=sample(0, start), headers=ADMIN).json()["credited_seconds"] == 60
+    assert api.post("/update-usage", json=sample(0, start), headers=ADMIN).json()["duplicate"]
+    assert day_seconds(fake) == total_seconds(fake) == 60
+
+
+def test_overlapping_samples_are_merged(api, fake, task):
+    start = int(time.time()) - 300
+    api.post("/update-usage", json=sample(0, start), headers=ADMIN)
+    res = api.post("/update-usage", json=sample(1, start + 30), headers=ADMIN)
+    assert res.json()["credited_seconds"] == 30
+    assert day_seconds(fake) == total_seconds(fake) == 90
+
+
+def test_failure_after_screen_time_write_is_not_retried_twice(api, fake, task, monkeypatch):
+    calls = []
+    original = fake.rpc_increment_usage_hours
+
+    def flaky(**params):
+        calls.append(params)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        return original(**params)
+    monkeypatch.setattr(fake, "rpc_increment_usage_hours", flaky, raising=False)
+
+    start = int(time.time()) - 120
+    assert api.post("/update-usage", json=sample(0, start), headers=ADMIN).status_code == 200
+    assert api.post("/update-usage", json=sample(0, start), headers=ADMIN).json()["duplicate"]
+    assert len(calls) == 1
+    assert day_seconds(fake) == total_seconds(fake) == 60
+
+
+def test_failure_before_screen_time_write_releases_seq(fake, task, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+    api = TestClient(main.app, raise_server_exceptions=False)
+    original = fake.table
+
+    def failing(name):
+        if name == "screen_time":
+            raise RuntimeError("database unavailable")
+        return original(name)
+    monkeypatch.setattr(fake, "table", failing)
+    start = int(time.time()) - 120
+    assert api.post("/update-usage", json=sample(0, start), headers=ADMIN).status_code == 500
+
+    monkeypatch.setattr(fake, "table", original)
+    assert api.post("/update-usage", json=sample(0, start), headers=ADMIN).json()["credited_seconds"] == 60
+    assert day_seconds(fake) == 60
+
+
+@pytest.mark.parametrize("seq", ["x", -1, 1.5, True])
+def test_invalid_seq_is_rejected(api, task, seq):
+    assert api.post("/update-usage", json=sample(seq, int(time.time())), headers=ADMIN).status_code == 400
+
+
+@pytest.mark.parametrize("change", [
+    {"end": 0},                                     # end before start
+    {"seconds": 60, "end_offset": 400 * 86400},     # far longer than the sample
+    {"start_offset": 86400},                        # in the future
+    {"start_offset": -30 * 86400},                  # long before any spooled sample
+    {"start": "soon"},
+    {"seconds": -60},
+])
+def test_invalid_interval_is_rejected(api, fake, task, change):
+    payload = sample(0, int(time.time()) + change.pop("start_offset", -120))
+    payload["end"] = payload["start"] + change.pop("end_offset", 60)
+    payload.update(change)
+    assert api.post("/update-usage", json=payload, headers=ADMIN).status_code == 400
+    assert not fake.tables.get("screen_time")
+    # Nothing was claimed, so a corrected retry is accepted.
+    assert api.post("/update-usage", json=sample(0, int(time.time()) - 120), headers=ADMIN).status_code == 200
+
+
+def test_intervals_are_dropped_once_a_day_is_out_of_reach(api, fake, task):
+    fake.table("screen_time").insert({"task_id": 1, "app_name": "code", "date": "2000-01-01", "duration_minutes": [
+        {"date": "2000-01-01", "time": "10:00:00", "seconds": 60, "intervals": [[946720800, 946720860]]}]}).execute()
+    start = int(time.time()) - 120
+    api.post("/update-usage", json=sample(0, start), headers=ADMIN)
+    old, today = fake.table("screen_time").select("duration_minutes").execute().data[0]["duration_minutes"]
+    assert old == {"date": "2000-01-01", "time": "10:00:00", "seconds": 60}
+    assert today["intervals"] == [[start, start + 60]]
+    shown = api.get("/screen-time", params={"task_id": 1, "date": today["date"]}, headers=ADMIN).json()
+    assert shown["duration_minutes"] == [{"date": today["date"], "time": today["time"], "seconds": 60}]
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+import usage_import
+
+
+@pytest.fixture
+def logs(fake, tmp_path):
+    fake.table("tasks").insert([
+        {"user_id": "u1", "title": "Browse", "appname": "chrome", "is_active": True},
+        {"user_id": "u1", "title": "Code", "appname": "code", "is_active": True},
+        {"user_id": "u1", "title": "Write", "appname": "Code - Insiders", "is_active": True},
+        {"user_id": "u2", "title": "Browse", "appname": "chrome", "is_active": True},
+    ]).execute()
+    fake.table("app_registry").insert([{"name": "VS Code", "appname": "code"},
+                                       {"name": "VS Code Insiders", "appname": "code - insiders"}]).execute()
+    (tmp_path / "usage_2026-10-05.json").write_text(json.dumps({"chrome.exe": 10, "Code - Insiders.exe": 5}))
+    return tmp_path
+
+
+def seconds(fake):
+    return {row["task_id"]: sum(e["seconds"] for e in row["duration_minutes"])
+            for row in fake.tables["screen_time"].values()}
+
+
+def test_match_task_prefers_the_longest_registry_appname():
+    tasks = [{"id": 1, "appname": "code"}, {"id": 2, "appname": "code - insiders"}, {"id": 3, "appname": "chrome"}]
+    matchers = ["code - insiders", "code"]
+    assert usage_import.match_task("Code - Insiders.exe", tasks, matchers)["id"] == 2
+    assert usage_import.match_task("Code.exe", tasks, matchers)["id"] == 1
+    assert usage_import.match_task("chrome.exe", tasks, matchers)["id"] == 3
+    assert usage_import.match_task("notepad.exe", tasks, matchers) is None
+
+
+def test_import_is_applied_once(fake, logs):
+    stats = usage_import.import_logs("u1", logs, workers=1)
+    assert stats["rows"] == 2 and stats["unmatched"] == 0
+    assert seconds(fake) == {1: 600, 3: 300}
+    assert usage_import.import_logs("u1", logs, workers=1)["skipped"] == 1
+    assert seconds(fake) == {1: 600, 3: 300}
+    assert [row["status"] for row in fake.tables["usage_imports"].values()] == ["complete"]
+
+
+def test_interrupted_import_is_not_reapplied(fake, logs, monkeypatch):
+    monkeypatch.setattr(usage_import, "record_many", lambda rows: (_ for _ in ()).throw(RuntimeError("down")))
+    with pytest.raises(RuntimeError):
+        usage_import.import_logs("u1", logs, workers=1)
+    monkeypatch.undo()
+    assert [row["status"] for row in fake.tables["usage_imports"].values()] == ["pending"]
+
+    stats = usage_import.import_logs("u1", logs, workers=1)
+    assert stats["pending"] == 1 and stats["rows"] == 0
+    assert seconds(fake) == {1: 600, 3: 300}
+
+
+def test_same_file_is_imported_for_each_user(fake, logs):
+    usage_import.import_logs("u1", logs, workers=1)
+    stats = usage_import.import_logs("u2", logs, workers=1)
+    assert stats["skipped"] == 0 and stats["unmatched"] == 1
+    assert seconds(fake) == {1: 600, 3: 300, 4: 600}
+    assert sorted(row["user_id"] for row in fake.tables["usage_imports"].values()) == ["u1", "u2"]
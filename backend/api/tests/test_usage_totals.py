@@ -0,0 +1,77 @@
+import time
+from datetime import date
+
+import pytest
+
+import usage_totals
+from conftest import ADMIN
+
+
+@pytest.fixture
+def task(fake):
+    fake.table("tasks").insert({"user_id": "u1", "title": "Write", "appname": "code", "is_active": True}).execute()
+    return 1
+
+
+def ingest(api, seq, seconds=60):
+    start = int(time.time()) - 600 + seq * seconds
+    return api.post("/update-usage", json={"task_id": 1, "app_name": "code", "seconds": seconds, "start": start,
+                                           "end": start + seconds, "agent_id": "agent-1", "seq": seq},
+                    headers=ADMIN)
+
+
+def stored(fake, task_id=1, period="day"):
+    return {row["period_start"]: row["seconds"] for row in fake.tables["usage_totals"].values()
+            if row["task_id"] == task_id and row["period"] == period}
+
+
+def test_reconcile_reports_drift_without_fixing(api, fake, task):
+    ingest(api, 0)
+    ingest(api, 1)
+    row = next(r for r in fake.tables["usage_totals"].values() if r["task_id"] == 1 and r["period"] == "day")
+    row["seconds"] = 30
+    today = date.today().isoformat()
+    drift = usage_totals.reconcile(today)
+    assert [(d["task_id"], d["period"], d["seconds"], d["stored"]) for d in drift] == [(1, "day", 120, 30)]
+    assert stored(fake)[today] == 30
+
+
+def test_fix_skips_rows_changed_since_the_read(api, fake, task, monkeypatch):
+    ingest(api, 0)
+    for row in fake.tables["usage_totals"].values():
+        row["seconds"] = 0
+    original = usage_totals.expected_totals
+
+    def racing(since):
+        # Another sample's counter update lands between the two reads.
+        totals = original(since)
+        for row in fake.tables["usage_totals"].values():
+            if row["task_id"] == 1 and row["period"] == "day":
+                row["seconds"] += 60
+        return totals
+    monkeypatch.setattr(usage_totals, "expected_totals", racing)
+
+    today = date.today().isoformat()
+    drift = usage_totals.reconcile(today, fix=True)
+    fixed = {(d["task_id"], d["period"]): d["fixed"] for d in drift}
+    assert fixed[(1, "day")] is False and fixed[(0, "day")] is True
+    assert stored(fake)[today] == 60
+    assert stored(fake, task_id=0)[today] == 60
+
+
+def test_fix_creates_missing_rows(api, fake, task):
+    ingest(api, 0)
+    fake.tables["usage_totals"].clear()
+    today = date.today().isoformat()
+    drift = usage_totals.reconcile(today, fix=True)
+    assert all(d["fixed"] for d in drift)
+    assert stored(fake)[today] == 60
+    assert usage_totals.reconcile(today) == []
+
+
+def test_scan_skips_rows_not_updated_since(api, fake, task):
+    ingest(api, 0)
+    for row in fake.tables["screen_time"].values():
+        row["updated_at"] = "2000-01-01 00:00:00"
+    drift = usage_totals.reconcile(date.today().isoformat())
+    assert {d["seconds"] for d in drift} == {0}
@@ -0,0 +1,193 @@
+# tracing.py
+# Lightweight spans with W3C `traceparent` propagation. The tracker agent starts
+# a trace per sample and sends its context with /update-usage; the API continues
+# it for the request and every Supabase call. Finished spans of sampled traces
+# go through a queue to a background thread that appends JSON lines to
+# TRACE_FILE and/or POSTs batches to TRACE_COLLECTOR_URL.
+#
+# TRACE_SAMPLE_RATE (default 0.01) applies to traces started here; a sampled
+# flag arriving in traceparent is honoured. Nothing is recorded when neither
+# destination is configured.
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+import requests
+
+TRACE_FILE = os.getenv("TRACE_FILE")
+TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL")
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+ENABLED = bool(TRACE_FILE or TRACE_COLLECTOR_URL)
+TRACEPARENT = re.compile(r"([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+SERVICE = "todo-api"
+BATCH_SIZE = 256
+
+_current = contextvars.ContextVar("trace_span", default=None)
+_queue = queue.Queue(maxsize=10000)
+_exporter = None
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "sampled", "start", "end", "attributes")
+
+    def __init__(self, name, trace_id, parent_id, sampled, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.sampled = sampled
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes or {}
+
+    def set(self, key, value):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def finish(self):
+        self.end = time.time_ns()
+        if self.sampled:
+            _export(self)
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self):
+        return {
+            "service": SERVICE,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start,
+            "duration_us": (self.end - self.start) // 1000,
+            "attributes": self.attributes
+        }
+
+
+def parse_traceparent(header):
+    # Returns (trace_id, parent_span_id, sampled), or None for a malformed
+    # header (the request then starts a new trace).
+    match = TRACEPARENT.fullmatch(header.strip()) if isinstance(header, str) else None
+    if not match:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, int(flags, 16) & 1 == 1
+
+
+def begin(name, traceparent=None, **attributes):
+    # Starts a span under the current one (or the given remote parent) without making it current.
+    parent = _current.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote:
+        trace_id, parent_id, sampled = remote
+    else:
+        trace_id, parent_id = "%032x" % random.getrandbits(128), None
+        sampled = random.random() < SAMPLE_RATE
+    return Span(name, trace_id, parent_id, sampled and ENABLED, attributes)
+
+
+class span:
+    # with tracing.span("name"): ... — starts a child span and makes it current.
+    def __init__(self, name, traceparent=None, **attributes):
+        self.span = begin(name, traceparent, **attributes)
+
+    def __enter__(self):
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        if exc is not None:
+            self.span.set("error", repr(exc))
+        self.span.finish()
+
+
+def current():
+    return _current.get()
+
+
+def _export(finished):
+    global _exporter
+    if _exporter is None:
+        _exporter = threading.Thread(target=_run_exporter, name="trace-exporter", daemon=True)
+        _exporter.start()
+    try:
+        _queue.put_nowait(finished.to_dict())
+    except queue.Full:
+        pass
+
+
+def _run_exporter():
+    while True:
+        batch = [_queue.get()]
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        if TRACE_FILE:
+            with open(TRACE_FILE, "a") as f:
+                f.writelines(json.dumps(item) + "\n" for item in batch)
+        if TRACE_COLLECTOR_URL:
+            try:
+                requests.post(TRACE_COLLECTOR_URL, json={"spans": batch}, timeout=5)
+            except Exception:
+                pass
+
+
+class TracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            return await self.app(scope, receive, send)
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        with span(f"{scope['method']} {scope['path']}", traceparent) as request_span:
+            await self.app(scope, receive, send_with_status)
+            route = scope.get("route")
+            if route is not None:
+                request_span.name = f"{scope['method']} {route.path}"
+            request_span.set("http.status", status[0])
+
+
+def _db_request_started(request):
+    if _current.get() is not None:
+        table = request.url.path.split("/rest/v1/", 1)[-1]
+        request.extensions["trace_span"] = begin(f"db {request.method} {table}")
+
+
+def _db_response_received(response):
+    db_span = response.request.extensions.get("trace_span")
+    if db_span is not None:
+        db_span.set("http.status", response.status_code)
+        db_span.finish()
+
+
+def instrument_supabase(client):
+    session = client.postgrest.session
+    hooks = session.event_hooks
+    hooks["request"].append(_db_request_started)
+    hooks["response"].append(_db_response_received)
+    session.event_hooks = hooks
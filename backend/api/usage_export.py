@@ -0,0 +1,164 @@
+# usage_export.py
+# Streams usage history as CSV or Parquet. screen_time is paged by id (keyset),
+# each page is expanded into one row per day and written out before the next
+# page is fetched, so memory stays flat however long the history is.
+#
+#   python usage_export.py [--user-id <uuid>] [--format csv|parquet] --out usage.csv
+import argparse
+import csv
+import io
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from auth import authorize_user
+from db import supabase
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+router = APIRouter()
+
+COLUMNS = ["user_id", "task_id", "app_name", "date", "time", "seconds"]
+PAGE_SIZE = 500
+
+
+def iter_usage_rows(user_id=None, start=None, end=None, page_size=PAGE_SIZE, updated_since=None):
+    # updated_since skips screen_time rows not written since then (so holding
+    # no entries dated after it).
+    last_id = None
+    while True:
+        query = supabase.table("screen_time") \
+            .select("id, task_id, app_name, duration_minutes, tasks!inner(user_id)")
+        if user_id:
+            query = query.eq("tasks.user_id", user_id)
+        if updated_since:
+            query = query.gte("updated_at", updated_since)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.order("id").limit(page_size).execute().data or []
+
+        for row in rows:
+            owner = row["tasks"]["user_id"]
+            for entry in row.get("duration_minutes") or []:
+                if start and entry["date"] < start:
+                    continue
+                if end and entry["date"] > end:
+                    continue
+                yield {
+                    "user_id": owner,
+                    "task_id": row["task_id"],
+                    "app_name": row["app_name"],
+                    "date": entry["date"],
+                    "time": entry.get("time"),
+                    "seconds": entry.get("seconds", 0)
+                }
+
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def iter_csv(rows, flush_every=PAGE_SIZE):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % flush_every == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    # File-like target for ParquetWriter; bytes are drained after every row group.
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_parquet(rows, row_group_size=10000):
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+    schema = pa.schema([
+        ("user_id", pa.string()),
+        ("task_id", pa.int64()),
+        ("app_name", pa.string()),
+        ("date", pa.string()),
+        ("time", pa.string()),
+        ("seconds", pa.int64()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= row_group_size:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            batch = []
+            yield sink.drain()
+    if batch:
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    writer.close()
+    yield sink.drain()
+
+
+FORMATS = {
+    "csv": (iter_csv, "text/csv"),
+    "parquet": (iter_parquet, "application/vnd.apache.parquet"),
+}
+
+
+@router.get("/export/usage")
+def export_usage(request: Request, format: str = "csv", user_id: str = None, start: str = None, end: str = None):
+    authorize_user(request, user_id)
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or parquet")
+    if format == "parquet" and pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export is not available on this server")
+    encode, media_type = FORMATS[format]
+    filename = f"usage_{user_id or 'all'}.{format}"
+    return StreamingResponse(
+        encode(iter_usage_rows(user_id, start, end)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export usage history")
+    parser.add_argument("--user-id", default=None, help="omit to export every user")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--start", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    encode, _ = FORMATS[args.format]
+    with open(args.out, "wb") as f:
+        for chunk in encode(iter_usage_rows(args.user_id, args.start, args.end)):
+            f.write(chunk)
+    print(f"[EXPORT] Wrote {args.out}")
@@ -0,0 +1,153 @@
+# usage_heatmap.py
+# When usage happens: seconds per weekday and hour of day (server local
+# time), per task, per user and for the whole tenant. Ingest splits every
+# newly credited interval at hour boundaries and adds it to a 168-cell tile
+# per task and week (table usage_hours) through increment_usage_hours(), so
+# a heatmap never reads screen_time.
+#
+#   GET /usage/heatmap?task_id=<id> | ?user_id=<id>   (default: the caller)
+#                     &weeks=12&until=YYYY-MM-DD
+#   GET /admin/usage/heatmap?weeks=12&until=           every user's usage
+#       {"from", "to", "weeks", "days": ["Mon", ...],
+#        "seconds": [[24 hours] x 7 days], "max"}
+#
+# The range is the `weeks` weeks ending with the one containing `until`
+# (default today). Closed weeks' tiles are cached for
+# HEATMAP_CLOSED_TTL_SECONDS (default 3600), so a year-long range costs one
+# query for the current week.
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+import auth
+from auth import require_admin
+from db import supabase
+from usage_store import task_owner
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+CELLS = 7 * 24
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+CLOSED_TTL_SECONDS = int(os.getenv("HEATMAP_CLOSED_TTL_SECONDS", "3600"))
+CACHE_TILES = 50000
+MAX_WEEKS = 106
+
+_tiles = OrderedDict()
+_lock = threading.Lock()
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def hour_cells(start, end):
+    # Yields (week_start, cell, seconds) pieces of an epoch-seconds interval,
+    # cut at local hour boundaries.
+    while start < end:
+        at = datetime.fromtimestamp(start)
+        hour_end = int((at.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)).timestamp())
+        # max(): around a DST change the next local hour can map backwards.
+        piece_end = min(end, max(hour_end, start + 1))
+        yield week_start(at.date()).isoformat(), at.weekday() * 24 + at.hour, piece_end - start
+        start = piece_end
+
+
+def record(user_id, task_id, pieces):
+    # pieces: the [start, end) intervals a sample newly credited. Failures are
+    # logged, not raised: the usage itself has already been stored.
+    cells = defaultdict(int)
+    for start, end in pieces:
+        for week, cell, seconds in hour_cells(start, end):
+            cells[week, cell] += seconds
+    if not cells:
+        return
+    try:
+        supabase.rpc("increment_usage_hours", {"p_rows": [
+            {"user_id": user_id, "task_id": task_id, "week": week, "cell": cell, "seconds": seconds}
+            for (week, cell), seconds in cells.items()
+        ]}).execute()
+    except Exception as e:
+        logger.warning("Heatmap update failed for task %s: %s", task_id, e)
+
+
+def _fetch(user_id, task_id, first, last):
+    rows = supabase.rpc("usage_heatmap", {
+        "p_user_id": user_id, "p_task_id": task_id, "p_from": first.isoformat(), "p_to": last.isoformat()
+    }).execute().data or []
+    return {row["week_start"]: row["seconds"] for row in rows}
+
+
+def _weeks(key, user_id, task_id, weeks):
+    # {week: tile or None} for the given week starts; closed weeks come from
+    # the cache when fresh, and everything else is read in one query.
+    current = week_start(date.today()).isoformat()
+    found, missing = {}, []
+    now = time.monotonic()
+    with _lock:
+        for week in weeks:
+            entry = _tiles.get((key, week)) if week < current else None
+            if entry is not None and now - entry[0] <= CLOSED_TTL_SECONDS:
+                _tiles.move_to_end((key, week))
+                found[week] = entry[1]
+            else:
+                missing.append(week)
+    if missing:
+        tiles = _fetch(user_id, task_id, date.fromisoformat(missing[0]), date.fromisoformat(missing[-1]))
+        with _lock:
+            for week in missing:
+                found[week] = tiles.get(week)
+                if week < current:
+                    # Empty weeks are cached too, so sparse ranges stay cheap.
+                    _tiles[(key, week)] = (now, found[week])
+            while len(_tiles) > CACHE_TILES:
+                _tiles.popitem(last=False)
+    return found
+
+
+def heatmap(key, user_id, task_id, weeks, until):
+    weeks = min(max(weeks, 1), MAX_WEEKS)
+    try:
+        last = week_start(date.fromisoformat(until) if until else date.today())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="until must be YYYY-MM-DD")
+    starts = [(last - timedelta(weeks=n)).isoformat() for n in range(weeks - 1, -1, -1)]
+    totals = [0] * CELLS
+    for tile in _weeks(key, user_id, task_id, starts).values():
+        for cell, seconds in enumerate(tile or ()):
+            totals[cell] += seconds
+    return {
+        "from": starts[0],
+        "to": (last + timedelta(days=6)).isoformat(),
+        "weeks": weeks,
+        "days": DAYS,
+        "seconds": [totals[d * 24:(d + 1) * 24] for d in range(7)],
+        "max": max(totals)
+    }
+
+
+@router.get("/usage/heatmap")
+def usage_heatmap(request: Request, task_id: int = None, user_id: str = None, weeks: int = 12,
+                  until: str = None):
+    if task_id is not None:
+        auth.authorize_task(request, task_id)
+        owner = task_owner(task_id)
+        if owner is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return dict(heatmap(("task", task_id), owner, task_id, weeks, until), task_id=task_id)
+    user = auth.current_user(request)
+    user_id = user_id or (user and user["sub"])
+    if not user_id:
+        raise HTTPException(status_code=400, detail="task_id or user_id is required")
+    auth.authorize_user(request, user_id)
+    return dict(heatmap(("user", user_id), user_id, 0, weeks, until), user_id=user_id)
+
+
+@router.get("/admin/usage/heatmap", dependencies=[Depends(require_admin)])
+def tenant_heatmap(weeks: int = 12, until: str = None):
+    return heatmap(("all",), None, 0, weeks, until)
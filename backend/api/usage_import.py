@@ -0,0 +1,207 @@
+# usage_import.py
+# Bulk-loads the local usage logs (logs/usage_data.json, logs/usage_YYYY-MM-DD.json)
+# into screen_time. Each log is a map of exe name -> minutes.
+#
+#   python usage_import.py --user-id <uuid> [--logs-dir logs] [--batch-size 500] [--retry-pending]
+#
+# A file is claimed in usage_imports as "pending" before its minutes are
+# applied and marked "complete" after, so a rerun never applies it twice. A
+# run that died in between leaves its files pending: they are reported and
+# skipped until --retry-pending is passed (after checking the run did not
+# get as far as writing screen_time).
+import argparse
+import hashlib
+import json
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from app_registry import matchers as registry_matchers
+from db import supabase
+from usage_store import add_seconds
+from usage_totals import record_many
+
+LOGS_DIR = Path(__file__).parent / "logs"
+DATED_LOG = re.compile(r"usage_(\d{4}-\d{2}-\d{2})\.json$")
+
+
+def scan_logs(logs_dir):
+    return sorted(p for p in Path(logs_dir).glob("usage_*.json") if p.is_file())
+
+
+def file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def parse_log(path):
+    # Runs in a worker process; returns (date, {exe: seconds}).
+    path = Path(path)
+    match = DATED_LOG.search(path.name)
+    if match:
+        date_str = match.group(1)
+    else:
+        date_str = datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y-%m-%d")
+    with open(path, "r") as f:
+        data = json.load(f)
+    usage = {}
+    for exe, minutes in data.items():
+        seconds = round(float(minutes) * 60)
+        if seconds > 0:
+            usage[exe] = seconds
+    return date_str, usage
+
+
+def match_task(exe, tasks, matchers=()):
+    # Same rule the tracker agent uses: an exe containing a registry appname
+    # (the longest one) matches tasks for exactly that app; other exes fall
+    # back to the task appname being contained in the exe name.
+    exe = exe.lower()
+    app = next((m for m in matchers if m in exe), None)
+    for task in tasks:
+        appname = (task["appname"] or "").lower()
+        if appname and (appname == app if app else appname in exe):
+            return task
+    return None
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def import_logs(user_id, logs_dir=LOGS_DIR, batch_size=500, workers=None, retry_pending=False):
+    started = time.perf_counter()
+    paths = scan_logs(logs_dir)
+    hashes = {str(p): file_hash(p) for p in paths}
+
+    status = {}
+    for batch in chunks(list(hashes.values()), batch_size):
+        res = supabase.table("usage_imports") \
+            .select("file_hash, status") \
+            .eq("user_id", user_id) \
+            .in_("file_hash", batch) \
+            .execute()
+        status.update({row["file_hash"]: row["status"] for row in res.data or []})
+    stuck = [p for p in paths if status.get(hashes[str(p)]) == "pending"]
+    new = [p for p in paths if hashes[str(p)] not in status]
+
+    now = datetime.now()
+    time_str = now.strftime("%H:%M:%S")
+    updated_at = now.strftime("%Y-%m-%d %H:%M:%S")
+    # Claim new files before touching screen_time; a file another import for
+    # this user claimed first is left to it.
+    claimed = set()
+    records = [{
+        "file_hash": hashes[str(p)],
+        "file_name": p.name,
+        "user_id": user_id,
+        "status": "pending",
+        "imported_at": updated_at
+    } for p in new]
+    for batch in chunks(records, batch_size):
+        res = supabase.table("usage_imports") \
+            .upsert(batch, on_conflict="user_id,file_hash", ignore_duplicates=True) \
+            .execute()
+        claimed.update(row["file_hash"] for row in res.data or [])
+    pending = [p for p in new if hashes[str(p)] in claimed] + (stuck if retry_pending else [])
+
+    stats = {"files": len(paths), "skipped": len(paths) - len(pending), "rows": 0, "unmatched": 0,
+             "pending": 0 if retry_pending else len(stuck)}
+    if not pending:
+        stats["seconds"] = time.perf_counter() - started
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parsed = list(pool.map(parse_log, pending, chunksize=16))
+
+    tasks = supabase.table("tasks").select("id, appname").eq("user_id", user_id).execute().data or []
+    matchers = registry_matchers(supabase.table("app_registry").select("appname").execute().data or [])
+    per_task = defaultdict(lambda: defaultdict(int))
+    app_names = {}
+    for date_str, usage in parsed:
+        for exe, seconds in usage.items():
+            stats["rows"] += 1
+            task = match_task(exe, tasks, matchers)
+            if not task:
+                stats["unmatched"] += 1
+                continue
+            per_task[task["id"]][date_str] += seconds
+            app_names[task["id"]] = task["appname"]
+
+    task_ids = list(per_task)
+    existing = {}
+    for batch in chunks(task_ids, batch_size):
+        res = supabase.table("screen_time") \
+            .select("id, task_id, app_name, duration_minutes") \
+            .in_("task_id", batch) \
+            .execute()
+        existing.update({row["task_id"]: row for row in res.data or []})
+
+    updates, inserts = [], []
+    for task_id in task_ids:
+        row = existing.get(task_id)
+        minutes_list = (row.get("duration_minutes") if row else None) or []
+        for date_str in sorted(per_task[task_id]):
+            add_seconds(minutes_list, date_str, time_str, per_task[task_id][date_str])
+        if row:
+            updates.append({
+                "id": row["id"],
+                "task_id": task_id,
+                "app_name": row["app_name"],
+                "duration_minutes": minutes_list,
+                "updated_at": updated_at
+            })
+        else:
+            inserts.append({
+                "task_id": task_id,
+                "app_name": app_names[task_id],
+                "date": minutes_list[0]["date"],
+                "duration_minutes": minutes_list,
+                "updated_at": updated_at
+            })
+
+    for batch in chunks(updates, batch_size):
+        supabase.table("screen_time").upsert(batch, on_conflict="id").execute()
+    for batch in chunks(inserts, batch_size):
+        supabase.table("screen_time").insert(batch).execute()
+
+    increments = [
+        {"user_id": user_id, "task_id": task_id, "day": date_str, "seconds": seconds}
+        for task_id, days in per_task.items()
+        for date_str, seconds in days.items()
+    ]
+    for batch in chunks(increments, batch_size):
+        record_many(batch)
+
+    for batch in chunks([hashes[str(p)] for p in pending], batch_size):
+        supabase.table("usage_imports") \
+            .update({"status": "complete"}) \
+            .eq("user_id", user_id) \
+            .in_("file_hash", batch) \
+            .execute()
+
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import local usage logs into screen_time")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--logs-dir", default=str(LOGS_DIR))
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--retry-pending", action="store_true",
+                        help="re-apply files an interrupted import left pending")
+    args = parser.parse_args()
+
+    stats = import_logs(args.user_id, args.logs_dir, args.batch_size, args.workers, args.retry_pending)
+    rate = stats["rows"] / stats["seconds"] if stats["seconds"] else 0
+    print(f"[IMPORT] {stats['files']} files ({stats['skipped']} already imported), "
+          f"{stats['rows']} rows ({stats['unmatched']} unmatched) in {stats['seconds']:.2f}s "
+          f"-> {rate:.0f} rows/sec")
+    if stats["pending"]:
+        print(f"[IMPORT] {stats['pending']} files left pending by an interrupted import were not applied; "
+              f"rerun with --retry-pending once screen_time is checked")
@@ -0,0 +1,65 @@
+# usage_store.py
+# Helpers for the `screen_time.duration_minutes` array: one entry per day,
+# {"date": "YYYY-MM-DD", "time": "HH:MM:SS", "seconds": N}. Entries credited
+# from intervals also carry "intervals": [[start, end], ...] in epoch seconds,
+# kept only while ingest still accepts samples for that day (prune_intervals)
+# and never sent to clients (without_intervals).
+from db import supabase
+from intervals import IntervalSet
+
+_task_owners = {}
+
+
+def find_day(minutes_list, date_str):
+    for entry in minutes_list:
+        if entry["date"] == date_str:
+            return entry
+    return None
+
+
+def add_seconds(minutes_list, date_str, time_str, seconds):
+    entry = find_day(minutes_list, date_str)
+    if entry:
+        entry["time"] = time_str
+        entry["seconds"] += seconds
+    else:
+        entry = {"date": date_str, "time": time_str, "seconds": seconds}
+        minutes_list.append(entry)
+    return entry
+
+
+def add_interval(minutes_list, date_str, time_str, start, end):
+    # Returns the parts of [start, end) not already covered that day.
+    entry = find_day(minutes_list, date_str)
+    if not entry:
+        entry = {"date": date_str, "time": time_str, "seconds": 0}
+        minutes_list.append(entry)
+    covered = IntervalSet(entry.get("intervals") or [])
+    gaps = covered.gaps(start, end)
+    entry["seconds"] += covered.add(start, end)
+    entry["intervals"] = covered.to_list()
+    entry["time"] = time_str
+    return gaps
+
+
+def prune_intervals(minutes_list, keep_from):
+    # Drops the intervals of days before keep_from (YYYY-MM-DD): no sample
+    # can be merged into them any more, and they would otherwise be rewritten
+    # with the row on every sample forever.
+    for entry in minutes_list:
+        if entry["date"] < keep_from:
+            entry.pop("intervals", None)
+
+
+def without_intervals(minutes_list):
+    return [{k: v for k, v in entry.items() if k != "intervals"} for entry in minutes_list or []]
+
+
+def task_owner(task_id):
+    # A task never changes owner, so the lookup is cached for the process lifetime.
+    if task_id not in _task_owners:
+        res = supabase.table("tasks").select("user_id").eq("id", task_id).maybe_single().execute()
+        if not res or not res.data:
+            return None
+        _task_owners[task_id] = res.data["user_id"]
+    return _task_owners[task_id]
@@ -0,0 +1,264 @@
+# usage_stream.py
+# Live screen_time for the dashboard. One publisher per process polls the
+# active tasks' screen_time every USAGE_PUBLISH_SECONDS (default 10) and fans
+# the changes out to every watcher, so a watcher costs no database work.
+#
+#   GET /usage/stream      Server-Sent Events, gzip-compressed when accepted
+#       event: snapshot    the caller's rows, on connect
+#       event: usage       {"rows": [changed rows], "removed": [task ids],
+#                           "alerts": [new alert_outbox rows]}
+#       : ping             after USAGE_HEARTBEAT_SECONDS (default 15) of quiet
+#   WS  /ws/usage          the caller's full row list on every change (and
+#                          at least every USAGE_HEARTBEAT_SECONDS), and
+#                          {"alerts": [...]} when goal alerts fire
+#
+# Event ids are "<epoch>.<seq>". A reconnect sending Last-Event-ID (header, or
+# ?last_event_id= for clients that reconnect by hand) from this process, at
+# most USAGE_HISTORY (default 360) events old, gets only the events it missed;
+# anything else gets a fresh snapshot.
+import asyncio
+import json
+import logging
+import os
+import secrets
+import zlib
+from collections import deque
+
+from fastapi import APIRouter, Request, WebSocket
+from fastapi.responses import StreamingResponse
+
+import alerts
+import auth
+import metrics
+from db import supabase
+from usage_store import without_intervals
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+PUBLISH_SECONDS = float(os.getenv("USAGE_PUBLISH_SECONDS", "10"))
+HEARTBEAT_SECONDS = float(os.getenv("USAGE_HEARTBEAT_SECONDS", "15"))
+HISTORY = int(os.getenv("USAGE_HISTORY", "360"))
+COLUMNS = "id, app_name, duration_minutes, updated_at, task_id, tasks!inner(is_active, user_id)"
+
+WATCHERS = metrics.Gauge("api_usage_watchers", "Open live usage connections", ("transport",))
+PUBLISHES = metrics.Counter("api_usage_publishes_total", "Usage publisher polls by result", ("result",))
+
+
+def _owner(row):
+    return (row.get("tasks") or {}).get("user_id")
+
+
+def _visible(row, user_id):
+    # user_id None means the caller may see every task.
+    return user_id is None or _owner(row) == user_id
+
+
+def _alert_visible(alert, user_id):
+    return user_id is None or alert["user_id"] == user_id
+
+
+class Publisher:
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self.rows = {}
+        self.history = deque(maxlen=HISTORY)
+        self.alerts_after = None
+        self.subscribers = 0
+        self._task = None
+        self._changed = None
+        self._wake = None
+        self._ready = None
+
+    def start(self):
+        # Called at startup so polls don't run in (and get traced as part of)
+        # the first watcher's request context.
+        if self._task is None:
+            self._changed = asyncio.Event()
+            self._wake = asyncio.Event()
+            self._ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def subscribe(self):
+        # Pair with unsubscribe() in a finally; the count is taken before
+        # the first await.
+        self.start()
+        self.subscribers += 1
+        self._wake.set()
+        await self._ready.wait()
+
+    def unsubscribe(self):
+        self.subscribers -= 1
+
+    async def _run(self):
+        while True:
+            if not self.subscribers:
+                # Nothing is watching: stop polling, and make the next
+                # subscriber wait for a fresh poll instead of stale rows.
+                self._ready.clear()
+                self._wake.clear()
+                self.alerts_after = None
+                await self._wake.wait()
+            try:
+                rows, new_alerts = await asyncio.to_thread(self._fetch)
+            except Exception as e:
+                PUBLISHES.inc("error")
+                logger.warning("Usage poll failed: %s", e)
+            else:
+                self._publish(rows, new_alerts)
+            self._ready.set()
+            await asyncio.sleep(PUBLISH_SECONDS)
+
+    def _fetch(self):
+        rows = supabase.table("screen_time").select(COLUMNS).eq("tasks.is_active", True).execute().data or []
+        for row in rows:
+            row["duration_minutes"] = without_intervals(row["duration_minutes"])
+        # Alerts raised before anyone was watching are not replayed.
+        if self.alerts_after is None:
+            self.alerts_after = alerts.latest_id()
+        return rows, alerts.since(self.alerts_after)
+
+    def _publish(self, rows, new_alerts=()):
+        current = {row["id"]: row for row in rows}
+        changed = [row for key, row in current.items() if self.rows.get(key) != row]
+        removed = [row for key, row in self.rows.items() if key not in current]
+        self.rows = current
+        if new_alerts:
+            self.alerts_after = new_alerts[-1]["id"]
+        if not changed and not removed and not new_alerts:
+            PUBLISHES.inc("unchanged")
+            return
+        PUBLISHES.inc("changed")
+        self.seq += 1
+        self.history.append((self.seq, changed, removed, list(new_alerts)))
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    def event_id(self, seq):
+        return f"{self.epoch}.{seq}"
+
+    def parse_event_id(self, event_id):
+        # The seq a resuming client has seen, or None if it can't resume here.
+        epoch, _, seq = (event_id or "").partition(".")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        return int(seq)
+
+    def snapshot(self, user_id):
+        return [row for row in self.rows.values() if _visible(row, user_id)]
+
+    def since(self, seq):
+        # Change sets after seq, or None when history no longer reaches back.
+        if seq == self.seq:
+            return []
+        if not self.history or self.history[0][0] > seq + 1:
+            return None
+        return [entry for entry in self.history if entry[0] > seq]
+
+    async def wait(self, seq, timeout):
+        # Returns once there is anything after seq, or after timeout.
+        if seq == self.seq:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.since(seq)
+
+
+publisher = Publisher()
+
+
+def _viewer(request):
+    # Admins (and the admin key) see every active task; users their own.
+    user = auth.current_user(request)
+    return None if user is None or auth.is_admin(user) else user["sub"]
+
+
+def _sse(name, data, seq=None):
+    head = f"id: {publisher.event_id(seq)}\n" if seq is not None else ""
+    return f"{head}event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def _delta(entries, user_id):
+    rows, removed, fired = [], [], []
+    for _, changed, gone, new_alerts in entries:
+        rows.extend(row for row in changed if _visible(row, user_id))
+        removed.extend(row["task_id"] for row in gone if _visible(row, user_id))
+        fired.extend(alert for alert in new_alerts if _alert_visible(alert, user_id))
+    return {"rows": rows, "removed": removed, "alerts": fired}
+
+
+async def _events(user_id, last_event_id):
+    WATCHERS.inc("sse")
+    try:
+        await publisher.subscribe()
+        yield b"retry: 3000\n\n"
+        seq = publisher.parse_event_id(last_event_id)
+        entries = publisher.since(seq) if seq is not None else None
+        while True:
+            if entries is None:
+                # New client, or one further behind than the history reaches.
+                seq = publisher.seq
+                yield _sse("snapshot", publisher.snapshot(user_id), seq)
+            elif not entries:
+                yield b": ping\n\n"
+            else:
+                seq = entries[-1][0]
+                delta = _delta(entries, user_id)
+                if any(delta.values()):
+                    yield _sse("usage", delta, seq)
+            entries = await publisher.wait(seq, HEARTBEAT_SECONDS)
+    finally:
+        publisher.unsubscribe()
+        WATCHERS.dec("sse")
+
+
+def _gzip(chunks):
+    # A small window and memLevel keep each stream's compressor around 32KB;
+    # a sync flush per event lets it reach the browser straight away.
+    async def compressed():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + 12, 5)
+        try:
+            async for chunk in chunks:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        finally:
+            await chunks.aclose()
+    return compressed()
+
+
+@router.get("/usage/stream")
+async def usage_stream(request: Request, last_event_id: str = None):
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+    body = _events(_viewer(request), request.headers.get("last-event-id") or last_event_id)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        body = _gzip(body)
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)
+
+
+@router.websocket("/ws/usage")
+async def websocket_usage(websocket: WebSocket):
+    await websocket.accept()
+    user_id = _viewer(websocket)
+    metrics.WEBSOCKETS.inc("/ws/usage")
+    WATCHERS.inc("websocket")
+    try:
+        await publisher.subscribe()
+        seq = publisher.seq
+        await websocket.send_json(publisher.snapshot(user_id))
+        while True:
+            entries = await publisher.wait(seq, HEARTBEAT_SECONDS)
+            seq = publisher.seq
+            delta = _delta(entries or [], user_id)
+            # Resend on any visible change, and as a heartbeat when quiet.
+            if not entries or delta["rows"] or delta["removed"]:
+                await websocket.send_json(publisher.snapshot(user_id))
+            if delta["alerts"]:
+                await websocket.send_json({"alerts": delta["alerts"]})
+    except Exception as e:
+        logger.info("WebSocket disconnected: %s", e)
+    finally:
+        publisher.unsubscribe()
+        metrics.WEBSOCKETS.dec("/ws/usage")
+        WATCHERS.dec("websocket")
@@ -0,0 +1,181 @@
+# usage_totals.py
+# Materialized per-user and per-task day/week totals (table usage_totals).
+# Ingest adds to them through the increment_usage_totals() function, so reads
+# are a single primary-key lookup instead of a scan of duration_minutes.
+# task_id 0 holds the user's total across all tasks.
+#
+#   python usage_totals.py --reconcile [--since YYYY-MM-DD] [--fix]
+#
+# Reconciling compares them with screen_time. --fix only overwrites a drifted
+# row if it still holds the value that was read, so an increment that lands
+# during the scan is never lost; a sample caught between its screen_time write
+# and its increment can still be reported, so the periodic check in the API
+# (USAGE_RECONCILE_INTERVAL) only reports unless USAGE_RECONCILE_FIX=1.
+import argparse
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+
+from fastapi import APIRouter, HTTPException, Request
+
+import task_progress
+from auth import authorize_user
+from db import supabase
+from usage_export import iter_usage_rows
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+ALL_TASKS = 0
+PERIODS = ("day", "week")
+PAGE_SIZE = 1000
+RECONCILE_FIX = os.getenv("USAGE_RECONCILE_FIX") == "1"
+
+
+def week_start(date_str):
+    day = date.fromisoformat(date_str)
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def period_start(period, date_str):
+    return date_str if period == "day" else week_start(date_str)
+
+
+def record_many(rows):
+    # rows: [{"user_id", "task_id", "day", "seconds"}]; applied in one statement.
+    if rows:
+        supabase.rpc("increment_usage_totals", {"p_rows": rows}).execute()
+
+
+def record(user_id, task_id, date_str, seconds):
+    record_many([{"user_id": user_id, "task_id": task_id, "day": date_str, "seconds": seconds}])
+
+
+def get_total(user_id, task_id=ALL_TASKS, period="day", date_str=None):
+    date_str = date_str or date.today().isoformat()
+    res = supabase.table("usage_totals") \
+        .select("seconds") \
+        .eq("user_id", user_id) \
+        .eq("task_id", task_id) \
+        .eq("period", period) \
+        .eq("period_start", period_start(period, date_str)) \
+        .maybe_single() \
+        .execute()
+    return res.data["seconds"] if res and res.data else 0
+
+
+def expected_totals(since=None):
+    # Rows last written before `since` hold no entries from then on; the
+    # extra day covers entries a skewed agent clock dated ahead of the server.
+    updated_since = since and (date.fromisoformat(since) - timedelta(days=1)).isoformat()
+    totals = defaultdict(int)
+    for row in iter_usage_rows(start=since, updated_since=updated_since):
+        for period in PERIODS:
+            start = period_start(period, row["date"])
+            totals[(row["user_id"], row["task_id"], period, start)] += row["seconds"]
+            totals[(row["user_id"], ALL_TASKS, period, start)] += row["seconds"]
+    return totals
+
+
+def stored_totals(since=None):
+    totals = {}
+    offset = 0
+    while True:
+        query = supabase.table("usage_totals").select("user_id, task_id, period, period_start, seconds")
+        if since:
+            query = query.gte("period_start", week_start(since))
+        rows = query.order("user_id").order("task_id").order("period").order("period_start") \
+            .range(offset, offset + PAGE_SIZE - 1).execute().data or []
+        for row in rows:
+            totals[(row["user_id"], row["task_id"], row["period"], row["period_start"])] = row["seconds"]
+        if len(rows) < PAGE_SIZE:
+            return totals
+        offset += PAGE_SIZE
+
+
+def _fix(row, exists):
+    # Compare-and-set: skipped (False) if the row changed since it was read.
+    keys = {k: row[k] for k in ("user_id", "task_id", "period", "period_start")}
+    if not exists:
+        res = supabase.table("usage_totals") \
+            .upsert(dict(keys, seconds=row["seconds"]), on_conflict="user_id,task_id,period,period_start",
+                    ignore_duplicates=True) \
+            .execute()
+        return bool(res.data)
+    query = supabase.table("usage_totals").update({"seconds": row["seconds"]})
+    for column, value in keys.items():
+        query = query.eq(column, value)
+    return bool(query.eq("seconds", row["stored"]).execute().data)
+
+
+def reconcile(since=None, fix=False):
+    # A week that starts before `since` is only partly covered by the raw scan,
+    # so those week rows are left out of the comparison. Stored totals are read
+    # first, so an increment landing mid-scan makes a row look short, never
+    # long; a fix then still only applies to rows unchanged since the read.
+    stored = stored_totals(since)
+    expected = expected_totals(since)
+    drift = []
+    for key in expected.keys() | stored.keys():
+        user_id, task_id, period, start = key
+        if since and start < since:
+            continue
+        want, have = expected.get(key, 0), stored.get(key, 0)
+        if want != have:
+            drift.append({
+                "user_id": user_id,
+                "task_id": task_id,
+                "period": period,
+                "period_start": start,
+                "seconds": want,
+                "stored": have
+            })
+    if fix and drift:
+        for row in drift:
+            key = (row["user_id"], row["task_id"], row["period"], row["period_start"])
+            row["fixed"] = _fix(row, key in stored)
+        task_progress.invalidate()
+    return drift
+
+
+async def reconcile_periodically(interval_seconds, lookback_days=7, fix=RECONCILE_FIX):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        since = (date.today() - timedelta(days=lookback_days)).isoformat()
+        try:
+            drift = await asyncio.to_thread(reconcile, since, fix)
+            if drift:
+                logger.warning("usage_totals drift on %d rows since %s", len(drift), since,
+                               extra={"fixed": fix, "sample": drift[:10]})
+        except Exception:
+            logger.exception("usage_totals reconciliation failed")
+
+
+@router.get("/usage-totals")
+def usage_totals(request: Request, user_id: str, task_id: int = ALL_TASKS, period: str = "day", date: str = None):
+    authorize_user(request, user_id)
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail="period must be day or week")
+    return {
+        "user_id": user_id,
+        "task_id": task_id,
+        "period": period,
+        "seconds": get_total(user_id, task_id, period, date)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check usage_totals against screen_time")
+    parser.add_argument("--reconcile", action="store_true", required=True)
+    parser.add_argument("--since", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--fix", action="store_true", help="overwrite drifted rows")
+    args = parser.parse_args()
+
+    drift = reconcile(args.since, args.fix)
+    for row in drift:
+        print(f"[DRIFT] {row['user_id']} task={row['task_id']} {row['period']} {row['period_start']}: "
+              f"stored {row['stored']}s, raw {row['seconds']}s{'' if row.get('fixed', True) else ' (changed, skipped)'}")
+    fixed = sum(1 for row in drift if row.get("fixed"))
+    print(f"[RECONCILE] {len(drift)} drifted rows" + (f", {fixed} fixed" if args.fix else ""))
@@ -0,0 +1,18 @@
+# Tracker tests run off Windows: tracker_shared falls back to no win32 modules.
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import tracker_shared  # noqa: E402
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracker_shared, "CONFIG_FILE", tmp_path / "config.json")
+    tracker_shared._spool.clear()
+    tracker_shared._session.update(access_token=None, refresh_token=None, expires_at=None)
+    yield tmp_path / "config.json"
+    tracker_shared._spool.clear()
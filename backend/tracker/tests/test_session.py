@@ -0,0 +1,74 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import tracker_agent
+import tracker_shared
+
+
+def session(token, expires_in=3600):
+    return SimpleNamespace(access_token=token, refresh_token=f"refresh-{token}",
+                           expires_at=int(time.time()) + expires_in)
+
+
+class FakeAuth:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def refresh_session(self, refresh_token):
+        self.calls.append(refresh_token)
+        if self.fail:
+            raise RuntimeError("refresh token revoked")
+        return SimpleNamespace(user=SimpleNamespace(id="u1"), session=session("new"))
+
+
+class Backend:
+    # Accepts only the "new" access token, like the API once "old" expired.
+    def __init__(self):
+        self.accepted = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        if headers["Authorization"] != "Bearer new":
+            return SimpleNamespace(status_code=401)
+        self.accepted.append(json["seq"])
+        return SimpleNamespace(status_code=200)
+
+
+@pytest.fixture
+def agent(config, monkeypatch):
+    auth = FakeAuth()
+    backend = Backend()
+    monkeypatch.setattr(tracker_shared, "get_supabase", lambda: SimpleNamespace(auth=auth))
+    monkeypatch.setattr(tracker_shared, "requests", backend)
+    tracker_shared.save_credentials("u1", session("old"))
+    return auth, backend
+
+
+def test_expired_token_is_refreshed_on_401(agent, config):
+    auth, backend = agent
+    tracker_shared.send_usage(1, "code", 60)
+    assert backend.accepted == [0] and tracker_shared._spool == []
+    assert auth.calls == ["refresh-old"]
+    saved = json.loads(config.read_text())
+    assert (saved["user_id"], saved["access_token"], saved["refresh_token"]) == ("u1", "new", "refresh-new")
+
+
+def test_token_is_refreshed_before_it_expires(agent):
+    auth, backend = agent
+    tracker_shared.save_credentials("u1", session("old", expires_in=60))
+    tracker_shared.send_usage(1, "code", 60)
+    assert auth.calls == ["refresh-old"] and backend.accepted == [0]
+
+
+def test_agent_stops_when_the_refresh_fails(agent, monkeypatch):
+    auth, backend = agent
+    auth.fail = True
+    monkeypatch.setattr(tracker_agent, "get_active_window_app", lambda: "Code.exe")
+    monkeypatch.setattr(tracker_agent, "get_active_tasks", lambda user_id: [{"id": 1, "appname": "code"}])
+    monkeypatch.setattr(tracker_agent, "get_app_matchers", lambda: [])
+    monkeypatch.setattr(tracker_agent.time, "sleep", lambda seconds: pytest.fail("agent kept sampling"))
+    tracker_agent.run_tracker()
+    assert backend.accepted == [] and len(tracker_shared._spool) == 1
@@ -6,14 +6,19 @@ import requests
 from dotenv import load_dotenv
 import os
 import json
+import logging
 import sys
 from pathlib import Path
 import winreg
 from supabase import create_client, Client
 
+import tracker_logging
+
 # Load .env
 load_dotenv()
 
+logger = logging.getLogger("tracker")
+
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
 SUPABASE_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
 API_BACKEND_URL = os.getenv("API_BACKEND_URL")
@@ -48,9 +53,9 @@ def add_to_startup():
     try:
         with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_key, 0, winreg.KEY_SET_VALUE) as key:
             winreg.SetValueEx(key, "ToDoTracker", 0, winreg.REG_SZ, exe_path)
-        print("✅ Tracker added to Windows startup.")
-    except Exception as e:
-        print("⚠️ Failed to add tracker to startup:", e)
+        logger.info("Tracker added to Windows startup: %s", exe_path)
+    except Exception:
+        logger.exception("Failed to add tracker to startup")
 
 
 # ✅ Login prompt for first time or expired token
@@ -94,7 +99,7 @@ def get_active_window_app():
         process = psutil.Process(pid)
         return process.name()
     except Exception as e:
-        print("[WARN] Could not get active window:", e)
+        logger.warning("Could not get active window: %s", e)
         return None
 
 
@@ -108,19 +113,22 @@ def get_active_tasks(user_id):
             .execute()
         return res.data or []
     except Exception as e:
-        print("[ERROR] Failed to fetch active tasks:", e)
+        logger.error("Failed to fetch active tasks: %s", e)
         return []
 
 
 # ✅ Send usage to backend
 def send_usage(task_id, app_name, seconds, token):
+    start = int(time.time())
     try:
         response = requests.post(
             f"{API_BACKEND_URL}/update-usage",
             json={
                 "task_id": task_id,
                 "app_name": app_name,
-                "seconds": seconds
+                "seconds": seconds,
+                "start": start,
+                "end": start + seconds
             },
             headers={
                 "Authorization": f"Bearer {token}",
@@ -128,12 +136,12 @@ def send_usage(task_id, app_name, seconds, token):
             }
         )
         if response.status_code == 401:
-            print("[ERROR] Unauthorized - token may be expired. Please re-login.")
+            logger.error("Unauthorized - token may be expired. Please re-login.")
             return False
-        print(f"[SUCCESS] Usage sent for {app_name} ({task_id}): {response.status_code}")
+        logger.info("Usage sent for %s (%s): %d", app_name, task_id, response.status_code)
         return True
     except Exception as e:
-        print("[ERROR] Failed to send usage:", e)
+        logger.error("Failed to send usage: %s", e)
         return True
 
 
@@ -146,7 +154,7 @@ def run_tracker():
     if not user_id or not access_token:
         user_id, access_token = login_prompt()
 
-    print("[✅] Tracker Agent started. Watching your active apps...\n")
+    logger.info("Tracker Agent started. Watching your active apps...")
     while True:
         active_window = get_active_window_app()
         if not active_window:
@@ -158,7 +166,7 @@ def run_tracker():
 
         for task in tasks:
             if task["appname"].lower() in active_window.lower():
-                print(f"[MATCH] {task['appname']} is active in {active_window}")
+                logger.debug("%s is active in %s", task["appname"], active_window)
                 success = send_usage(task["id"], task["appname"], INTERVAL_SECONDS, access_token)
                 if not success:
                     user_id, access_token = login_prompt()
@@ -169,4 +177,5 @@ def run_tracker():
 
 
 if __name__ == "__main__":
+    tracker_logging.setup_logging()
     run_tracker()
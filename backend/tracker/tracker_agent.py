@@ -1,30 +1,53 @@
 # tracker_agent.py
 import time
-from tracker_shared import load_credentials, get_active_window_app, get_active_tasks, send_usage
+import logging
+from tracker_shared import load_credentials, get_active_window_app, get_active_tasks, send_usage, \
+    get_app_matchers, resolve_app, SessionExpired
+import tracker_tracing
+import tracker_telemetry
+import tracker_logging
+
+logger = logging.getLogger("tracker_agent")
 
 INTERVAL_SECONDS = 60
 
 def run_tracker():
     user_id, access_token = load_credentials()
     if not user_id or not access_token:
+        logger.error("Not logged in - run tracker_setup first.")
         return
 
     while True:
-        active_window = get_active_window_app()
-        if not active_window:
-            time.sleep(10)
-            continue
-
-        tasks = get_active_tasks(user_id)
-        matched = False
+        try:
+            with tracker_tracing.span("agent.sample"):
+                matched = sample_once(user_id)
+        except SessionExpired:
+            # The agent runs without a console, so it cannot ask for the
+            # password again; unsent samples would only pile up.
+            logger.error("Session expired and could not be refreshed - run tracker_setup to log in again.")
+            return
+        time.sleep(INTERVAL_SECONDS if matched else 10)
 
-        for task in tasks:
-            if task["appname"].lower() in active_window.lower():
-                send_usage(task["id"], task["appname"], INTERVAL_SECONDS, access_token)
-                matched = True
-                break
+def sample_once(user_id):
+    started = tracker_telemetry.clock()
+    active_window = get_active_window_app()
+    if not active_window:
+        tracker_telemetry.sampled(started, False)
+        return False
 
-        time.sleep(INTERVAL_SECONDS if matched else 10)
+    # Exes listed in the app registry match tasks for that app exactly; others
+    # fall back to a substring match on the task's appname.
+    app = resolve_app(active_window, get_app_matchers())
+    tasks = get_active_tasks(user_id)
+    for task in tasks:
+        appname = task["appname"].lower()
+        if appname == app if app else appname in active_window.lower():
+            tracker_telemetry.sampled(started, True)
+            send_usage(task["id"], task["appname"], INTERVAL_SECONDS)
+            return True
+    tracker_telemetry.sampled(started, False)
+    return False
 
 if __name__ == "__main__":
+    tracker_logging.setup_logging()
     run_tracker()
@@ -0,0 +1,110 @@
+# tracker_logging.py
+# Logging for the tracker agent. Same design as the API's app_logging.py: the
+# sampling loop only puts records on a queue and a background QueueListener
+# writes them, one JSON object per line, to a rotating file. The packaged agent
+# runs without a console, so stderr is only used when there is one.
+#
+#   TRACKER_LOG_FILE    default ~/.todo_tracker.log, rotated at 1MB, 3 kept
+#   LOG_LEVEL           root level (default INFO)
+#   LOG_LEVELS          per-module overrides, e.g. "tracker_shared=DEBUG"
+#   LOG_REPEAT_SECONDS  identical warnings from one place are logged at most
+#                       once per this many seconds (default 300)
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+LOG_FILE = Path(os.getenv("TRACKER_LOG_FILE") or Path.home() / ".todo_tracker.log")
+MAX_FILE_BYTES = 1024 * 1024
+BACKUPS = 3
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    # An offline agent fails the same way every minute; keep one line per
+    # call site per `period` and count the rest.
+    def __init__(self, period):
+        super().__init__()
+        self.period = period
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or self.period <= 0:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            last, suppressed = self.seen.get(key, (0.0, 0))
+            if now - last < self.period:
+                self.seen[key] = (last, suppressed + 1)
+                return False
+            self.seen[key] = (now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(log_file=None):
+    global _listener
+    if _listener is not None:
+        return
+    formatter = JsonFormatter()
+    handlers = []
+    try:
+        rotating = logging.handlers.RotatingFileHandler(
+            log_file or LOG_FILE, maxBytes=MAX_FILE_BYTES, backupCount=BACKUPS, encoding="utf-8")
+        rotating.setFormatter(formatter)
+        handlers.append(rotating)
+    except OSError:
+        pass
+    if sys.stderr is not None:
+        console = logging.StreamHandler(sys.stderr)
+        console.setFormatter(formatter)
+        handlers.append(console)
+
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(RateLimitFilter(float(os.getenv("LOG_REPEAT_SECONDS", "300"))))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for item in filter(None, (part.strip() for part in os.getenv("LOG_LEVELS", "").split(","))):
+        name, _, level = item.partition("=")
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -1,8 +1,10 @@
 import os
 import sys
 from tracker_shared import login_prompt, add_to_startup
+import tracker_logging
 
 if __name__ == "__main__":
+    tracker_logging.setup_logging()
     user_id, access_token = login_prompt()
     if user_id and access_token:
         # Dynamically resolve tracker_agent.exe path (assumes same folder)
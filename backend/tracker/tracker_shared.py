@@ -1,41 +1,129 @@
 # tracker_shared.py
 import os
 import json
+import logging
 import time
 import sys
+import uuid
 from pathlib import Path
-import winreg
 import requests
-import win32gui
-import win32process
 import psutil
 from dotenv import load_dotenv
 from supabase import create_client, Client
+import tracker_tracing
+import tracker_telemetry
+
+try:
+    import winreg
+    import win32gui
+    import win32process
+except ImportError:
+    # Not on Windows: only the simulator (tracker_sim.py) imports this module there.
+    winreg = win32gui = win32process = None
 
 # Load .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
 SUPABASE_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
 API_BACKEND_URL = os.getenv("API_BACKEND_URL")
 INTERVAL_SECONDS = 60
 CONFIG_FILE = Path.home() / ".todo_tracker_config.json"
+SPOOL_LIMIT = 24 * 60
+REGISTRY_REFRESH_SECONDS = 3600
+# Supabase access tokens last about an hour; renew this long before expiry.
+TOKEN_REFRESH_MARGIN_SECONDS = 300
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Samples not yet acknowledged by the backend, oldest first. Each keeps its
+# (agent_id, seq) so a retry is recognised by the server as the same sample.
+_spool = []
 
+_supabase = None
 
-def save_credentials(user_id, access_token):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump({"user_id": user_id, "access_token": access_token}, f)
+# The logged-in session: the access token sent to the backend, the refresh
+# token that renews it, and the access token's expiry (epoch seconds).
+_session = {"access_token": None, "refresh_token": None, "expires_at": None}
 
+# App registry matchers (appnames, longest first) and the exe -> appname
+# results computed from them.
+_registry = {"etag": None, "matchers": [], "checked": None}
+_resolved = {}
 
-def load_credentials():
+
+class SessionExpired(Exception):
+    # The backend rejected the access token and it could not be refreshed.
+    pass
+
+
+def get_supabase() -> Client:
+    global _supabase
+    if _supabase is None:
+        _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
+
+
+def _load_config():
     try:
         with open(CONFIG_FILE, "r") as f:
-            data = json.load(f)
-            return data.get("user_id"), data.get("access_token")
+            return json.load(f)
     except Exception:
-        return None, None
+        return {}
+
+
+def _save_config(config):
+    with open(CONFIG_FILE, "w") as f:
+        json.dump(config, f)
+
+
+def save_credentials(user_id, session):
+    # session: the Supabase session from sign-in or refresh.
+    _session.update(access_token=session.access_token, refresh_token=session.refresh_token,
+                    expires_at=session.expires_at)
+    config = _load_config()
+    config.update(_session, user_id=user_id)
+    _save_config(config)
+
+
+def load_credentials():
+    config = _load_config()
+    _session.update({key: config.get(key) for key in _session})
+    return config.get("user_id"), config.get("access_token")
+
+
+def refresh_credentials():
+    # Exchanges the refresh token for a new session; False if that fails.
+    if not _session["refresh_token"]:
+        return False
+    try:
+        result = get_supabase().auth.refresh_session(_session["refresh_token"])
+    except Exception as e:
+        logger.warning("Could not refresh the session: %s", e)
+        return False
+    if not result.session:
+        return False
+    save_credentials(result.user.id if result.user else _load_config().get("user_id"), result.session)
+    logger.info("Session refreshed")
+    return True
+
+
+def current_token():
+    # The access token, renewed first when it is about to expire.
+    expires_at = _session["expires_at"]
+    if expires_at and time.time() > expires_at - TOKEN_REFRESH_MARGIN_SECONDS:
+        refresh_credentials()
+    return _session["access_token"]
+
+
+def next_sample_id():
+    # seq is persisted so it keeps increasing across agent restarts.
+    config = _load_config()
+    agent_id = config.get("agent_id") or str(uuid.uuid4())
+    seq = config.get("next_seq", 0)
+    config.update({"agent_id": agent_id, "next_seq": seq + 1})
+    _save_config(config)
+    return agent_id, seq
 
 
 def add_to_startup(agent_path=None):
@@ -44,9 +132,9 @@ def add_to_startup(agent_path=None):
     try:
         with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_key, 0, winreg.KEY_SET_VALUE) as key:
             winreg.SetValueEx(key, "ToDoTracker", 0, winreg.REG_SZ, exe_path)
-        print("✅ Tracker added to Windows startup.")
-    except Exception as e:
-        print("⚠️ Failed to add tracker to startup:", e)
+        logger.info("Tracker added to Windows startup: %s", exe_path)
+    except Exception:
+        logger.exception("Failed to add tracker to startup")
 
 
 def login_prompt():
@@ -54,13 +142,13 @@ def login_prompt():
     email = input("Email: ")
     password = input("Password: ")
     try:
-        result = supabase.auth.sign_in_with_password({
+        result = get_supabase().auth.sign_in_with_password({
             "email": email,
             "password": password
         })
         user = result.user
         access_token = result.session.access_token
-        save_credentials(user.id, access_token)
+        save_credentials(user.id, result.session)
         print(f"✅ Logged in as {user.email}")
 
         # Notify backend
@@ -76,6 +164,11 @@ def login_prompt():
 
 
 def get_active_window_app():
+    with tracker_tracing.span("get_active_window_app"):
+        return _get_active_window_app()
+
+
+def _get_active_window_app():
     try:
         hwnd = win32gui.GetForegroundWindow()
         if hwnd == 0:
@@ -84,42 +177,116 @@ def get_active_window_app():
         process = psutil.Process(pid)
         return process.name()
     except Exception as e:
-        print("[WARN] Could not get active window:", e)
+        logger.warning("Could not get active window: %s", e)
         return None
 
 
 def get_active_tasks(user_id):
+    with tracker_tracing.span("get_active_tasks"):
+        return _get_active_tasks(user_id)
+
+
+def _get_active_tasks(user_id):
     try:
-        res = supabase.table("tasks") \
+        res = get_supabase().table("tasks") \
             .select("id, appname") \
             .eq("is_active", True) \
             .eq("user_id", user_id) \
             .execute()
+        tracker_telemetry.tasks_fetched(True)
         return res.data or []
     except Exception as e:
-        print("[ERROR] Failed to fetch active tasks:", e)
+        tracker_telemetry.tasks_fetched(False)
+        logger.error("Failed to fetch active tasks: %s", e)
         return []
 
 
-def send_usage(task_id, app_name, seconds, token):
+def get_app_matchers():
+    # Revalidated with If-None-Match at most once per REGISTRY_REFRESH_SECONDS.
+    now = time.time()
+    if _registry["checked"] is not None and now - _registry["checked"] < REGISTRY_REFRESH_SECONDS:
+        return _registry["matchers"]
+    _registry["checked"] = now
+    headers = {"Authorization": f"Bearer {current_token()}"}
+    if _registry["etag"]:
+        headers["If-None-Match"] = _registry["etag"]
     try:
-        response = requests.post(
-            f"{API_BACKEND_URL}/update-usage",
-            json={
-                "task_id": task_id,
-                "app_name": app_name,
-                "seconds": seconds
-            },
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-        )
-        if response.status_code == 401:
-            print("[ERROR] Unauthorized - token may be expired. Please re-login.")
-            return False
-        print(f"[SUCCESS] Usage sent for {app_name} ({task_id}): {response.status_code}")
-        return True
+        response = requests.get(f"{API_BACKEND_URL}/app-registry", headers=headers, timeout=30)
+        if response.status_code == 200:
+            _registry.update(etag=response.headers.get("ETag"), matchers=response.json()["matchers"])
+            _resolved.clear()
     except Exception as e:
-        print("[ERROR] Failed to send usage:", e)
-        return True
+        logger.warning("Could not fetch app registry: %s", e)
+    return _registry["matchers"]
+
+
+def resolve_app(exe, matchers):
+    # The registry appname for a foreground exe, or None if it is not listed.
+    key = exe.lower()
+    if key not in _resolved:
+        _resolved[key] = next((m for m in matchers if m in key), None)
+    return _resolved[key]
+
+
+def send_usage(task_id, app_name, seconds):
+    agent_id, seq = next_sample_id()
+    # The sample credits the interval starting now; the backend merges
+    # overlapping intervals from other devices instead of adding them up.
+    start = int(time.time())
+    payload = {
+        "task_id": task_id,
+        "app_name": app_name,
+        "seconds": seconds,
+        "start": start,
+        "end": start + seconds,
+        "agent_id": agent_id,
+        "seq": seq
+    }
+    report = tracker_telemetry.take(len(_spool))
+    if report:
+        payload["telemetry"] = report
+    _spool.append(payload)
+    del _spool[:-SPOOL_LIMIT]
+    return flush_spool()
+
+
+def flush_spool():
+    # Raises SessionExpired (keeping the spool) when the backend rejects the
+    # token and a refresh does not help.
+    refreshed = False
+    while _spool:
+        payload = _spool[0]
+        headers = {
+            "Authorization": f"Bearer {current_token()}",
+            "Content-Type": "application/json"
+        }
+        started = tracker_telemetry.clock()
+        try:
+            with tracker_tracing.span("send_usage", task_id=payload["task_id"], seq=payload["seq"]) as upload:
+                if upload.sampled:
+                    headers["traceparent"] = upload.traceparent()
+                response = requests.post(
+                    f"{API_BACKEND_URL}/update-usage",
+                    json=payload,
+                    headers=headers,
+                    timeout=30
+                )
+                upload.set("http.status", response.status_code)
+        except Exception as e:
+            tracker_telemetry.uploaded(started, False)
+            logger.error("Failed to send usage (%d queued): %s", len(_spool), e)
+            return True
+        tracker_telemetry.uploaded(started, response.status_code < 500 and response.status_code != 429)
+        if response.status_code == 401:
+            if not refreshed and refresh_credentials():
+                refreshed = True
+                continue
+            logger.error("Unauthorized and the session could not be refreshed (%d queued)", len(_spool))
+            raise SessionExpired()
+        if response.status_code == 429 or response.status_code >= 500:
+            # Keep the sample; the rest of the spool goes out on a later pass.
+            logger.error("Backend error %d (%d queued)", response.status_code, len(_spool))
+            return True
+        _spool.pop(0)
+        logger.info("Usage sent for %s (%s): %d", payload["app_name"], payload["task_id"], response.status_code)
+    return True
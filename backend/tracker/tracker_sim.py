@@ -0,0 +1,227 @@
+# tracker_sim.py
+# Headless simulator for tracker_agent.py. Replays a foreground-window trace
+# through the real agent loop with a virtual clock, a fake task list and a
+# fake network, then reports how well the credited time matches the trace.
+#
+# Trace format (JSON lines, `t` = seconds from start, `exe` = foreground
+# process or null when nothing is focused):
+#     {"t": 0, "exe": "Code.exe"}
+#     {"t": 415, "exe": "chrome.exe"}
+#
+#   python tracker_sim.py --hours 8                       synthetic trace
+#   python tracker_sim.py --trace focus.jsonl --tasks code,chrome
+#   python tracker_sim.py --hours 8 --record focus.jsonl  save the synthetic trace
+import argparse
+import json
+import logging
+import random
+import time
+from bisect import bisect_right
+from collections import defaultdict
+
+import tracker_agent
+import tracker_shared
+import tracker_telemetry
+
+APPS = ["Code.exe", "chrome.exe", "EXCEL.EXE", "Teams.exe", "explorer.exe", "Spotify.exe"]
+
+
+class StopSimulation(Exception):
+    pass
+
+
+class VirtualClock:
+    def __init__(self, start, end):
+        self.now = start
+        self.end = end
+
+    def time(self):
+        return self.now
+
+    monotonic = perf_counter = time
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.now >= self.end:
+            raise StopSimulation()
+
+
+class FocusTrace:
+    def __init__(self, events, duration):
+        events = sorted(events, key=lambda e: e["t"])
+        self.times = [e["t"] for e in events]
+        self.apps = [e["exe"] for e in events]
+        self.duration = duration
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            events = [json.loads(line) for line in f if line.strip()]
+        return cls(events, max(e["t"] for e in events) + 60)
+
+    @classmethod
+    def synthetic(cls, hours, apps=APPS, mean_dwell=300, idle_share=0.1, seed=None):
+        rng = random.Random(seed)
+        events, t, duration = [], 0.0, hours * 3600
+        while t < duration:
+            exe = None if rng.random() < idle_share else rng.choice(apps)
+            events.append({"t": round(t, 1), "exe": exe})
+            t += rng.expovariate(1 / mean_dwell)
+        return cls(events, duration)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            for t, exe in zip(self.times, self.apps):
+                f.write(json.dumps({"t": t, "exe": exe}) + "\n")
+
+    def app_at(self, t):
+        i = bisect_right(self.times, t) - 1
+        return self.apps[i] if i >= 0 else None
+
+    def segments(self):
+        bounds = self.times[1:] + [self.duration]
+        for start, end, exe in zip(self.times, bounds, self.apps):
+            yield start, min(end, self.duration), exe
+
+
+def _encoded_size(payload):
+    return len(json.dumps(payload))
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+
+class FakeNetwork:
+    def __init__(self, clock, latency=0.05, fail_rate=0.0, seed=None):
+        self.clock = clock
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.credited = defaultdict(int)
+        self.samples = set()
+        self.telemetry_reports = 0
+        self.appnames = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.requests += 1
+        self.bytes_up += len(url) + _encoded_size(json) + sum(
+            len(k) + len(v) + 4 for k, v in (headers or {}).items())
+        self.clock.now += self.latency
+        if self.rng.random() < self.fail_rate:
+            self.failures += 1
+            raise ConnectionError("simulated network failure")
+        key = (json.get("agent_id"), json.get("seq"))
+        if key not in self.samples:
+            self.samples.add(key)
+            self.telemetry_reports += "telemetry" in json
+            self.credited[json["task_id"]] += json["seconds"]
+        return FakeResponse(200)
+
+    def get(self, url, headers=None, timeout=None):
+        # Only the app registry is fetched with GET; its matchers are the task appnames.
+        self.requests += 1
+        self.bytes_up += len(url) + sum(len(k) + len(v) + 4 for k, v in (headers or {}).items())
+        self.clock.now += self.latency
+        if (headers or {}).get("If-None-Match") == '"sim"':
+            return FakeResponse(304)
+        body = {"matchers": sorted(self.appnames, key=lambda a: (-len(a), a))}
+        self.bytes_down += _encoded_size(body)
+        return FakeResponse(200, body, {"ETag": '"sim"'})
+
+    def fetch_tasks(self, tasks):
+        self.requests += 1
+        self.bytes_down += _encoded_size(tasks)
+        self.clock.now += self.latency
+        return [dict(t) for t in tasks]
+
+
+def truth(trace, tasks):
+    # Foreground seconds per task, using the agent's own matching rule.
+    totals = defaultdict(float)
+    for start, end, exe in trace.segments():
+        if not exe:
+            continue
+        for task in tasks:
+            if task["appname"].lower() in exe.lower():
+                totals[task["id"]] += end - start
+                break
+    return totals
+
+
+def simulate(trace, tasks, latency=0.05, fail_rate=0.0, seed=None):
+    start = 1_700_000_000.0
+    clock = VirtualClock(start, start + trace.duration)
+    network = FakeNetwork(clock, latency, fail_rate, seed)
+    network.appnames = [t["appname"].lower() for t in tasks]
+    seqs = iter(range(1 << 62))
+
+    tracker_agent.time = clock
+    tracker_shared.time = clock
+    tracker_telemetry.time = clock
+    tracker_telemetry._window = tracker_telemetry._Window()
+    tracker_shared.requests = network
+    tracker_shared.next_sample_id = lambda: ("sim-agent", next(seqs))
+    tracker_shared._spool.clear()
+    tracker_shared._registry.update(etag=None, matchers=[], checked=None)
+    tracker_shared._resolved.clear()
+    tracker_shared._session.update(access_token="sim-token", refresh_token=None, expires_at=None)
+    tracker_agent.load_credentials = lambda: ("sim-user", "sim-token")
+    tracker_agent.get_active_window_app = lambda: trace.app_at(clock.now - start)
+    tracker_agent.get_active_tasks = lambda user_id: network.fetch_tasks(tasks)
+
+    cpu_start = time.process_time()
+    try:
+        logging.disable(logging.CRITICAL)
+        tracker_agent.run_tracker()
+    except StopSimulation:
+        pass
+    finally:
+        logging.disable(logging.NOTSET)
+    cpu = time.process_time() - cpu_start
+
+    expected = truth(trace, tasks)
+    error = sum(abs(network.credited[t["id"]] - expected[t["id"]]) for t in tasks)
+    total = sum(expected.values())
+    hours = trace.duration / 3600
+    return {
+        "simulated_hours": round(hours, 2),
+        "attribution_accuracy": round(1 - error / total, 4) if total else None,
+        "credited_seconds": {t["appname"]: network.credited[t["id"]] for t in tasks},
+        "true_seconds": {t["appname"]: round(expected[t["id"]]) for t in tasks},
+        "cpu_ms_per_sim_hour": round(cpu * 1000 / hours, 3),
+        "requests": network.requests,
+        "failed_requests": network.failures,
+        "bytes_uploaded": network.bytes_up,
+        "bytes_downloaded": network.bytes_down,
+        "telemetry_reports": network.telemetry_reports,
+        "unsent_samples": len(tracker_shared._spool)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a focus trace through the tracker agent")
+    parser.add_argument("--trace", default=None, help="JSON lines trace; synthetic when omitted")
+    parser.add_argument("--hours", type=float, default=8)
+    parser.add_argument("--tasks", default="code,chrome", help="comma-separated task appnames")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated request latency (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", default=None, help="write the trace used to this file")
+    args = parser.parse_args()
+
+    trace = FocusTrace.load(args.trace) if args.trace else FocusTrace.synthetic(args.hours, seed=args.seed)
+    if args.record:
+        trace.save(args.record)
+    tasks = [{"id": i + 1, "appname": name} for i, name in enumerate(args.tasks.split(","))]
+    print(json.dumps(simulate(trace, tasks, args.latency, args.fail_rate, args.seed), indent=2))
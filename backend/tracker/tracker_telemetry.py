@@ -0,0 +1,105 @@
+# tracker_telemetry.py
+# Self-telemetry for the agent: process RSS and CPU time, samples taken and
+# matched, match and upload latency, upload failures, spool depth and the age
+# of the task list. Counters cover one report window; every REPORT_SECONDS
+# (default 900) the summary is attached to the next usage sample as
+# `telemetry`, so it costs no extra requests and rides the spool on retries.
+import os
+import time
+
+import psutil
+
+REPORT_SECONDS = int(os.getenv("TELEMETRY_REPORT_SECONDS", "900"))
+VERSION = 1
+
+_process = psutil.Process()
+
+
+class _Window:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.cpu = _cpu_seconds()
+        self.samples = 0
+        self.matched = 0
+        self.match_ms = []
+        self.uploads = 0
+        self.upload_failures = 0
+        self.upload_ms = []
+        self.task_fetch_failures = 0
+
+
+def _cpu_seconds():
+    times = _process.cpu_times()
+    return times.user + times.system
+
+
+_window = _Window()
+_tasks_fetched_at = None
+
+
+def clock():
+    return time.perf_counter()
+
+
+def sampled(started, matched):
+    _window.samples += 1
+    _window.matched += bool(matched)
+    _window.match_ms.append((time.perf_counter() - started) * 1000)
+
+
+def uploaded(started, ok):
+    _window.uploads += 1
+    _window.upload_failures += not ok
+    _window.upload_ms.append((time.perf_counter() - started) * 1000)
+
+
+def tasks_fetched(ok):
+    global _tasks_fetched_at
+    if ok:
+        _tasks_fetched_at = time.monotonic()
+    else:
+        _window.task_fetch_failures += 1
+
+
+def _summary(values):
+    if not values:
+        return None, None
+    values = sorted(values)
+    return round(values[len(values) // 2], 1), round(values[-1], 1)
+
+
+def take(spool_depth):
+    # Returns the report for the finished window and starts a new one, or
+    # None while the window is still open.
+    global _window
+    now = time.monotonic()
+    span = now - _window.started
+    if span < REPORT_SECONDS:
+        return None
+    try:
+        rss = _process.memory_info().rss
+        cpu = _cpu_seconds() - _window.cpu
+    except psutil.Error:
+        rss, cpu = None, None
+    match_p50, match_max = _summary(_window.match_ms)
+    upload_p50, upload_max = _summary(_window.upload_ms)
+    report = {
+        "v": VERSION,
+        "span_s": round(span),
+        "rss_mb": round(rss / 1048576, 1) if rss is not None else None,
+        "cpu_s": round(cpu, 2) if cpu is not None else None,
+        "cpu_pct": round(cpu / span * 100, 2) if cpu is not None else None,
+        "samples": _window.samples,
+        "matched": _window.matched,
+        "match_ms_p50": match_p50,
+        "match_ms_max": match_max,
+        "uploads": _window.uploads,
+        "upload_failures": _window.upload_failures,
+        "upload_ms_p50": upload_p50,
+        "upload_ms_max": upload_max,
+        "task_fetch_failures": _window.task_fetch_failures,
+        "tasks_age_s": round(now - _tasks_fetched_at) if _tasks_fetched_at is not None else None,
+        "spool": spool_depth
+    }
+    _window = _Window()
+    return report
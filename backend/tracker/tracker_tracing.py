@@ -0,0 +1,84 @@
+# tracker_tracing.py
+# Agent side of request tracing: one trace per sampling iteration, with spans
+# for window lookup, task fetch and each upload. The upload sends `traceparent`
+# so the API continues the same trace. Spans of sampled traces are appended as
+# JSON lines to TRACE_FILE (default ~/.todo_tracker_traces.jsonl) when the
+# root span ends.
+#
+# TRACE_SAMPLE_RATE (default 0) is the fraction of iterations traced.
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from pathlib import Path
+
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_FILE = Path(os.getenv("TRACE_FILE") or Path.home() / ".todo_tracker_traces.jsonl")
+MAX_FILE_BYTES = 5 * 1024 * 1024
+SERVICE = "tracker-agent"
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class span:
+    def __init__(self, name, **attributes):
+        parent = _current.get()
+        if parent is not None:
+            self.trace_id, self.parent_id, self.sampled = parent.trace_id, parent.span_id, parent.sampled
+            self.finished = parent.finished
+        else:
+            self.trace_id, self.parent_id = "%032x" % random.getrandbits(128), None
+            self.sampled = random.random() < SAMPLE_RATE
+            self.finished = []
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, key, value):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def __enter__(self):
+        self.start = time.time_ns()
+        self.token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        if not self.sampled:
+            return
+        if exc is not None:
+            self.attributes["error"] = repr(exc)
+        self.finished.append({
+            "service": SERVICE,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start,
+            "duration_us": (time.time_ns() - self.start) // 1000,
+            "attributes": self.attributes
+        })
+        if self.parent_id is None:
+            _write(self.finished)
+
+
+def current():
+    return _current.get()
+
+
+def _write(spans):
+    try:
+        if TRACE_FILE.exists() and TRACE_FILE.stat().st_size > MAX_FILE_BYTES:
+            TRACE_FILE.replace(TRACE_FILE.with_suffix(".jsonl.1"))
+        with open(TRACE_FILE, "a") as f:
+            f.writelines(json.dumps(item) + "\n" for item in spans)
+    except Exception as e:
+        logger.warning("Could not write traces: %s", e)
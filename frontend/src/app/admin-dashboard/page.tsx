@@ -3,14 +3,27 @@
 import { useEffect, useState } from "react";
 import { useRouter } from "next/navigation";
 import { supabase } from "@/lib/supabase";
+import { apiFetch } from "@/utils/fetch";
 import { TodoList } from "@/components/TodoList";
 import TaskProgress from "@/components/TaskProgress";
 
+type UserSummary = {
+  id: string;
+  full_name: string | null;
+  tasks: number;
+  active_tasks: number;
+  today_seconds: number;
+  week_seconds: number;
+};
+
+const formatHours = (seconds: number) => `${(seconds / 3600).toFixed(1)}h`;
+
 export default function AdminDashboard() {
   const [isAdmin, setIsAdmin] = useState<boolean | null>(null);
-  const [users, setUsers] = useState<
-    { id: string; full_name: string | null }[]
-  >([]);
+  const [users, setUsers] = useState<UserSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [search, setSearch] = useState("");
+  const [sort, setSort] = useState("name");
   const [selectedUser, setSelectedUser] = useState<string | null>(null);
   const [tasks, setTasks] = useState<any[]>([]);
   const [selectedTaskId, setSelectedTaskId] = useState<number | null>(null);
@@ -48,41 +61,46 @@ export default function AdminDashboard() {
       }
 
       setIsAdmin(true);
-      fetchUsers();
     };
 
     checkAdminAccess();
   }, []);
 
-  const fetchUsers = async () => {
-    console.log("❌ Calling fetchUsers()");
-    const { data, error } = await supabase
-      .from("profiles")
-      .select("id, role, full_name")
-      .eq("role", "user");
-
-    if (error) {
+  // One page of users with their task counts and usage, sorted and
+  // filtered by the backend.
+  const fetchUsers = async (after: string | null = null) => {
+    const params = new URLSearchParams({
+      sort,
+      order: sort === "name" ? "asc" : "desc",
+      limit: "100",
+    });
+    if (search) params.set("search", search);
+    if (after) params.set("after", after);
+
+    try {
+      const data = await apiFetch(`/admin/users?${params}`);
+      setUsers((prev) => (after ? [...prev, ...data.users] : data.users));
+      setNextCursor(data.next);
+    } catch (error) {
       console.error("Error fetching users:", error);
-    } else {
-      console.log("Fetched users:", data);
-      setUsers(data);
     }
   };
 
+  useEffect(() => {
+    if (isAdmin) fetchUsers();
+  }, [isAdmin, sort, search]);
+
   useEffect(() => {
     const fetchTasks = async () => {
       if (!selectedUser) return;
 
-      const { data, error } = await supabase
-        .from("tasks")
-        .select("*")
-        .eq("user_id", selectedUser);
-
-      if (error) {
+      try {
+        const data = await apiFetch(
+          `/tasks?user_id=${encodeURIComponent(selectedUser)}&limit=500`
+        );
+        setTasks(data.tasks);
+      } catch (error) {
         console.error("Error fetching tasks:", error);
-      } else {
-        setTasks(data);
-        console.log("📝 Fetching tasks for:", data);
       }
     };
 
@@ -112,6 +130,30 @@ export default function AdminDashboard() {
         </button>
       </div>
 
+      {/* User Search */}
+      {isAdmin && (
+        <div className="flex items-center gap-4 mb-4">
+          <input
+            type="search"
+            placeholder="Search users by name"
+            value={search}
+            onChange={(e) => setSearch(e.target.value)}
+            className="p-2 border border-blue-400 rounded w-full max-w-sm focus:outline-none focus:ring-2 focus:ring-blue-500"
+          />
+          <select
+            value={sort}
+            onChange={(e) => setSort(e.target.value)}
+            className="p-2 border border-blue-400 rounded focus:outline-none focus:ring-2 focus:ring-blue-500"
+          >
+            <option value="name">Name</option>
+            <option value="tasks">Most tasks</option>
+            <option value="active">Most active tasks</option>
+            <option value="today">Most time today</option>
+            <option value="week">Most time this week</option>
+          </select>
+        </div>
+      )}
+
       {/* User Dropdown */}
       {isAdmin && users.length > 0 && (
         <div className="flex items-center gap-4 mb-6">
@@ -128,10 +170,20 @@ export default function AdminDashboard() {
             </option>
             {users.map((user) => (
               <option key={user.id} value={user.id}>
-                {user.full_name || user.id}
+                {user.full_name || user.id} · {user.active_tasks}/{user.tasks}{" "}
+                active · today {formatHours(user.today_seconds)} · week{" "}
+                {formatHours(user.week_seconds)}
               </option>
             ))}
           </select>
+          {nextCursor && (
+            <button
+              onClick={() => fetchUsers(nextCursor)}
+              className="px-3 py-2 text-sm border border-blue-400 rounded hover:bg-blue-50"
+            >
+              Load more
+            </button>
+          )}
         </div>
       )}
 
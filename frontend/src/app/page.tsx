@@ -25,6 +25,7 @@ export default function Home() {
   const [selectedFilter, setSelectedFilter] = useState<
     "all" | "active" | "completed"
   >("all");
+  const [search, setSearch] = useState("");
   const [loading, setLoading] = useState(true);
 
   const listRef = useRef<any>(null);
@@ -213,11 +214,14 @@ export default function Home() {
           <TodoFilter
             selectedFilter={selectedFilter}
             onTabChange={setSelectedFilter}
+            search={search}
+            onSearch={setSearch}
           />
           <div className="mx-auto">
             <TodoList
               ref={listRef}
               selectedFilter={selectedFilter}
+              search={search}
               tasks={filteredTasks}
             />
           </div>
@@ -3,12 +3,15 @@ import { Fragment, useState } from "react";
 import { Listbox, Transition } from "@headlessui/react";
 import { Check, ChevronDown } from "lucide-react"; // or any icons
 import Image from "next/image";
+import { AppOption } from "@/utils/getAppOptions";
 
-type AppOption = {
-  name: string;
-  appname: string;
-  icon_url: string;
-};
+// Sprite icons are SVG fragments, which next/image can't optimise.
+function AppIcon({ app, size, className }: { app: AppOption; size: number; className?: string }) {
+  if (app.icon) {
+    return <img src={app.icon} alt={app.name} width={size} height={size} className={className} />;
+  }
+  return <Image src={app.icon_url} alt={app.name} width={size} height={size} className={className} />;
+}
 
 type Props = {
   groupedApps: Record<string, AppOption[]>;
@@ -39,12 +42,7 @@ export default function AppSelectDropdown({
           <Listbox.Button className="w-full cursor-pointer rounded border-blue-500 border-2 p-3 text-left flex items-center justify-between">
             {selectedApp ? (
               <div className="flex items-center gap-2">
-                <Image
-                  src={selectedApp.icon_url}
-                  alt={selectedApp.name}
-                  width={24}
-                  height={24}
-                />
+                <AppIcon app={selectedApp} size={24} />
                 <span>{selectedApp.name}</span>
               </div>
             ) : (
@@ -70,13 +68,7 @@ export default function AppSelectDropdown({
                 >
                   {({ selected }) => (
                     <>
-                      <Image
-                        src={app.icon_url}
-                        alt={app.name}
-                        width={32}
-                        height={32}
-                        className="mb-1 object-contain"
-                      />
+                      <AppIcon app={app} size={32} className="mb-1 object-contain" />
                       <span className="text-xs text-center">{app.name}</span>
                       {selected && (
                         <Check className="absolute top-1 right-1 w-4 h-4 text-blue-600" />
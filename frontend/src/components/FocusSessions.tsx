@@ -0,0 +1,83 @@
+"use client";
+
+import React, { useEffect, useState } from "react";
+import { apiFetch } from "@/utils/fetch";
+import {
+  Table,
+  TableBody,
+  TableCell,
+  TableHead,
+  TableHeader,
+  TableRow,
+} from "@/components/ui/table";
+
+type FocusDay = {
+  day: string;
+  count: number;
+  interruptions: number;
+  focus_seconds: number;
+  longest_seconds: number;
+};
+
+type Props = {
+  taskId: number;
+};
+
+function formatDuration(seconds: number): string {
+  const minutes = Math.round(seconds / 60);
+  return minutes >= 60
+    ? `${Math.floor(minutes / 60)}h ${minutes % 60}m`
+    : `${minutes}m`;
+}
+
+// Sessions are segmented by the backend as usage arrives (see
+// /tasks/{id}/sessions); this shows the last week's per-day summary.
+export default function FocusSessions({ taskId }: Props) {
+  const [days, setDays] = useState<FocusDay[]>([]);
+  const [longest, setLongest] = useState(0);
+
+  useEffect(() => {
+    apiFetch(`/tasks/${taskId}/sessions?days=7`)
+      .then((result) => {
+        setDays([...(result.days || [])].reverse());
+        setLongest(result.longest_seconds || 0);
+      })
+      .catch((error) => console.error("Error fetching sessions:", error));
+  }, [taskId]);
+
+  if (days.length === 0) return null;
+
+  return (
+    <div className="mt-6 border rounded-md shadow-sm p-4">
+      <h3 className="text-md font-semibold mb-3">
+        Focus sessions (longest this week: {formatDuration(longest)})
+      </h3>
+      <Table>
+        <TableHeader>
+          <TableRow>
+            <TableHead>Date</TableHead>
+            <TableHead className="text-right">Sessions</TableHead>
+            <TableHead className="text-right">Interruptions</TableHead>
+            <TableHead className="text-right">Focused</TableHead>
+            <TableHead className="text-right">Longest</TableHead>
+          </TableRow>
+        </TableHeader>
+        <TableBody>
+          {days.map((d) => (
+            <TableRow key={d.day}>
+              <TableCell>{d.day}</TableCell>
+              <TableCell className="text-right">{d.count}</TableCell>
+              <TableCell className="text-right">{d.interruptions}</TableCell>
+              <TableCell className="text-right">
+                {formatDuration(d.focus_seconds)}
+              </TableCell>
+              <TableCell className="text-right">
+                {formatDuration(d.longest_seconds)}
+              </TableCell>
+            </TableRow>
+          ))}
+        </TableBody>
+      </Table>
+    </div>
+  );
+}
@@ -77,7 +77,7 @@ export default function TaskDetail({
       if (!task.id || !task.appName || readonly) return;
 
       try {
-        await fetch(`/${task.is_active ? "start-tracker" : "stop-tracker"}`, {
+        await apiFetch(`/${task.is_active ? "start-tracker" : "stop-tracker"}`, {
           method: "POST",
           body: JSON.stringify({
             task_id: task.id,
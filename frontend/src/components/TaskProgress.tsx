@@ -16,6 +16,7 @@ import {
 } from "recharts";
 import { useRouter } from "next/navigation";
 import { supabase } from "@/lib/supabase";
+import { apiFetch } from "@/utils/fetch";
 import {
   Table,
   TableBody,
@@ -25,11 +26,14 @@ import {
   TableRow,
 } from "@/components/ui/table";
 import { Button } from "@/components/ui/button";
+import UsageHeatmap from "@/components/UsageHeatmap";
+import FocusSessions from "@/components/FocusSessions";
 
-type DurationEntry = {
+type ProgressDay = {
   date: string;
-  time: string;
   seconds: number;
+  target_seconds: number;
+  percent: number | null;
 };
 
 type AggregatedData = {
@@ -76,7 +80,10 @@ export default function TaskProgress({ taskId, userId }: Props) {
   const [task, setTask] = useState<string>("");
   const [isAdmin, setIsAdmin] = useState(false);
   const [page, setPage] = useState(0);
+  const [avgEfficiency, setAvgEfficiency] = useState(0);
+  const [olderThan, setOlderThan] = useState<string | null>(null);
   const rowsPerPage = 5;
+  const pageDays = 30;
 
   const router = useRouter();
 
@@ -91,76 +98,51 @@ export default function TaskProgress({ taskId, userId }: Props) {
     if (!error && data?.role === "admin") setIsAdmin(true);
   };
 
-  const fetchScreenTimeAndTarget = async () => {
+  // The backend aggregates usage per day; load the newest days first and
+  // older ones on demand.
+  const toRow = (day: ProgressDay): AggregatedData => ({
+    date: day.date,
+    actualMinutes: +(day.seconds / 60).toFixed(2),
+    actualLabel: formatTime(day.seconds),
+    targetMinutes: +(day.target_seconds / 60).toFixed(2),
+    targetLabel: formatTime(day.target_seconds),
+    efficiency: day.percent ?? 0,
+  });
+
+  const fetchProgress = async (before?: string) => {
     if (!taskId) return;
 
-    const { data: screenData, error: screenError } = await supabase
-      .from("screen_time")
-      .select("duration_minutes")
-      .eq("task_id", taskId)
-      .single();
-
-    if (screenError) {
-      console.error("Error fetching screen time:", screenError);
-      return;
-    }
-
-    const raw: DurationEntry[] = screenData?.duration_minutes || [];
-    const grouped: Record<string, number> = {};
-
-    raw.forEach(({ date, seconds }) => {
-      grouped[date] = (grouped[date] || 0) + seconds;
-    });
-
-    const { data: taskData, error: taskError } = await supabase
-      .from("tasks")
-      .select("*")
-      .eq("id", taskId)
-      .single();
-
-    if (taskError) {
-      console.error("Error fetching task:", taskError);
+    const params = new URLSearchParams({ limit: String(pageDays) });
+    if (before) params.set("before", before);
+    let progress;
+    try {
+      progress = await apiFetch(`/tasks/${taskId}/progress?${params}`);
+    } catch (error) {
+      console.error("Error fetching progress:", error);
       return;
     }
 
-    setTask(taskData.title || "Untitled Task");
-
-    let hoursPerDay = 0;
-    if (typeof taskData?.hours_perday === "string") {
-      const [h, m] = taskData.hours_perday.split(":").map(Number);
-      hoursPerDay = h + (m || 0) / 60;
-    } else {
-      hoursPerDay = Number(taskData?.hours_perday);
-    }
-
-    const aggregated: AggregatedData[] = Object.entries(grouped).map(
-      ([date, seconds]) => {
-        const actualMinutes = +(seconds / 60).toFixed(2);
-        const actualLabel = formatTime(seconds);
-        const targetMinutes = +(hoursPerDay * 60).toFixed(2);
-        const targetLabel = formatTime(targetMinutes * 60);
-        const efficiency = +((actualMinutes / targetMinutes) * 100).toFixed(1);
-
-        return {
-          date,
-          actualMinutes,
-          actualLabel,
-          targetMinutes,
-          targetLabel,
-          efficiency,
-        };
-      }
-    );
-
-    aggregated.sort(
-      (a, b) => new Date(a.date).getTime() - new Date(b.date).getTime()
+    setTask(progress.title || "Untitled Task");
+    setAvgEfficiency(progress.average_percent ?? 0);
+    // A live refresh of the newest days keeps the cursor of older pages.
+    setOlderThan((current) =>
+      before || current === null ? progress.next : current
     );
 
-    setChartData(aggregated);
+    const rows: AggregatedData[] = (progress.days || []).map(toRow);
+    setChartData((current) => {
+      const byDate = new Map(current.map((d) => [d.date, d]));
+      rows.forEach((d) => byDate.set(d.date, d));
+      return Array.from(byDate.values()).sort((a, b) =>
+        a.date.localeCompare(b.date)
+      );
+    });
   };
 
   useEffect(() => {
-    fetchScreenTimeAndTarget();
+    setChartData([]);
+    setOlderThan(null);
+    fetchProgress();
     fetchUserRole();
 
     const screenChannel = supabase
@@ -174,7 +156,7 @@ export default function TaskProgress({ taskId, userId }: Props) {
           filter: `task_id=eq.${taskId}`,
         },
         () => {
-          fetchScreenTimeAndTarget();
+          fetchProgress();
         }
       )
       .subscribe();
@@ -204,11 +186,6 @@ export default function TaskProgress({ taskId, userId }: Props) {
     return null;
   };
 
-  const avgEfficiency =
-    chartData.length > 0
-      ? chartData.reduce((sum, d) => sum + d.efficiency, 0) / chartData.length
-      : 0;
-
   return (
     <div className="p-4">
       <div className="relative flex items-center justify-center mb-4">
@@ -353,6 +330,15 @@ export default function TaskProgress({ taskId, userId }: Props) {
                 <span className="text-sm text-gray-600">
                   Page {page + 1} of {totalPages}
                 </span>
+                {olderThan && (
+                  <Button
+                    variant="outline"
+                    size="sm"
+                    onClick={() => fetchProgress(olderThan)}
+                  >
+                    Load older days
+                  </Button>
+                )}
                 <Button
                   variant="outline"
                   size="sm"
@@ -417,6 +403,13 @@ export default function TaskProgress({ taskId, userId }: Props) {
               </ResponsiveContainer>
             </div>
           </div>
+
+          {taskId && (
+            <>
+              <UsageHeatmap taskId={taskId} />
+              <FocusSessions taskId={taskId} />
+            </>
+          )}
         </>
       )}
     </div>
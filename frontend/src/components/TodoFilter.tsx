@@ -1,15 +1,20 @@
 "use client";
 import { Tabs, TabsList, TabsTrigger } from "./ui/tabs";
+import { Input } from "./ui/input";
 
 type Props = {
   selectedFilter: "all" | "active" | "completed";
   onTabChange: (value: "all" | "active" | "completed") => void;
+  search?: string;
+  onSearch?: (value: string) => void;
   readonly?: boolean;
 };
 
 export const TodoFilter = ({
   selectedFilter,
   onTabChange,
+  search,
+  onSearch,
   readonly,
 }: Props) => {
   if (readonly) return null; // hide filter in readonly mode (e.g. admin)
@@ -45,6 +50,15 @@ export const TodoFilter = ({
           </TabsTrigger>
         </TabsList>
       </div>
+      {onSearch && (
+        <Input
+          type="search"
+          value={search ?? ""}
+          onChange={(e) => onSearch(e.target.value)}
+          placeholder="Search tasks"
+          className="mt-3 bg-white"
+        />
+      )}
     </Tabs>
   );
 };
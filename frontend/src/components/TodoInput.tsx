@@ -1,7 +1,7 @@
 "use client";
 
 import { useState, useEffect } from "react";
-import { supabase } from "@/lib/supabase";
+import { getAppOptions, AppOption } from "@/utils/getAppOptions";
 import AppSelectDropdown from "./AppSelectDropdown";
 import { Loader2 } from "lucide-react";
 import { Label } from "./ui/label";
@@ -15,13 +15,6 @@ type TodoInputProps = {
   }) => void;
 };
 
-type AppRegistryItem = {
-  appname: string;
-  name: string;
-  icon_url: string;
-  category: string;
-};
-
 export const TodoInput = ({ onAdd }: TodoInputProps) => {
   const [text, setText] = useState("");
   const [appName, setAppName] = useState("");
@@ -29,19 +22,10 @@ export const TodoInput = ({ onAdd }: TodoInputProps) => {
   const [deadline, setDeadline] = useState("");
   const [loading, setLoading] = useState(false);
   const [message, setMessage] = useState("");
-  const [appRegistry, setAppRegistry] = useState<AppRegistryItem[]>([]);
+  const [appRegistry, setAppRegistry] = useState<AppOption[]>([]);
 
   useEffect(() => {
-    const fetchAppRegistry = async () => {
-      const { data, error } = await supabase.from("app_registry").select("*");
-      if (error) {
-        console.error("Error fetching app registry:", error.message);
-      } else {
-        setAppRegistry(data);
-      }
-    };
-
-    fetchAppRegistry();
+    getAppOptions().then(setAppRegistry);
   }, []);
 
   const decimalToTimeString = (input: string): string => {
@@ -84,7 +68,7 @@ export const TodoInput = ({ onAdd }: TodoInputProps) => {
   };
 
   // Group apps by category
-  const groupedApps = appRegistry.reduce<Record<string, AppRegistryItem[]>>(
+  const groupedApps = appRegistry.reduce<Record<string, AppOption[]>>(
     (groups, app) => {
       if (!groups[app.category]) {
         groups[app.category] = [];
@@ -9,8 +9,10 @@ import {
 } from "react";
 import { format } from "date-fns";
 import { supabase } from "@/lib/supabase";
+import { apiFetch, getAccessToken } from "@/utils/fetch";
 
 import TaskTable from "./TaskTable";
+import { Alert, AlertDescription, AlertTitle } from "./ui/alert";
 import TaskDetail from "./TaskDetails";
 
 type Task = {
@@ -25,9 +27,17 @@ type Task = {
   is_active: boolean;
 };
 
+const ALERT_TITLES: Record<string, string> = {
+  goal_progress: "⏳ Progress on today's goal",
+  goal_reached: "🎯 Daily goal reached",
+  over_budget: "⚠️ Over today's budget",
+  goal_missed: "📉 Daily goal missed",
+};
+
 type TodoListProps = {
   tasks: any[];
   selectedFilter: "all" | "active" | "completed";
+  search?: string;
   readonly?: boolean;
   userIdOverride?: string;
   onTaskClick?: (taskId: number) => void;
@@ -37,6 +47,7 @@ export const TodoList = forwardRef(
   (
     {
       selectedFilter,
+      search = "",
       readonly = false,
       userIdOverride,
       tasks: propTasks,
@@ -53,7 +64,9 @@ export const TodoList = forwardRef(
     const todayStr = format(new Date(), "yyyy-MM-dd");
     const backendURL = process.env.NEXT_PUBLIC_BACKEND_URL;
 
-    const socketRef = useRef<WebSocket | null>(null);
+    const streamRef = useRef<EventSource | null>(null);
+    const [searchResults, setSearchResults] = useState<Task[] | null>(null);
+    const [goalAlert, setGoalAlert] = useState<any | null>(null);
 
     useImperativeHandle(ref, () => ({
       refetchTasks: fetchTasks,
@@ -76,60 +89,62 @@ export const TodoList = forwardRef(
         return;
       }
 
-      const { data, error } = await supabase
-        .from("tasks")
-        .select("*")
-        .eq("user_id", userId)
-        .order("created_at", { ascending: false });
-
-      if (error) {
+      // Completing a task deactivates it server-side; the owner's own
+      // listing also tidies completed tasks that are still active.
+      const data: Task[] = [];
+      let after: number | null = null;
+      try {
+        do {
+          const params = new URLSearchParams({ user_id: userId, limit: "500" });
+          if (after !== null) params.set("after", String(after));
+          const page = await apiFetch(`/tasks?${params}`);
+          data.push(...(page.tasks || []));
+          after = page.next ?? null;
+        } while (after !== null);
+      } catch (error) {
         console.error("Fetch error", error);
         setLoading(false);
         return;
       }
 
-      if (!readonly) {
-        const tasksToDeactivate = data.filter(
-          (task) => task.status && task.is_active
-        );
-
-        for (const task of tasksToDeactivate) {
-          await supabase
-            .from("tasks")
-            .update({ is_active: false })
-            .eq("id", task.id);
-        }
-
-        if (tasksToDeactivate.length > 0) return fetchTasks();
-      }
-
       setTasks(data);
       setLoading(false);
     };
 
+    const bulkTasks = (ids: number[], action: string, values?: object) =>
+      apiFetch("/tasks/bulk", {
+        method: "POST",
+        body: JSON.stringify({ ids, action, values }),
+      });
+
     const handleToggle = async (id: number) => {
       const task = tasks.find((t) => t.id === id);
       if (!task) return;
 
-      const { error } = await supabase
-        .from("tasks")
-        .update({ status: !task.status })
-        .eq("id", id);
-      if (!error) fetchTasks();
+      try {
+        await bulkTasks([id], "update", { status: !task.status });
+        fetchTasks();
+      } catch (error) {
+        console.error("Update error", error);
+      }
     };
 
     const handleDelete = async (id: number) => {
-      const { error } = await supabase.from("tasks").delete().eq("id", id);
-      if (!error) fetchTasks();
+      try {
+        await bulkTasks([id], "delete");
+        fetchTasks();
+      } catch (error) {
+        console.error("Delete error", error);
+      }
     };
 
     const handleActivate = async (id: number) => {
-      await supabase.from("tasks").update({ is_active: true }).eq("id", id);
+      await bulkTasks([id], "update", { is_active: true });
       setTimeout(fetchTasks, 300);
     };
 
     const handleDeactivate = async (id: number) => {
-      await supabase.from("tasks").update({ is_active: false }).eq("id", id);
+      await bulkTasks([id], "deactivate");
       setTimeout(fetchTasks, 300);
     };
 
@@ -143,6 +158,26 @@ export const TodoList = forwardRef(
       }
     };
 
+    // Searching is done by the backend, ranked; re-run after every refetch
+    // so toggles and deletes show up in the results.
+    useEffect(() => {
+      const q = search.trim();
+      if (!q || readonly) {
+        setSearchResults(null);
+        return;
+      }
+      const timer = setTimeout(async () => {
+        try {
+          const params = new URLSearchParams({ q, limit: "100" });
+          const page = await apiFetch(`/tasks/search?${params}`);
+          setSearchResults(page.tasks || []);
+        } catch (error) {
+          console.error("Search error", error);
+        }
+      }, 200);
+      return () => clearTimeout(timer);
+    }, [search, tasks]);
+
     const selectedTask = tasks.find((t) => t.id === selectedTaskId);
     const loggedSeconds = screenTimeData[selectedTask?.id || 0] ?? 0;
 
@@ -173,61 +208,80 @@ export const TodoList = forwardRef(
         fetchTasks();
       }
 
-      const connectWebSocket = () => {
-        if (socketRef.current) return;
-        socketRef.current = new WebSocket(
-          backendURL!.replace("https", "wss") + "/ws/usage"
-        );
-
-        socketRef.current.onopen = () => console.log("✅ WebSocket connected");
-
-        socketRef.current.onmessage = (event) => {
-          try {
-            const data = JSON.parse(event.data);
-            const todayDate = new Date().toISOString().split("T")[0];
-            const usageMap: Record<number, number> = {};
-
-            data.forEach((entry: any) => {
-              const logs = entry.duration_minutes || [];
-              const todayLogs = logs.filter(
-                (log: any) => log.date === todayDate
-              );
-              const totalSeconds = todayLogs.reduce(
-                (sum: number, log: any) => sum + (log.seconds || 0),
-                0
-              );
-              usageMap[entry.task_id] = totalSeconds;
-            });
-
-            setScreenTimeData(usageMap);
-          } catch (e) {
-            console.error("❌ WebSocket parse error:", e);
-          }
-        };
-
-        socketRef.current.onclose = () => {
-          console.warn("⚠️ WebSocket disconnected. Retrying...");
-          setTimeout(connectWebSocket, 3000);
-        };
-
-        socketRef.current.onerror = (err) => {
-          console.error("🚨 WebSocket error:", err);
-          socketRef.current?.close();
+      // Usage only flows server -> browser, so it comes over Server-Sent
+      // Events: a snapshot on connect, then just the rows that changed.
+      const todaySeconds = (entry: any) => {
+        const todayDate = new Date().toISOString().split("T")[0];
+        return (entry.duration_minutes || [])
+          .filter((log: any) => log.date === todayDate)
+          .reduce((sum: number, log: any) => sum + (log.seconds || 0), 0);
+      };
+      let usageMap: Record<number, number> = {};
+      let lastEventId = "";
+      let closed = false;
+
+      const connectUsageStream = async () => {
+        if (closed || streamRef.current) return;
+        // EventSource cannot set headers, so the token goes in the URL.
+        const token = await getAccessToken();
+        if (closed) return;
+        const params = new URLSearchParams({ token: token ?? "" });
+        if (lastEventId) params.set("last_event_id", lastEventId);
+        const source = new EventSource(`${backendURL}/usage/stream?${params}`);
+        streamRef.current = source;
+
+        source.addEventListener("snapshot", (event) => {
+          const rows = JSON.parse((event as MessageEvent).data);
+          lastEventId = (event as MessageEvent).lastEventId;
+          usageMap = {};
+          rows.forEach((entry: any) => (usageMap[entry.task_id] = todaySeconds(entry)));
+          setScreenTimeData({ ...usageMap });
+        });
+
+        source.addEventListener("usage", (event) => {
+          const { rows, removed, alerts } = JSON.parse((event as MessageEvent).data);
+          lastEventId = (event as MessageEvent).lastEventId;
+          rows.forEach((entry: any) => (usageMap[entry.task_id] = todaySeconds(entry)));
+          removed.forEach((taskId: number) => delete usageMap[taskId]);
+          setScreenTimeData({ ...usageMap });
+          if (alerts?.length) setGoalAlert(alerts[alerts.length - 1]);
+        });
+
+        source.onerror = () => {
+          // EventSource retries dropped connections itself (resuming from the
+          // last event id); it gives up on an error response such as an
+          // expired token, so reconnect then with a fresh one.
+          if (source.readyState !== EventSource.CLOSED) return;
+          console.warn("⚠️ Usage stream closed. Retrying...");
+          streamRef.current = null;
+          setTimeout(connectUsageStream, 3000);
         };
       };
 
-      connectWebSocket();
+      connectUsageStream();
 
       return () => {
-        socketRef.current?.close();
+        closed = true;
+        streamRef.current?.close();
+        streamRef.current = null;
       };
     }, []);
 
     return (
       <div className="relative w-full max-w-6xl mx-auto flex flex-col md:flex-row gap-4 transition-all duration-200">
         <div className="w-full md:w-1.5/3">
+          {goalAlert && (
+            <Alert className="mb-3 cursor-pointer" onClick={() => setGoalAlert(null)}>
+              <AlertTitle>{ALERT_TITLES[goalAlert.kind] ?? "Goal update"}</AlertTitle>
+              <AlertDescription>
+                {tasks.find((t) => t.id === goalAlert.task_id)?.title ?? `Task ${goalAlert.task_id}`}:{" "}
+                {Math.round(goalAlert.seconds / 60)} of {Math.round(goalAlert.target_seconds / 60)} min on{" "}
+                {goalAlert.day}
+              </AlertDescription>
+            </Alert>
+          )}
           <TaskTable
-            tasks={tasks}
+            tasks={searchResults ?? tasks}
             loading={loading}
             showDetail={showDetail}
             selectedFilter={selectedFilter}
@@ -0,0 +1,102 @@
+"use client";
+
+import React, { useEffect, useState } from "react";
+import { apiFetch } from "@/utils/fetch";
+import { Button } from "@/components/ui/button";
+
+type Heatmap = {
+  from: string;
+  to: string;
+  days: string[];
+  seconds: number[][];
+  max: number;
+};
+
+type Props = {
+  taskId?: number;
+  userId?: string;
+};
+
+const RANGES = [
+  { label: "4 weeks", weeks: 4 },
+  { label: "12 weeks", weeks: 12 },
+  { label: "1 year", weeks: 52 },
+];
+
+function formatHours(seconds: number): string {
+  const minutes = Math.round(seconds / 60);
+  return minutes >= 60
+    ? `${Math.floor(minutes / 60)}h ${minutes % 60}m`
+    : `${minutes}m`;
+}
+
+// Seconds per weekday and hour of day, summed over the chosen weeks by the
+// backend (see /usage/heatmap).
+export default function UsageHeatmap({ taskId, userId }: Props) {
+  const [heatmap, setHeatmap] = useState<Heatmap | null>(null);
+  const [weeks, setWeeks] = useState(12);
+
+  useEffect(() => {
+    const params = new URLSearchParams({ weeks: String(weeks) });
+    if (taskId) params.set("task_id", String(taskId));
+    else if (userId) params.set("user_id", userId);
+    apiFetch(`/usage/heatmap?${params}`)
+      .then(setHeatmap)
+      .catch((error) => console.error("Error fetching heatmap:", error));
+  }, [taskId, userId, weeks]);
+
+  if (!heatmap) return null;
+
+  return (
+    <div className="mt-6 border rounded-md shadow-sm p-4">
+      <div className="flex items-center justify-between mb-3">
+        <h3 className="text-md font-semibold">
+          When you work ({heatmap.from} to {heatmap.to})
+        </h3>
+        <div className="flex gap-2">
+          {RANGES.map((range) => (
+            <Button
+              key={range.weeks}
+              variant={weeks === range.weeks ? "default" : "outline"}
+              size="sm"
+              onClick={() => setWeeks(range.weeks)}
+            >
+              {range.label}
+            </Button>
+          ))}
+        </div>
+      </div>
+
+      <div className="overflow-x-auto">
+        <div
+          className="grid gap-[2px] text-[10px] text-gray-500"
+          style={{ gridTemplateColumns: "2.5rem repeat(24, minmax(14px, 1fr))" }}
+        >
+          <div />
+          {Array.from({ length: 24 }, (_, hour) => (
+            <div key={hour} className="text-center">
+              {hour % 3 === 0 ? hour : ""}
+            </div>
+          ))}
+          {heatmap.days.map((day, d) => (
+            <React.Fragment key={day}>
+              <div className="pr-1 text-right">{day}</div>
+              {heatmap.seconds[d].map((seconds, hour) => (
+                <div
+                  key={hour}
+                  title={`${day} ${hour}:00 - ${formatHours(seconds)}`}
+                  className="h-4 rounded-sm bg-indigo-500"
+                  style={{
+                    opacity: heatmap.max
+                      ? 0.08 + (0.92 * seconds) / heatmap.max
+                      : 0.08,
+                  }}
+                />
+              ))}
+            </React.Fragment>
+          ))}
+        </div>
+      </div>
+    </div>
+  );
+}
@@ -1,13 +1,23 @@
+import { supabase } from "@/lib/supabase";
+
 const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL;
 
+// The backend verifies the Supabase access token on every request.
+export async function getAccessToken (): Promise<string | undefined> {
+  const { data } = await supabase.auth.getSession();
+  return data.session?.access_token;
+}
+
 export async function apiFetch (
   path: string,
   options: RequestInit = {}
 ): Promise<any> {
   const url = `${BACKEND_URL}${path}`;
 
+  const token = await getAccessToken();
   const headers = {
     "Content-Type": "application/json",
+    ...(token ? { Authorization: `Bearer ${token}` } : {}),
     ...(options.headers || {}),
   };
 
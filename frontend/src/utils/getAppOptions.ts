@@ -1,12 +1,33 @@
 // utils/getAppOptions;
 
-import { supabase } from "@/lib/supabase";
+import { apiFetch } from "@/utils/fetch";
 
-export async function getAppOptions() {
-  const { data, error } = await supabase.from("app_registry").select("*");
-  if (error) {
+const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL;
+
+export type AppOption = {
+  name: string;
+  appname: string;
+  icon_url: string;
+  category: string;
+  // Fragment URL into the registry's icon sprite, when the app has one.
+  icon: string | null;
+};
+
+// The backend serves the registry grouped by category, with an ETag the
+// browser revalidates, and one sprite for all icons.
+export async function getAppOptions(): Promise<AppOption[]> {
+  try {
+    const registry = await apiFetch("/app-registry");
+    const sprite = `${BACKEND_URL}${registry.sprite}`;
+    return registry.categories.flatMap((category: any) =>
+      category.apps.map((app: any) => ({
+        ...app,
+        category: category.name,
+        icon: app.icon ? `${sprite}#${app.icon}` : null,
+      }))
+    );
+  } catch (error) {
     console.error("Error fetching apps", error);
     return [];
   }
-  return data;
 }